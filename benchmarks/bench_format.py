@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Micro benchmark: per sample decode and encode cost of each format class
+
+'decode' is the trusted construction from decoded values, 'validated'
+constructs the same value with the class (validating by encoding it once
+more, as decode did before), 'encode' encodes the decoded value.
+
+For the odd width FormatUint classes, decoding a buffer of values one
+format object per value is compared to decode_many (values only).
+"""
+from argparse import ArgumentParser
+from timeit import repeat
+
+from pydbusbluez import format as fmt
+from pydbusbluez.org_bluetooth import FormatBatteryLevelState, FormatCCC, FormatCRF
+
+
+class FormatTemperature(fmt.FormatSint16):
+    exponent = -2
+
+
+class FormatEnergy(fmt.FormatUint24):
+    exponent = -3
+
+
+FORMATS = (
+    (fmt.FormatRaw, b"\x01\x02\x03\x04"),
+    (fmt.FormatUint8, b"\x7f"),
+    (fmt.FormatUint16, b"\x01\x02"),
+    (fmt.FormatUint32, b"\x01\x02\x03\x04"),
+    (fmt.FormatUint64, b"\x01\x02\x03\x04\x05\x06\x07\x08"),
+    (fmt.FormatSint16, b"\xff\xfe"),
+    (fmt.FormatFloat32, b"\x00\x00\x80\x3f"),
+    (FormatTemperature, b"\x39\x30"),
+    (fmt.FormatUint24, b"\x01\x02\x03"),
+    (fmt.FormatUint48, b"\x01\x02\x03\x04\x05\x06"),
+    (FormatEnergy, b"\x01\x02\x03"),
+    (fmt.FormatUtf8s, b"pydbusbluez"),
+    (fmt.FormatBitfield, b"\xaa"),
+    (FormatCCC, b"\x01\x00"),
+    (FormatBatteryLevelState, b"\x32\xaa"),
+    (FormatCRF, b"\x04\xfe\x2f\x27\x01abc"),
+)
+
+ODD_WIDTH_FORMATS = (fmt.FormatUint24, fmt.FormatUint40, fmt.FormatUint48, FormatEnergy)
+
+
+def per_sample(func, number):
+    return min(repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(
+        "{:26s} {:>10s} {:>10s} {:>10s}".format(
+            "format (us/sample)", "decode", "validated", "encode"
+        )
+    )
+    for format_cls, sample in FORMATS:
+        value = format_cls.decode(sample)
+        print(
+            "{:26s} {:10.3f} {:10.3f} {:10.3f}".format(
+                format_cls.__name__,
+                per_sample(lambda: format_cls.decode(sample), args.number),
+                per_sample(lambda: format_cls(value.value), args.number),
+                per_sample(value.encode, args.number),
+            )
+        )
+
+    print()
+    print("{:26s} {:>10s} {:>10s}".format("format (us/sample)", "decode", "many"))
+    for format_cls in ODD_WIDTH_FORMATS:
+        size = format_cls.len
+        encoded = bytes(range(256)) * size * 8
+        samples = len(encoded) // size
+
+        def per_value():
+            return [
+                format_cls.decode(encoded[idx : idx + size]).value
+                for idx in range(0, len(encoded), size)
+            ]
+
+        number = max(1, args.number // samples)
+        print(
+            "{:26s} {:10.3f} {:10.3f}".format(
+                format_cls.__name__,
+                per_sample(per_value, number) / samples,
+                per_sample(lambda: format_cls.decode_many(encoded), number) / samples,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
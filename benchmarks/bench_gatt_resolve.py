@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark: matching a GATT database snapshot to a local Gatt description
+
+Builds synthetic GetManagedObjects snapshots with services, characteristics
+and descriptors (about 'size' attributes) and a local description knowing
+all of them, then times Gatt._resolve_services. No dbus connection is
+needed, resolving does not do any IPC.
+
+--linear times the previous matcher as baseline: scanning the local lists per
+remote object and filtering the unmatched objects per service and
+characteristic (quadratic in the size of the database).
+"""
+from argparse import ArgumentParser
+from timeit import repeat
+
+from pydbusbluez.gatt import Gatt, GattService, GattCharacteristic, GattDescriptor
+
+DEV = "/org/bluez/hci0/dev_00_11_22_33_44_55"
+CHARS_PER_SERVICE = 16
+DESCS_PER_CHAR = 2
+
+
+def _uuid(n):
+    return "{:08x}-0000-1000-8000-00805f9b34fb".format(0x10000 + n)
+
+
+def snapshot(size):
+    """returns GetManagedObjects like dict and gatt description with ~size attributes"""
+    objects = {}
+    desc = []
+    n_services = max(1, size // (1 + CHARS_PER_SERVICE * (1 + DESCS_PER_CHAR)))
+    handle = 1
+    for s in range(n_services):
+        s_obj = "{}/service{:04x}".format(DEV, handle)
+        s_uuid = _uuid(handle)
+        objects[s_obj] = {GattService.iface: {"UUID": s_uuid, "Handle": handle}}
+        service = {"name": "service{}".format(s), "uuid": s_uuid, "chars": []}
+        desc.append(service)
+        handle += 1
+        for c in range(CHARS_PER_SERVICE):
+            c_obj = "{}/char{:04x}".format(s_obj, handle)
+            c_uuid = _uuid(handle)
+            objects[c_obj] = {
+                GattCharacteristic.iface: {
+                    "UUID": c_uuid,
+                    "Handle": handle,
+                    "Flags": ["read", "notify"],
+                }
+            }
+            char = {"name": "char{}".format(c), "uuid": c_uuid, "descriptors": []}
+            service["chars"].append(char)
+            handle += 1
+            for d in range(DESCS_PER_CHAR):
+                d_obj = "{}/desc{:04x}".format(c_obj, handle)
+                d_uuid = _uuid(handle)
+                objects[d_obj] = {
+                    GattDescriptor.iface: {"UUID": d_uuid, "Handle": handle}
+                }
+                char["descriptors"].append({"name": "desc{}".format(d), "uuid": d_uuid})
+                handle += 1
+
+    return objects, desc
+
+
+def build(gatt_desc):
+    # skip Gatt.__init__, it needs a connected device
+    gatt = Gatt.__new__(Gatt)
+    gatt.services = []
+    for serv_desc in gatt_desc:
+        service = gatt.add_service(serv_desc["name"], serv_desc["uuid"])
+        for char_desc in serv_desc["chars"]:
+            char = service.add_characteristic(char_desc["name"], char_desc["uuid"])
+            for desc_desc in char_desc["descriptors"]:
+                char.add_descriptor(desc_desc["name"], desc_desc["uuid"])
+    return gatt
+
+
+def resolve(gatt, objects):
+    matched = gatt._resolve_services(objects, warn_unmatched=False)
+    assert len(matched) == len(objects)
+
+
+def _sub_objects(obj, objects):
+    sub_path = obj + "/"
+    return {sub: ifaces for sub, ifaces in objects.items() if sub.startswith(sub_path)}
+
+
+def _match_linear(entries, iface, objects):
+    """previous matching of one level, returns the matched objects"""
+    matched = []
+    for obj, ifaces in objects.items():
+        if iface not in ifaces:
+            continue
+        matched.append(obj)
+        props = ifaces[iface]
+        for entry in entries:
+            if props.get("UUID") == entry.uuid:
+                entry._set_resolved(obj, props)
+    return matched
+
+
+def resolve_linear(gatt, objects):
+    """previous Gatt._resolve_services, without the unknown object handling"""
+    unmatched = dict(objects)
+    matched = _match_linear(gatt.services, GattService.iface, objects)
+    for obj in matched:
+        del unmatched[obj]
+    for service in gatt.services:
+        if not service.obj:
+            continue
+        sub_objs = _sub_objects(service.obj, unmatched)
+        chars = _match_linear(service.chars, GattCharacteristic.iface, sub_objs)
+        for obj in chars:
+            del unmatched[obj]
+        matched.extend(chars)
+        for char in service.chars:
+            if not char.obj:
+                continue
+            char_sub_objs = _sub_objects(char.obj, unmatched)
+            descs = _match_linear(
+                char.descriptors, GattDescriptor.iface, char_sub_objs
+            )
+            for obj in descs:
+                del unmatched[obj]
+            matched.extend(descs)
+    assert len(matched) == len(objects)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "sizes", metavar="size", type=int, nargs="*", default=[250, 500, 1000, 2000]
+    )
+    parser.add_argument("-n", "--number", type=int, default=10)
+    parser.add_argument(
+        "--linear", action="store_true", help="time the previous matcher (baseline)"
+    )
+    args = parser.parse_args()
+    func = resolve_linear if args.linear else resolve
+
+    for size in args.sizes:
+        objects, gatt_desc = snapshot(size)
+        gatt = build(gatt_desc)
+        best = min(repeat(lambda: func(gatt, objects), number=args.number, repeat=5))
+        per_call = best / args.number
+        print(
+            "{:6d} attributes: {:8.2f} ms, {:6.2f} us/attribute".format(
+                len(objects), per_call * 1e3, per_call / len(objects) * 1e6
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Import time benchmark: 'import pydbusbluez' in a fresh interpreter
+
+Importing must not connect to the system bus or parse the introspection
+xml, this is checked as well.
+"""
+from argparse import ArgumentParser
+import subprocess
+import sys
+from time import perf_counter
+
+CHECK = """
+import pydbusbluez
+from pydbusbluez import bzutils, Device, Gatt, GattCharacteristic, ObjectManager
+assert bzutils._system_bus is None, "system bus connected at import"
+for cls in (Device, GattCharacteristic, ObjectManager):
+    assert "_introspection" not in vars(cls), "introspection parsed at import"
+"""
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--number", type=int, default=20)
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, "-c", CHECK], check=True)
+
+    times = []
+    for _ in range(args.number):
+        start = perf_counter()
+        subprocess.run([sys.executable, "-c", "import pydbusbluez"], check=True)
+        times.append(perf_counter() - start)
+
+    base = []
+    for _ in range(args.number):
+        start = perf_counter()
+        subprocess.run([sys.executable, "-c", "import pydbus"], check=True)
+        base.append(perf_counter() - start)
+
+    fmt = "{:20s}{:8.1f} ms"
+    print(fmt.format("import pydbus", min(base) * 1e3))
+    print(fmt.format("import pydbusbluez", min(times) * 1e3))
+    print(fmt.format("", (min(times) - min(base)) * 1e3), "on top of pydbus")
+    print("Use 'python -X importtime -c \"import pydbusbluez\"' for details")
+
+
+if __name__ == "__main__":
+    main()
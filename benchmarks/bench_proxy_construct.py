@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Micro benchmark: proxy construction time per object
+
+'uncached' generates the proxy class and backfills the async methods on
+every call (as construct() did before the classes were cached), 'cached'
+uses construct() with the class generated once per introspection.
+
+No dbus connection is needed, constructing a proxy does not do any IPC.
+"""
+from argparse import ArgumentParser
+from timeit import repeat
+
+from pydbus.proxy import CompositeInterface
+
+from pydbusbluez.bzutils import ORG_BLUEZ
+from pydbusbluez.device import Device
+from pydbusbluez.gatt import GattCharacteristic
+from pydbusbluez.pydbus_backfill import backfill_async_dbus_methods, construct
+
+PATH = "/org/bluez/hci0/dev_00_11_22_33_44_55/service0010/char0011"
+
+
+def construct_uncached(introspection):
+    ci = CompositeInterface(introspection)(None, ORG_BLUEZ, PATH)
+    backfill_async_dbus_methods(ci, introspection)
+    return ci
+
+
+def construct_cached(introspection):
+    return construct(None, introspection, ORG_BLUEZ, PATH)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    for cls in (Device, GattCharacteristic):
+        intro = cls.introspection
+        for name, func in (
+            ("uncached", construct_uncached),
+            ("cached", construct_cached),
+        ):
+            best = min(repeat(lambda: func(intro), number=args.number, repeat=5))
+            print(
+                "{:20s} {:10s} {:8.2f} us/proxy".format(
+                    cls.__name__, name, best / args.number * 1e6
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
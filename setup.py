@@ -39,6 +39,9 @@ setup(
     install_requires=[
         'pydbus;platform_system=="Linux"'
     ],  # external packages as dependencies
+    extras_require={
+        "numpy": ["numpy"],
+    },
     include_package_data=True,
     license="MIT",
     python_requires="~=3.7",
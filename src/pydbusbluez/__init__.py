@@ -1,7 +1,10 @@
 __version__ = "0.5.6"
 
-from .gatt import Gatt, GattService, GattCharacteristic, GattDescriptor
-from .device import Device, Adapter
+from .gatt import Gatt, GattService, GattCharacteristic, GattDescriptor, WritePipeline
+from .gatt_cache import GattCache
+from .notify import NotificationStream
+from .transfer import Transfer, TransferProgress
+from .device import Device, Adapter, DeviceInfo
 from .object_manager import BluezObjectManager as ObjectManager
 from .error import *
 from .format import *
@@ -10,10 +13,16 @@ __all__ = (
     "ObjectManager",
     "Adapter",
     "Device",
+    "DeviceInfo",
     "Gatt",
     "GattService",
     "GattCharacteristic",
     "GattDescriptor",
+    "WritePipeline",
+    "GattCache",
+    "NotificationStream",
+    "Transfer",
+    "TransferProgress",
     "DBusError",
     "DBusUnknownObjectError",
     "DBusTimeoutError",
@@ -35,6 +44,7 @@ __all__ = (
     "BluezDoesNotExistError",
     "BluezNotConnectedError",
     "BluezNotPermittedError",
+    "BluezInvalidOffsetError",
     "BluezFormatDecodeError",
     "FormatBase",
     "FormatRaw",
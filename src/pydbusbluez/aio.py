@@ -0,0 +1,410 @@
+"""
+asyncio front-end for Adapter, Device and GattCharacteristic
+
+The dbus calls are issued with the <method>Async proxy methods, the replies
+and signals are dispatched by the GLib default main context, which is iterated
+by a thread (see GLibBridge). One event loop handles any number
+of devices.
+
+If a GLib main loop runs in another thread, it dispatches the replies instead
+and the results are passed to the asyncio loop thread safe.
+
+>>> dev = AsyncDevice(Device(adapter="hci0", addr="00:11:22:33:44:55"))
+>>> await dev.connect()
+>>> await dev.wait_services_resolved(10)
+"""
+import asyncio
+import logging
+from threading import Event, Thread
+from weakref import WeakKeyDictionary
+
+from gi.repository import GLib
+from pydbus import Variant
+
+from .bzutils import ORG_BLUEZ
+from .device import Adapter, Device, DeviceInfo
+from .object_manager import BluezObjectManager
+from . import error as bzerror
+
+
+class GLibBridge(object):
+    """Dispatches the GLib default main context for an asyncio event loop
+
+    The context is iterated by a daemon thread, blocked in poll() until a reply
+    or signal arrives, the callbacks pass the results to the asyncio loop
+    thread safe. Results arrive without polling latency and no timer wakes up
+    the asyncio loop.
+
+    The thread only runs while a call or iterator is pending (hold(), release()),
+    or between start() and stop(), an idle process is not woken up. If the
+    context is owned by another thread (e.g. an application main loop), that
+    thread dispatches.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.context = GLib.MainContext.default()
+        self._stopped = None
+        self._started = False
+        self._holds = 0
+
+    @property
+    def running(self):
+        return self._stopped is not None
+
+    def start(self):
+        """dispatch until stop()"""
+        self._started = True
+        self._run()
+
+    def stop(self):
+        self._started = False
+        if not self._holds:
+            self._quit()
+
+    def hold(self):
+        """dispatch (starting immediately) until the matching release()"""
+        self._holds += 1
+        self._run()
+
+    def release(self):
+        self._holds -= 1
+        if not self._holds and not self._started:
+            self._quit()
+
+    def _run(self):
+        if self._stopped is None:
+            self._stopped = Event()
+            Thread(
+                target=self._dispatch,
+                args=(self._stopped,),
+                name="GLibBridge",
+                daemon=True,
+            ).start()
+
+    def _quit(self):
+        if self._stopped is not None:
+            self._stopped.set()
+            # returns from poll(), the thread exits after the dispatch
+            self.context.wakeup()
+            self._stopped = None
+
+    def _dispatch(self, stopped):
+        context = self.context
+        while not stopped.is_set():
+            context.iteration(True)
+
+
+_bridges = WeakKeyDictionary()
+
+
+def get_bridge(loop=None):
+    """returns the GLibBridge of loop (default: running loop)"""
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    bridge = _bridges.get(loop)
+    if bridge is None:
+        bridge = GLibBridge(loop)
+        _bridges[loop] = bridge
+    return bridge
+
+
+def _set_result(fut, result):
+    if not fut.done():
+        fut.set_result(result)
+
+
+def _set_exception(fut, exc):
+    if not fut.done():
+        fut.set_exception(exc)
+
+
+def _call(method_async, *args, timeout=None):
+    """
+    call proxy <method>Async (ProxyMethodAsync), returns future with the
+    tuple of out args, errors are converted to BluezErrors
+    """
+    bridge = get_bridge()
+    loop = bridge.loop
+    fut = loop.create_future()
+
+    def done_cb(proxy, result, data):
+        loop.call_soon_threadsafe(_set_result, fut, result.unpack())
+
+    def error_cb(proxy, err, data):
+        try:
+            bzerror.getDBusError(err)
+        except Exception as e:
+            err = e
+        loop.call_soon_threadsafe(_set_exception, fut, err)
+
+    try:
+        method_async(done_cb, error_cb, None, *args, timeout=timeout)
+    except Exception as e:
+        bzerror.getDBusError(e)
+    # dispatch until the reply arrived (or the future is cancelled)
+    bridge.hold()
+    fut.add_done_callback(lambda fut: bridge.release())
+    return fut
+
+
+class AsyncDevice(object):
+    """asyncio wrapper of a Device"""
+
+    logger = logging.getLogger(ORG_BLUEZ + ".AsyncDevice")
+
+    def __init__(self, device):
+        self.device = device
+
+    async def connect(self, timeout=30):
+        await _call(self.device._proxy.ConnectAsync, timeout=timeout)
+
+    async def disconnect(self, timeout=30):
+        try:
+            await _call(self.device._proxy.DisconnectAsync, timeout=timeout)
+        except (bzerror.BluezInProgressError, bzerror.DBusUnknownObjectError):
+            pass
+
+    async def pair(self, timeout=60):
+        try:
+            await _call(self.device._proxy.PairAsync, timeout=timeout)
+        except bzerror.BluezAlreadyExistsError:
+            self.logger.warning("Already paired: %s", str(self.device))
+        props = await self._properties(timeout=timeout)
+        return props.get("Paired", False)
+
+    async def _properties(self, timeout=30):
+        """
+        returns the Device1 properties, served from the property cache or the
+        object manager's mirror if enabled, else read with GetAllAsync
+        (empty if the device does not exist)
+        """
+        device = self.device
+        cache = device._props_cache
+        if cache and not cache.stale:
+            return cache.values
+        if BluezObjectManager.mirrored():
+            props = BluezObjectManager.objects().get(device.obj, {}).get(Device.iface)
+            if props is not None:
+                return props
+        try:
+            (props,) = await _call(
+                device._proxy.GetAllAsync, Device.iface, timeout=timeout
+            )
+        except (bzerror.BluezDoesNotExistError, bzerror.DBusUnknownObjectError):
+            return {}
+        return props
+
+    async def wait_services_resolved(self, timeout):
+        """
+        returns True if resolved, False on timeout
+        raises BluezNotConnectedError, if (getting) disconnected
+        """
+        bridge = get_bridge()
+        loop = bridge.loop
+        fut = loop.create_future()
+
+        def properties_changed(properties_values, invalidated_properties):
+            if properties_values.get("ServicesResolved"):
+                loop.call_soon_threadsafe(_set_result, fut, True)
+            elif properties_values.get("Connected") is False:
+                loop.call_soon_threadsafe(
+                    _set_exception, fut, bzerror.BluezNotConnectedError("Disconnected")
+                )
+
+        subscription = self.device._subscribe_properties_changed(properties_changed)
+        bridge.hold()
+        try:
+            # check after subscribing, so no change is missed
+            props = await self._properties()
+            if props.get("ServicesResolved", False):
+                return True
+            if not props.get("Connected", False):
+                raise bzerror.BluezNotConnectedError("Not connected")
+            try:
+                return await asyncio.wait_for(fut, timeout)
+            except asyncio.TimeoutError:
+                props = await self._properties()
+                return props.get("ServicesResolved", False)
+        finally:
+            bridge.release()
+            subscription.disconnect()
+
+    def __str__(self):
+        return "{}({})".format(self.__class__.__name__, str(self.device))
+
+
+class AsyncAdapter(object):
+    """asyncio wrapper of an Adapter"""
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+
+    async def start_discovery(self, filters=None):
+        """
+        filters: see Adapter.scan
+        """
+        proxy = self.adapter._proxy
+        if filters:
+            await _call(
+                proxy.SetDiscoveryFilterAsync, Adapter._discovery_filter(filters)
+            )
+        try:
+            await _call(proxy.StartDiscoveryAsync)
+        except bzerror.BluezInProgressError:
+            pass
+
+    async def stop_discovery(self):
+        try:
+            await _call(self.adapter._proxy.StopDiscoveryAsync)
+        except bzerror.BluezFailedError:
+            pass
+
+    async def _device_infos(self):
+        """
+        returns list of DeviceInfo of the known devices of the adapter, from
+        the object manager's mirror if enabled, else with GetManagedObjectsAsync
+        """
+        if BluezObjectManager.mirrored():
+            objs = BluezObjectManager.objects()
+        else:
+            (objs,) = await _call(
+                BluezObjectManager.get()._proxy.GetManagedObjectsAsync
+            )
+
+        adapter_path = self.adapter.obj + "/"
+        return [
+            DeviceInfo.from_properties(obj, ifaces[Device.iface])
+            for obj, ifaces in objs.items()
+            if obj.startswith(adapter_path)
+            and "/" not in obj[len(adapter_path) :]
+            and Device.iface in ifaces
+        ]
+
+    async def discover(self, filters=None, existing=False):
+        """
+        async iterator over DeviceInfo of discovered devices, discovery is
+        running while iterating
+
+        filters: see Adapter.scan
+        existing: yield already known devices first
+        """
+        bridge = get_bridge()
+        queue = asyncio.Queue()
+        adapter_path = self.adapter.obj + "/"
+
+        def interfaces_added(sender, obj, iface, signal, params):
+            added_obj, added_ifaces = params
+            if added_obj.startswith(adapter_path) and Device.iface in added_ifaces:
+                info = DeviceInfo.from_properties(added_obj, added_ifaces[Device.iface])
+                bridge.loop.call_soon_threadsafe(queue.put_nowait, info)
+
+        subscription = self.adapter.bus.subscribe(
+            sender=ORG_BLUEZ,
+            iface="org.freedesktop.DBus.ObjectManager",
+            signal="InterfacesAdded",
+            signal_fired=interfaces_added,
+        )
+        bridge.hold()
+        try:
+            if existing:
+                for info in await self._device_infos():
+                    queue.put_nowait(info)
+            await self.start_discovery(filters)
+            while True:
+                yield await queue.get()
+        finally:
+            subscription.unsubscribe()
+            try:
+                await self.stop_discovery()
+            finally:
+                bridge.release()
+
+
+class AsyncGattCharacteristic(object):
+    """asyncio wrapper of a resolved GattCharacteristic (or GattDescriptor)"""
+
+    def __init__(self, char):
+        self.char = char
+
+    def _char_proxy(self):
+        proxy = self.char._proxy
+        if not proxy:
+            raise bzerror.BluezDoesNotExistError(
+                "{} not resolved".format(str(self.char))
+            )
+        return proxy
+
+    async def read(self, raw=False, offset=0, timeout=30):
+        options = {}
+        if offset:
+            options["offset"] = Variant("q", offset)
+        (value,) = await _call(
+            self._char_proxy().ReadValueAsync, options, timeout=timeout
+        )
+        if raw:
+            return value
+        try:
+            return self.char.fmt.decode(value)
+        except Exception as e:
+            raise bzerror.BluezFormatDecodeError(
+                "{}: {}, got: {}".format(self.char, str(e), str(value))
+            )
+
+    async def write(self, value, options=None, timeout=30):
+        _, v_enc = self.char._encode(value)
+        await _call(
+            self._char_proxy().WriteValueAsync, v_enc, options or {}, timeout=timeout
+        )
+
+    async def start_notify(self, timeout=30):
+        try:
+            await _call(self._char_proxy().StartNotifyAsync, timeout=timeout)
+        except bzerror.BluezInProgressError:
+            pass
+
+    async def stop_notify(self, timeout=30):
+        try:
+            await _call(self._char_proxy().StopNotifyAsync, timeout=timeout)
+        except bzerror.BluezFailedError:
+            pass
+
+    async def notifications(self, raw=False):
+        """
+        async iterator over notified values, notifications are enabled
+        while iterating
+        """
+        bridge = get_bridge()
+        queue = asyncio.Queue()
+
+        def properties_changed(properties_values, invalidated_properties):
+            if "Value" in properties_values:
+                bridge.loop.call_soon_threadsafe(
+                    queue.put_nowait, properties_values["Value"]
+                )
+
+        subscription = self.char._subscribe_properties_changed(properties_changed)
+        bridge.hold()
+        try:
+            await self.start_notify()
+            while True:
+                value = await queue.get()
+                yield value if raw else self.char.fmt.decode(value)
+        finally:
+            subscription.disconnect()
+            try:
+                await self.stop_notify()
+            finally:
+                bridge.release()
+
+    def __str__(self):
+        return "{}({})".format(self.__class__.__name__, str(self.char))
+
+
+__all__ = (
+    "GLibBridge",
+    "get_bridge",
+    "AsyncAdapter",
+    "AsyncDevice",
+    "AsyncGattCharacteristic",
+)
@@ -1,15 +1,17 @@
 from functools import wraps, partial, partialmethod
+from time import monotonic
 
 from pydbus import SystemBus
 from pydbus.proxy import ProxyMixin, CompositeInterface, Interface
 from pydbus.auto_names import auto_bus_name, auto_object_path
 from xml.etree import ElementTree as ET
+from gi.repository import GLib
 
 from . import error as bzerror
 import logging
 
 from pydbus.proxy import ProxyMethod
-from .pydbus_backfill import InterfaceBackfilled, construct, backfill_async_dbus_methods
+from .pydbus_backfill import InterfaceBackfilled, construct
 
 
 ProxyMixin.construct = construct
@@ -17,7 +19,123 @@ Interface = InterfaceBackfilled
 
 ORG_BLUEZ = "org.bluez"
 
-logging.basicConfig()
+_missing = object()
+
+_system_bus = None
+
+
+def get_bus():
+    """Shared system bus connection, connected on first use"""
+    global _system_bus
+    if _system_bus is None:
+        _system_bus = SystemBus()
+    return _system_bus
+
+
+def wait_for_event(event, timeout=None):
+    """
+    Wait for event (threading.Event) to be set by a GLib callback, returns
+    event.is_set()
+
+    If the GLib default main context is not owned by a main loop of another
+    thread, it is iterated while waiting (blocking caller, or called from a
+    callback of the main loop), else the running main loop dispatches.
+
+    timeout: seconds (float) or None
+    """
+    context = GLib.MainContext.default()
+    if not context.acquire():
+        return event.wait(timeout)
+
+    expired = []
+
+    def on_timeout():
+        expired.append(True)
+        return False
+
+    timeout_source = None
+    if timeout is not None:
+        timeout_source = GLib.timeout_add(max(0, int(timeout * 1000)), on_timeout)
+    try:
+        while not event.is_set() and not expired:
+            context.iteration(True)
+    finally:
+        if timeout_source is not None and not expired:
+            GLib.source_remove(timeout_source)
+        context.release()
+    return event.is_set()
+
+
+class LazyBus(object):
+    """Class attribute for the shared system bus, no IPC until first accessed"""
+
+    def __get__(self, instance, owner):
+        return get_bus()
+
+
+class LazyIntrospection(object):
+    """Class attribute with the parsed 'intro_xml' of the class
+
+    The xml is parsed on first access, once per class.
+    """
+
+    def __get__(self, instance, owner):
+        introspection = owner.__dict__.get("_introspection")
+        if introspection is None:
+            introspection = ET.fromstring(owner.intro_xml)
+            owner._introspection = introspection
+        return introspection
+
+
+class PropertyCache(object):
+    """Local copy of the properties of one interface of a dbus object
+
+    Seeded with a snapshot of all properties and kept current by
+    PropertiesChanged signals.
+
+    max_age: seconds a snapshot is trusted, before it is considered stale,
+             None means forever (rely on PropertiesChanged only)
+    """
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self.values = None
+        self.invalidated = set()
+        self.time = 0
+        self.subscription = None
+
+    @property
+    def stale(self):
+        if self.values is None:
+            return True
+        return self.max_age is not None and monotonic() - self.time > self.max_age
+
+    def seed(self, values):
+        self.values = dict(values)
+        self.invalidated.clear()
+        self.time = monotonic()
+
+    def update(self, changed, invalidated):
+        if self.values is None:
+            return
+        self.values.update(changed)
+        self.invalidated.difference_update(changed)
+        for prop in invalidated:
+            self.values.pop(prop, None)
+            self.invalidated.add(prop)
+
+    def invalidate(self, prop=None):
+        if prop is None:
+            self.values = None
+            self.invalidated.clear()
+        elif self.values is not None:
+            self.values.pop(prop, None)
+            self.invalidated.add(prop)
+
+    def unsubscribe(self):
+        if self.subscription:
+            self.subscription.disconnect()
+            self.subscription = None
 
 
 class BluezInterfaceObject(object):
@@ -27,7 +145,7 @@ class BluezInterfaceObject(object):
     class property 'introspection' with a ElementTree parsed introspection xml
     """
 
-    bus = SystemBus()
+    bus = LazyBus()
     logger = logging.getLogger(__qualname__)
     logger.setLevel(logging.ERROR)
     iface = "{}.{}1".format(ORG_BLUEZ, __qualname__)
@@ -64,12 +182,18 @@ class BluezInterfaceObject(object):
         </interface>
         </node>
     """
-    introspection = ET.fromstring(intro_xml)
+    introspection = LazyIntrospection()
+
+    # properties, that do not change for an object path, these are read
+    # from a managed objects snapshot, if provided (see _set_static_properties)
+    static_properties = ()
 
     @bzerror.convertBluezError
     def __init__(self, obj=None, name=None):
         self._proxy = None
         self._obj = None
+        self._props_cache = None
+        self._static_props = {}
         self.obj = obj
         self.name = name
 
@@ -87,20 +211,27 @@ class BluezInterfaceObject(object):
         except AttributeError:
             pass
         self._obj = obj
+        if getattr(self, "_props_cache", None):
+            self._props_cache.unsubscribe()
+            self._props_cache.invalidate()
 
-        if obj:
-            self._proxy = self.bus.construct(self.introspection, ORG_BLUEZ, obj)
-            try:
-                _ = self._proxy.GetAsync
-            except AttributeError:
-                backfill_async_dbus_methods(self._proxy, self.introspection)
-        else:
-            try:
-                self.onPropertiesChanged(None)
-            except AttributeError:
-                pass
+        # proxy is constructed on first use
+        self._proxy = None
+        self._static_props = {}
+        if not obj:
             self._obj = None
-            self._proxy = None
+
+    @property
+    def _proxy(self):
+        if self._proxy_obj is None and self._obj:
+            self._proxy_obj = self.bus.construct(
+                self.introspection, ORG_BLUEZ, self._obj
+            )
+        return self._proxy_obj
+
+    @_proxy.setter
+    def _proxy(self, proxy):
+        self._proxy_obj = proxy
 
     def _def_iface_name(self):
         return "{}.{}1".format(ORG_BLUEZ, self.__class__.__name__)
@@ -120,8 +251,10 @@ class BluezInterfaceObject(object):
         """
         if self.obj:
             if not func:
+                # do not construct a proxy only to unsubscribe
                 try:
-                    self._proxy.onPropertiesChanged = None
+                    if self._proxy_obj is not None:
+                        self._proxy_obj.onPropertiesChanged = None
                 except AttributeError:
                     pass
                 return
@@ -152,7 +285,134 @@ class BluezInterfaceObject(object):
                 "Object not set for {}".format(str(self))
             )
 
+    def cache_properties(self, enable=True, max_age=None):
+        """
+        Serve property reads from a local cache instead of a dbus 'Get' per read
+
+        The cache is seeded with one 'GetAll' (or from the object manager's mirror,
+        if enabled) and updated by PropertiesChanged signals, which are only
+        received with a running GLib main loop.
+
+        :param      enable:   enable/disable the cache
+        :type       enable:   bool
+        :param      max_age:  seconds after which the cache is refreshed on the next read,
+                              None to rely on PropertiesChanged signals only
+        :type       max_age:  float
+        """
+        if self._props_cache:
+            self._props_cache.unsubscribe()
+            self._props_cache = None
+        if enable:
+            self._props_cache = PropertyCache(max_age)
+
+    @bzerror.convertBluezError
+    def refresh_properties(self):
+        """
+        (Re-)seed the property cache, returns dict with all properties
+        """
+        cache = self._props_cache
+        if not cache:
+            raise ValueError("Property cache is not enabled for {}".format(str(self)))
+        if not self.obj:
+            raise bzerror.BluezDoesNotExistError(
+                "Object not set for {}".format(str(self))
+            )
+
+        if not cache.subscription:
+            cache.subscription = self._subscribe_properties_changed(
+                self._cache_properties_changed
+            )
+
+        # import here, object_manager depends on this module
+        from .object_manager import BluezObjectManager
+
+        iface = self._def_iface_name()
+        values = None
+        if BluezObjectManager.mirrored():
+            values = BluezObjectManager.objects().get(self.obj, {}).get(iface)
+        if values is None:
+            values = self._proxy.GetAll(iface)
+        cache.seed(values)
+        return dict(cache.values)
+
+    def _subscribe_properties_changed(self, handler):
+        """
+        Subscribes handler(changed_properties, invalidated_properties) to
+        PropertiesChanged of this object's interface, independent of onPropertiesChanged
+
+        returns subscription with disconnect() method
+        """
+        iface_name = self._def_iface_name()
+
+        def properties_changed(iface, properties_values, invalidated_properties):
+            if iface == iface_name:
+                handler(properties_values, invalidated_properties)
+
+        return self._proxy.PropertiesChanged.connect(properties_changed)
+
+    def _cache_properties_changed(self, properties_values, invalidated_properties):
+        if self._props_cache:
+            self._props_cache.update(properties_values, invalidated_properties)
+
+    def _set_resolved(self, obj, props):
+        """
+        set object path and its static properties from a managed objects snapshot,
+        no proxy is constructed and no IPC done
+        """
+        self.obj = obj
+        self._set_static_properties(props)
+
+    def _set_static_properties(self, props):
+        """
+        set static properties from properties dict, e.g. from GetManagedObjects
+        """
+        self._static_props = {
+            prop: props[prop] for prop in self.static_properties if prop in props
+        }
+
     def _getBluezPropOrNone(self, prop, fail_ret=None):
+        value = self._static_props.get(prop, _missing)
+        if value is not _missing:
+            return value
+
+        cache = self._props_cache
+        if cache and self._proxy:
+            try:
+                if cache.stale:
+                    self.refresh_properties()
+            except (bzerror.BluezDoesNotExistError, bzerror.DBusUnknownObjectError):
+                return fail_ret
+            except (bzerror.BluezError, bzerror.DBusError):
+                # e.g. timeout, read the property as without cache
+                return self._getBluezPropOrNoneUncached(prop, fail_ret)
+
+            if prop in cache.values:
+                return cache.values[prop]
+            if prop not in cache.invalidated:
+                return fail_ret
+
+            value = self._getBluezPropOrNoneUncached(prop, _missing)
+            if value is _missing:
+                return fail_ret
+            if cache.values is not None:
+                cache.values[prop] = value
+                cache.invalidated.discard(prop)
+            return value
+
+        return self._getBluezPropOrNoneUncached(prop, fail_ret)
+
+    def _setBluezProp(self, prop, value):
+        """
+        set property (dbus 'Set'), the cached value is dropped, the next read
+        gets the value from bluez
+        """
+        try:
+            setattr(self._proxy, prop, value)
+        finally:
+            if self._props_cache:
+                self._props_cache.invalidate(prop)
+
+    def _getBluezPropOrNoneUncached(self, prop, fail_ret=None):
         try:
             # first, convert error to own classes
             try:
@@ -174,6 +434,10 @@ class BluezInterfaceObject(object):
     @property
     def properties(self):
         try:
+            if self._props_cache:
+                if self._props_cache.stale:
+                    return self.refresh_properties()
+                return dict(self._props_cache.values)
             return self._proxy.GetAll(self.iface)
         except Exception:
             pass
@@ -1,15 +1,64 @@
-from time import sleep
+from threading import Event
+from time import monotonic
 from functools import wraps, partial
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple
 import logging
 from pydbus import SystemBus, Variant
 
-from .bzutils import BluezInterfaceObject
+from .bzutils import BluezInterfaceObject, wait_for_event
 from .object_manager import BluezObjectManager
 from . import error as bz
 from .pydbus_backfill import ProxyMethodAsync
 
 from gi.repository.GLib import Error as GLibError
-from xml.etree import ElementTree as ET
+
+
+class DeviceInfo(NamedTuple):
+    """Read-only snapshot of the properties of a device"""
+
+    obj: str
+    address: Optional[str]
+    name: Optional[str]
+    alias: Optional[str]
+    rssi: Optional[int]
+    paired: bool
+    connected: bool
+    trusted: bool
+    services_resolved: bool
+    uuids: Tuple[str, ...]
+    manufacturer_data: Mapping[int, bytes]
+    service_data: Mapping[str, bytes]
+
+    @classmethod
+    def from_properties(cls, obj, props):
+        """
+        create DeviceInfo from the 'org.bluez.Device1' properties dict of obj
+        """
+        return cls(
+            obj=obj,
+            address=props.get("Address"),
+            name=props.get("Name"),
+            alias=props.get("Alias"),
+            rssi=props.get("RSSI"),
+            paired=props.get("Paired", False),
+            connected=props.get("Connected", False),
+            trusted=props.get("Trusted", False),
+            services_resolved=props.get("ServicesResolved", False),
+            uuids=tuple(props.get("UUIDs", ())),
+            manufacturer_data=MappingProxyType(
+                {
+                    key: bytes(value)
+                    for key, value in props.get("ManufacturerData", {}).items()
+                }
+            ),
+            service_data=MappingProxyType(
+                {
+                    key: bytes(value)
+                    for key, value in props.get("ServiceData", {}).items()
+                }
+            ),
+        )
 
 
 class Adapter(BluezInterfaceObject):
@@ -128,7 +177,6 @@ class Adapter(BluezInterfaceObject):
         </interface>
     </node>
     """
-    introspection = ET.fromstring(intro_xml)
 
     @staticmethod
     def list():
@@ -157,7 +205,7 @@ class Adapter(BluezInterfaceObject):
 
         try:
             if not bz.getBluezPropOrRaise(self._proxy, "Powered"):
-                self._proxy.Powered = True
+                self._setBluezProp("Powered", True)
 
         except (bz.BluezDoesNotExistError, bz.DBusUnknownObjectError):
             raise bz.BluezDoesNotExistError(
@@ -174,15 +222,9 @@ class Adapter(BluezInterfaceObject):
         """
         if enable:
             if filters and isinstance(filters, dict):
-                # convert to Variants (for supported)
-                if "UUIDs" in filters and not isinstance(filters["UUIDs"], Variant):
-                    filters["UUIDs"] = Variant("as", filters["UUIDs"])
-                if "Transport" in filters and not isinstance(
-                    filters["Transport"], Variant
-                ):
-                    filters["Transport"] = Variant("s", filters["Transport"])
-
-                bz.callBluezFunction(self._proxy.SetDiscoveryFilter, filters)
+                bz.callBluezFunction(
+                    self._proxy.SetDiscoveryFilter, self._discovery_filter(filters)
+                )
             try:
                 bz.callBluezFunction(self._proxy.StartDiscovery)
             except bz.BluezInProgressError:
@@ -195,19 +237,49 @@ class Adapter(BluezInterfaceObject):
 
         return bz.getBluezPropOrNone(self._proxy, "Discovering", fail_ret=False)
 
+    @staticmethod
+    def _discovery_filter(filters):
+        """
+        convert (supported) filter values to Variants for 'SetDiscoveryFilter'
+        """
+        filters = dict(filters)
+        if "UUIDs" in filters and not isinstance(filters["UUIDs"], Variant):
+            filters["UUIDs"] = Variant("as", filters["UUIDs"])
+        if "Transport" in filters and not isinstance(filters["Transport"], Variant):
+            filters["Transport"] = Variant("s", filters["Transport"])
+        return filters
+
     @property
     def scanning(self):
-        return bz.getBluezPropOrNone(self._proxy, "Discovering", fail_ret=False)
+        return self._getBluezPropOrNone("Discovering", fail_ret=False)
 
     @bz.convertBluezError
     def devices(self):
         """
         returns list with all scanned/connected/paired devices
         """
+        return self._devices_from_infos(self.device_infos())
+
+    @bz.convertBluezError
+    def device_infos(self, *filters):
+        """
+        returns list of DeviceInfo for all scanned/connected/paired devices,
+        read from a single managed objects snapshot
+
+        filters: predicates func(info: DeviceInfo) -> bool, only devices
+                 matching all of them are returned
+        """
+        objs = BluezObjectManager.get_interface_objects(
+            Device.iface, self.obj, only_direct=True
+        )
+        infos = (DeviceInfo.from_properties(obj, props) for obj, props in objs.items())
+        return [info for info in infos if all(f(info) for f in filters)]
+
+    def _devices_from_infos(self, infos):
         l = []
-        for obj in BluezObjectManager.get_childs(self.obj, only_direct=True):
+        for info in infos:
             try:
-                l.append(Device(adapter=self, obj=obj))
+                l.append(Device(adapter=self, addr=info.address, obj=info.obj))
             except:
                 pass
         return l
@@ -229,8 +301,6 @@ class Adapter(BluezInterfaceObject):
                     if "Address" in added_if[Device.iface]:
                         addr = added_if[Device.iface]["Address"]
                     device = Device(self_adapter, addr=addr, obj=added_obj)
-                    if "filter_interfaces" in cbkwargs:
-                        del cbkwargs["filter_interfaces"]
 
                     self.logger.debug(
                         "call device_added: func: %s(%s,%s,%s)",
@@ -249,7 +319,12 @@ class Adapter(BluezInterfaceObject):
                 str(kwargs),
             )
             om.onObjectAdded(
-                self, device_added, *args, filter_interfaces=Device.iface, **kwargs
+                self,
+                device_added,
+                *args,
+                filter_interface=Device.iface,
+                only_direct=True,
+                **kwargs,
             )
             if init:
                 dev_objs = om.childs(self, only_direct=True)
@@ -307,16 +382,7 @@ class Adapter(BluezInterfaceObject):
 
     @bz.convertBluezError
     def paired_devices(self):
-        devs = self.devices()
-        paired_devs = []
-        for dev in devs:
-            try:
-                if dev.paired:
-                    paired_devs.append(dev)
-            except Exception:
-                pass
-
-        return paired_devs
+        return self._devices_from_infos(self.device_infos(lambda info: info.paired))
 
     @bz.convertBluezError
     def remove_device(self, dev_obj):
@@ -415,7 +481,6 @@ class Device(BluezInterfaceObject):
             </signal>
         </interface>
         </node>"""
-    introspection = ET.fromstring(intro_xml)
 
     @bz.convertBluezError
     def __init__(self, adapter=None, addr=None, obj=None):
@@ -550,17 +615,45 @@ class Device(BluezInterfaceObject):
 
     @bz.convertBluezError
     def wait_services_resolved(self, wait_resolved_sec):
-        waitfor = 0
+        """
+        Wait for ServicesResolved, woken by PropertiesChanged signals, see
+        bzutils.wait_for_event
 
-        self.logger.debug("resolved: %s", self._proxy.ServicesResolved)
-        while not self.services_resolved and waitfor < wait_resolved_sec:
+        :param      wait_resolved_sec:  timeout in seconds
+        :type       wait_resolved_sec:  float
+        :returns:   True if resolved, False on timeout
+        :raises     BluezNotConnectedError:  if (getting) disconnected
+        """
+        done = Event()
+        state = {}
+
+        def properties_changed(properties_values, invalidated_properties):
+            if properties_values.get("ServicesResolved"):
+                state["resolved"] = True
+                done.set()
+            elif properties_values.get("Connected") is False:
+                state["disconnected"] = True
+                done.set()
+
+        subscription = self._subscribe_properties_changed(properties_changed)
+        try:
+            # check after subscribing, so no change is missed
+            if self.services_resolved:
+                return True
             if not self.connected:
                 raise bz.BluezNotConnectedError("Not connected")
-            # waitfor -= 1
-            waitfor += 1
-            sleep(1)
-        self.logger.info("Waited %s for resolving gatt DB uuids", waitfor)
-        return self.services_resolved
+
+            start = monotonic()
+            wait_for_event(done, wait_resolved_sec)
+            self.logger.info(
+                "Waited %.3fs for resolving gatt DB uuids", monotonic() - start
+            )
+        finally:
+            subscription.disconnect()
+
+        if state.get("disconnected"):
+            raise bz.BluezNotConnectedError("Disconnected")
+        return state.get("resolved", False) or self.services_resolved
 
     @property
     def device_name(self):
@@ -572,7 +665,7 @@ class Device(BluezInterfaceObject):
 
     @bz.convertBluezError
     def trust(self, on=True):
-        self._proxy.Trusted = on
+        self._setBluezProp("Trusted", on)
         return self.trusted
 
     @property
@@ -580,4 +673,4 @@ class Device(BluezInterfaceObject):
         return self._getBluezPropOrNone("UUIDs", fail_ret=[])
 
 
-__all__ = ("Device", "Adapter")
+__all__ = ("Device", "Adapter", "DeviceInfo")
@@ -85,6 +85,10 @@ class BluezNotPermittedError(BluezError):
     pass
 
 
+class BluezInvalidOffsetError(BluezError):
+    pass
+
+
 class BluezFormatError(BluezError):
     pass
 
@@ -276,6 +280,8 @@ def getDBusError(err):
         raise BluezNotConnectedError(msg)
     if ml[1].endswith(".NotPermitted"):
         raise BluezNotPermittedError(msg)
+    if ml[1].endswith(".InvalidOffset"):
+        raise BluezInvalidOffsetError(msg)
 
     raise BluezError(msg)
 
@@ -303,6 +309,7 @@ __all__ = (
     "BluezDoesNotExistError",
     "BluezNotConnectedError",
     "BluezNotPermittedError",
+    "BluezInvalidOffsetError",
     "BluezFormatDecodeError",
     "callBluezFunction",
     "convertBluezError",
@@ -94,6 +94,7 @@ def scan_timeout(loop, *args, **kwargs):
 
 def main():
 
+    logging.basicConfig()
     args = cli_aruments()
     try:
         hci = Adapter(args.adapter)
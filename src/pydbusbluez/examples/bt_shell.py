@@ -16,6 +16,7 @@ from gi.repository.GLib import MainLoop, timeout_add_seconds
 from importlib import import_module
 
 import cmd
+import logging
 import time
 import ast
 
@@ -59,6 +60,7 @@ class CmdTimeout(object):
 
 
 def main():
+    logging.basicConfig()
     parser = ArgumentParser(description="BT (my_peripheral) command interpreter")
     parser = ArgumentParser(
         description='Peripheral connect and set/get values (for "my_peripheral.GATT")'
@@ -412,6 +414,7 @@ class BTShell(cmd.Cmd):
             g_chars = self.clp_cache
         # print('reading: ', str(g_chars))
 
+        objs = {}
         for g_char in g_chars:
             o = self.find_char_or_desc_obj(g_char)
             if not o:
@@ -422,10 +425,15 @@ class BTShell(cmd.Cmd):
                     file=sys.stderr,
                 )
                 continue
-            try:
-                v = o.read()
-            except bluez.BluezError as e:
-                print("get: ", g_char, str(e), file=sys.stderr)
+            objs[o] = g_char
+
+        if not objs:
+            return
+
+        # read all at once
+        for o, v in self.gatt.read_many(objs).items():
+            if isinstance(v, bluez.BluezError):
+                print("get: ", objs[o], str(v), file=sys.stderr)
                 continue
 
             print(_make_id(o.name), v, file=sys.stderr)
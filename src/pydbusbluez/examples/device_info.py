@@ -5,6 +5,7 @@ from pydbusbluez.error import BluezDoesNotExistError, BluezError, DBusTimeoutErr
 from pydbusbluez.gatt import Gatt, FormatUint8, FormatBitfield
 from pydbusbluez.gatt_generic import device_information
 import sys
+import logging
 
 from gi.repository.GLib import MainLoop, timeout_add_seconds
 
@@ -38,6 +39,7 @@ def read_char(gatt_char):
 
 
 def main():
+    logging.basicConfig()
     parser = ArgumentParser(description="bluetooth tester")
     parser.add_argument(
         "-i",
@@ -158,9 +160,8 @@ def main():
 
     dev_info = gatt.device_information  # pylint: disable=no-member
 
-    for dinfo in dev_info.chars:
-        if dinfo.obj:
-            print(dinfo.name, ":", dinfo.read(options={"timeout": 4}))
+    for dinfo, value in dev_info.read_many(timeout=4).items():
+        print(dinfo.name, ":", value)
 
     if args.wait > 0:
         sleep(args.wait)
@@ -1,4 +1,4 @@
-from struct import Struct
+from struct import Struct, error as StructError
 from types import new_class
 
 # class init => python type to obj, value = python type
@@ -8,7 +8,58 @@ from types import new_class
 # self.value is bytes on Base class
 
 
+def _numpy():
+    # optional, only needed for batch decoding, imported on first use
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+            "Batch decoding requires numpy: pip install pydbusbluez[numpy]"
+        ) from None
+    return numpy
+
+
+def _batch_buffer(values, size):
+    """
+    buffer with values of size bytes each, from a buffer of concatenated values
+    or a list of values (zero padded or truncated to size)
+    """
+    try:
+        buf = memoryview(values).cast("B")
+    except TypeError:
+        values = [bytes(v) for v in values]
+        if any(len(v) != size for v in values):
+            values = [v[:size].ljust(size, b"\x00") for v in values]
+        return b"".join(values)
+
+    if size == 0 or len(buf) % size:
+        raise ValueError(
+            "Buffer length {} is not a multiple of {}".format(len(buf), size)
+        )
+    return buf
+
+
+def _scale_batch(raw, exponent):
+    if not exponent:
+        return raw
+    np = _numpy()
+    return np.round(raw * 10.0**exponent, -exponent)
+
+
 class MetaBluezFormat(type):
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        if "__slots__" not in namespace and "__init__" not in namespace:
+            # no per instance __dict__, values only have the 'value' slot, a custom
+            # init may set more attributes
+            namespace = dict(namespace, __slots__=())
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+    def __init__(cls, name, bases, namespace, **kwargs):
+        super().__init__(name, bases, namespace, **kwargs)
+        if "__init__" in namespace and "_init_trusted" not in namespace:
+            # custom init may do more than setting value, decode calls it
+            cls._init_trusted = False
+
     def __str__(self):
         return "{}".format(self.__name__)
 
@@ -20,6 +71,8 @@ class MetaBluezFormatInt(type):
 
 class FormatBase(object, metaclass=MetaBluezFormat):
 
+    __slots__ = ("value",)
+
     # __metaclass__ = MetaFormatInt
     # 0 means variable length
     len = 0
@@ -29,29 +82,92 @@ class FormatBase(object, metaclass=MetaBluezFormat):
 
     native_types = bytes
 
+    # init only validates value, can be skipped for decoded values
+    _init_trusted = True
+
     # init takes native python type as arg (depends on formatBase, base is 'bytes' type)
     def __init__(self, value):
+        self._set_value(value)
+        try:
+            _ = self.encode()
+        except Exception as ex:
+            # keep exception raised by 'encode', but add this one
+            raise ValueError(f"{self.__class__.__name__}: {str(ex)}")
+
+    def _set_value(self, value):
         if not isinstance(value, self.native_types):
             raise TypeError(
                 "{}, wrong type: {}, expected: {}".format(
                     self.__class__.__name__, type(value), self.native_types
                 )
             )
-
         self.value = value
+
+    @classmethod
+    def _trusted(cls, value):
+        """
+        instance from a valid (decoded) value, without validation by encoding
+        """
+        if not cls._init_trusted:
+            return cls(value)
+        obj = cls.__new__(cls)
+        obj.value = value
+        return obj
+
+    @classmethod
+    def _encode_value(cls, value):
+        """
+        returns tuple (instance, encoded bytes) for a (user) value, validated
+        by the one encode, not on construction and again by encode()
+        """
+        if cls.__init__ is not FormatBase.__init__:
+            obj = cls(value)
+            return obj, obj.encode()
+        obj = cls.__new__(cls)
+        obj._set_value(value)
         try:
-            _ = self.encode()
+            return obj, obj.encode()
         except Exception as ex:
-            # keep exception raised by 'encode', but add this one
-            raise ValueError(f"{self.__class__.__name__}: {str(ex)}")
+            raise ValueError(f"{cls.__name__}: {str(ex)}")
 
     @classmethod
     def decode(cls, value):
-        return cls(bytes(value))
+        return cls._trusted(bytes(value))
 
     def encode(self):
         return self.value
 
+    @classmethod
+    def dtype(cls):
+        """
+        numpy dtype of an encoded value, raises TypeError if the format is not
+        batch decodable (variable length or custom decode)
+        """
+        raise TypeError("{} does not support batch decoding".format(cls.__name__))
+
+    @classmethod
+    def _batch_values(cls, raw):
+        # native values from array of encoded values (of dtype())
+        return raw
+
+    @classmethod
+    def _batch_raw(cls, values):
+        np = _numpy()
+        dtype = cls.dtype()
+        return np.frombuffer(_batch_buffer(values, dtype.itemsize), dtype=dtype)
+
+    @classmethod
+    def decode_batch(cls, values):
+        """
+        decode many values at once into a numpy array (requires numpy)
+
+        values: list of encoded values (e.g. NotificationStream.get_batch() without
+                decode), shorter ones are zero padded like decode(), or one buffer
+                (bytes, memoryview, ..) of concatenated values
+        returns array of the native values, float64 if scaled by exponent
+        """
+        return cls._batch_values(cls._batch_raw(values))
+
     def __str__(self):
         return str(self.value)
 
@@ -75,30 +191,77 @@ class FormatUint(FormatBase):
     native_types = (int, float)
 
     @classmethod
-    def decode(cls, value):
-        acc = 0
-        for idx, v in enumerate(value):
-            if idx == cls.len:
-                break
-            acc += int(v) * pow(2, 8 * idx)
+    def _from_int(cls, acc):
+        # native value of an encoded int, ints are divided exactly (one rounding)
+        exponent = cls.exponent
+        if exponent > 0:
+            return acc * 10**exponent
+        if exponent < 0:
+            return acc / 10**-exponent
+        return acc
 
-        if cls.exponent:
-            n = float(acc) * pow(10, cls.exponent)
-            if cls.exponent:
-                n = round(n, cls.exponent * -1)
-            return cls(n)
-        return cls(acc)
+    @classmethod
+    def _to_int(cls, value):
+        # encoded int of a native value, rounded to nearest, exact for ints
+        exponent = cls.exponent
+        if exponent > 0:
+            if isinstance(value, int):
+                return round(value, -exponent) // 10**exponent
+            return round(value / 10**exponent)
+        if exponent < 0:
+            return round(value * 10**-exponent)
+        return int(value)
+
+    @classmethod
+    def decode(cls, value):
+        acc = int.from_bytes(bytes(value[: cls.len]), "little")
+        return cls._trusted(cls._from_int(acc))
 
     def encode(self):
-        if self.exponent:
-            v = int(self.value / pow(10, self.exponent))
-        else:
-            v = self.value
-        b = []
-        for idx in range(0, self.len):
-            b.append(v % 256)
-            v = int(v / 256)
-        return bytes(b)
+        return self._to_int(self.value).to_bytes(self.len, "little")
+
+    @classmethod
+    def decode_many(cls, values):
+        """
+        decode many values into a list of native values (no format objects)
+
+        values: list of encoded values, shorter ones are zero padded like decode(),
+                or one buffer (bytes, memoryview, ..) of concatenated values
+        """
+        size = cls.len
+        buf = bytes(_batch_buffer(values, size))
+        from_bytes = int.from_bytes
+        from_int = cls._from_int
+        return [
+            from_int(from_bytes(buf[idx : idx + size], "little"))
+            for idx in range(0, len(buf), size)
+        ]
+
+    @classmethod
+    def encode_many(cls, values):
+        """
+        encode many native values, returns bytes of the concatenated values
+        raises ValueError if a value is out of range
+        """
+        size = cls.len
+        to_int = cls._to_int
+        try:
+            return b"".join([to_int(v).to_bytes(size, "little") for v in values])
+        except OverflowError as e:
+            raise ValueError(f"{cls.__name__}: {str(e)}")
+
+    @classmethod
+    def dtype(cls):
+        if cls.decode.__func__ is not FormatUint.decode.__func__:
+            return super().dtype()
+        # no numpy int of this size, bytes are combined in _batch_values
+        return _numpy().dtype(("u1", (cls.len,)))
+
+    @classmethod
+    def _batch_values(cls, raw):
+        np = _numpy()
+        weights = 256 ** np.arange(cls.len, dtype=np.uint64)
+        return _scale_batch(raw.astype(np.uint64) @ weights, cls.exponent)
 
 
 class FormatUint24(FormatUint):
@@ -133,17 +296,47 @@ class FormatPacked(FormatBase):
 
         # acc = unpack(cls.endian + cls.pck_fmt, v)
         acc = cls.pck_fmt.unpack(v)
-        if cls.exponent:
-            return cls(round(float(acc[0]) * pow(10, cls.exponent), cls.exponent * -1))
-        return cls(acc[0])
+        return cls._from_unpacked(acc[0])
 
     def encode(self):
-        if self.exponent:
-            v = int(self.value / pow(10, self.exponent))
-        else:
-            v = int(self.value)
+        return self.pck_fmt.pack(self._pack_value(self.value))
 
-        return self.pck_fmt.pack(v)
+    @classmethod
+    def _pack_value(cls, value):
+        if cls.exponent:
+            return int(value / pow(10, cls.exponent))
+        return int(value)
+
+    @classmethod
+    def _from_unpacked(cls, value):
+        """
+        instance from an unpacked (valid) value, without validation
+        """
+        if cls.exponent:
+            value = round(float(value) * pow(10, cls.exponent), cls.exponent * -1)
+        return cls._trusted(value)
+
+    @classmethod
+    def _is_plain(cls):
+        """
+        de/encoded only by pck_fmt (can be combined into a struct of a FormatTuple)
+        """
+        return (
+            cls.decode.__func__ is FormatPacked.decode.__func__
+            and cls.encode is FormatPacked.encode
+            and cls._pack_value.__func__ is FormatPacked._pack_value.__func__
+            and cls.__init__ is FormatBase.__init__
+        )
+
+    @classmethod
+    def dtype(cls):
+        if not cls._is_plain():
+            return super().dtype()
+        return _numpy().dtype(cls.pck_fmt.format)
+
+    @classmethod
+    def _batch_values(cls, raw):
+        return _scale_batch(raw, cls.exponent)
 
     def __int__(self):
         return int(self.value)
@@ -190,7 +383,7 @@ class FormatSint32(FormatPacked):
 
 
 class FormatSint64(FormatPacked):
-    len = 2
+    len = 8
     pck_fmt = Struct(_endian + "q")
 
 
@@ -216,7 +409,7 @@ class FormatUtf8s(FormatBase):
         # remove trailing NUL
         if l > 0 and s[l - 1] == "\x00":
             s = s[:-1]
-        return cls(s)
+        return cls._trusted(s)
 
     def encode(self):
         return self.value.encode("utf-8")
@@ -243,6 +436,28 @@ class FormatTuple(FormatBase):
     sub_cls_names = []
 
     native_types = (list, tuple)
+
+    __slots__ = ()
+    _init_trusted = True
+
+    # struct combining the leading FormatPacked sub classes, compiled on class
+    # creation (sub_cls must be set in the class body), None: no packed prefix
+    _pck_fmt = None
+    _pck_n = 0
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        codes = []
+        for sub in cls.sub_cls:
+            if not (issubclass(sub, FormatPacked) and sub._is_plain()):
+                break
+            codes.append(sub.pck_fmt.format.lstrip("<>=!@"))
+
+        cls._pck_n = len(codes)
+        cls._pck_fmt = Struct(_endian + "".join(codes)) if codes else None
+        if codes and len(codes) == len(cls.sub_cls) and "len" not in cls.__dict__:
+            cls.len = cls._pck_fmt.size
+
     # here we have a list/tuple as value
     def __init__(self, value):
         try:
@@ -340,7 +555,20 @@ class FormatTuple(FormatBase):
     @classmethod
     def decode(cls, value):
         dec_vals = []
-        for sub in cls.sub_cls:
+        subs = cls.sub_cls
+        pck_fmt = cls._pck_fmt
+        if pck_fmt:
+            # packed prefix with one unpack
+            value = bytes(value)
+            size = pck_fmt.size
+            if len(value) < size:
+                value += bytes(size - len(value))
+            unpacked = pck_fmt.unpack_from(value)
+            dec_vals = [sub._from_unpacked(v) for sub, v in zip(subs, unpacked)]
+            value = value[size:]
+            subs = subs[cls._pck_n :]
+
+        for sub in subs:
             # consume bytes suitable for class, or all
             len_get = len(value) if sub.len == 0 else sub.len
 
@@ -348,11 +576,43 @@ class FormatTuple(FormatBase):
             value = value[len_get:]
             dec_vals.append(sub.decode(v))
 
-        return cls(cls.native_types[0](dec_vals))
+        return cls._trusted(cls.native_types[0](dec_vals))
+
+    def _encode_packed(self):
+        """
+        returns encoded packed prefix with one pack, or None if a value must be
+        encoded by its own (other) format class
+        """
+        packed = []
+        for sub, val in zip(self.sub_cls, self.value[: self._pck_n]):
+            if isinstance(val, FormatBase):
+                if type(val) is not sub:
+                    return None
+                val = val.value
+            elif not isinstance(val, sub.native_types):
+                raise TypeError(
+                    "{}, wrong type: {}, expected: {}".format(
+                        sub.__name__, type(val), sub.native_types
+                    )
+                )
+            packed.append(sub._pack_value(val))
+
+        try:
+            return self._pck_fmt.pack(*packed)
+        except StructError as e:
+            raise ValueError(f"{self.__class__.__name__}: {str(e)}")
 
     def encode(self):
         enc_vals = b""
-        for idx, val in enumerate(self.value):
+        start = 0
+        if self._pck_fmt:
+            packed = self._encode_packed()
+            if packed is not None:
+                enc_vals = packed
+                start = self._pck_n
+
+        for idx in range(start, len(self.value)):
+            val = self.value[idx]
             # add bytes for all classes in order, or all
             if isinstance(val, FormatBase):
                 enc_vals += val.encode()
@@ -361,6 +621,52 @@ class FormatTuple(FormatBase):
 
         return enc_vals
 
+    @classmethod
+    def _batch_names(cls):
+        if cls.sub_cls_names and len(cls.sub_cls_names) == len(cls.sub_cls):
+            return list(cls.sub_cls_names)
+        return ["f{}".format(idx) for idx in range(len(cls.sub_cls))]
+
+    @classmethod
+    def dtype(cls):
+        """
+        numpy structured dtype with a field per sub format
+        """
+        if cls.decode.__func__ is not FormatTuple.decode.__func__:
+            return super().dtype()
+        return _numpy().dtype(
+            [(name, sub.dtype()) for name, sub in zip(cls._batch_names(), cls.sub_cls)]
+        )
+
+    @classmethod
+    def _batch_values(cls, raw, columns=False):
+        np = _numpy()
+        cols = {
+            name: sub._batch_values(raw[name])
+            for name, sub in zip(cls._batch_names(), cls.sub_cls)
+        }
+        if columns:
+            return cols
+        if all(raw.dtype[name] == col.dtype for name, col in cols.items()):
+            # nothing scaled or combined, no copy
+            return raw
+
+        dtype = [(name, col.dtype, col.shape[1:]) for name, col in cols.items()]
+        values = np.empty(len(raw), dtype=dtype)
+        for name, col in cols.items():
+            values[name] = col
+        return values
+
+    @classmethod
+    def decode_batch(cls, values, columns=False):
+        """
+        decode many values at once (requires numpy), see FormatBase.decode_batch
+
+        returns structured array with a field per sub format, named by
+        sub_cls_names (default: f0, f1, ..), or with columns, dict {name: array}
+        """
+        return cls._batch_values(cls._batch_raw(values), columns)
+
     def __str__(self):
         return "(" + ",".join([str(v) for v in self.value]) + ")"
 
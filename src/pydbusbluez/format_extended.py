@@ -42,7 +42,6 @@ class FormatAutoCRF(fmt.FormatBase):
         unit = crf[2].value
         ns = crf[3].value
         description = str(crf[4])
-        fmt_cls_base = fmt.FormatBase
         if fmt == 0 or fmt >= 27:
             raise ValueError('Reserved "format" value in CRF')
         elif fmt not in cls._keys:
@@ -1,16 +1,23 @@
 #!/usr/bin/env python3
+import os
+import socket
 import sys
-from pydbus import SystemBus, Variant
+from pydbus import Variant
+from gi.repository import GLib
 from array import array
-from xml.etree import ElementTree as ET
 from functools import wraps
 
 from .format import *
 from .format_extended import FormatAutoCRF
-from .bzutils import BluezInterfaceObject, ORG_BLUEZ
+from .notify import NotificationStream
+from collections import deque
+from threading import Event
+
+from .bzutils import BluezInterfaceObject, ORG_BLUEZ, LazyBus, wait_for_event
+from .pydbus_backfill import call_with_unix_fd_list
 from .object_manager import BluezObjectManager
 from .device import Device
-from .org_bluetooth import SERVICES, CHARACTERISTICS, DESCRIPTORS
+from .org_bluetooth import SERVICES, CHARACTERISTICS, DESCRIPTORS, database_hash
 
 from . import error as bzerror
 import logging
@@ -49,9 +56,24 @@ def _is_obj_descriptor(obj):
     return obj.split("/")[-1].startswith("desc")
 
 
-def _sub_objects(obj, objects):
-    sub_path = obj + "/"
-    return {sub for sub in objects if sub.startswith(sub_path)}
+def _child_index(objects):
+    """
+    returns dict {parent_obj: [(obj, interfaces), ...]} for objects
+    """
+    childs = {}
+    for obj, ifaces in objects.items():
+        childs.setdefault(obj.rsplit("/", 1)[0], []).append((obj, ifaces))
+    return childs
+
+
+def _uuid_index(entries):
+    """
+    returns dict {uuid: [entry, ...]} for GattService/Characteristic/Descriptor entries
+    """
+    index = {}
+    for entry in entries:
+        index.setdefault(entry.uuid, []).append(entry)
+    return index
 
 
 def _is_sub_object_of(obj, sub):
@@ -59,9 +81,297 @@ def _is_sub_object_of(obj, sub):
     return sub.startswith(sub_path)
 
 
+class _AcquiredNotify(object):
+    """
+    Socket from 'AcquireNotify', watched by the GLib main context, calls
+    handler(value) per notification, value is a memoryview of a reused buffer
+    and only valid during the call.
+
+    Closing the socket (disconnect()) stops the notifications.
+    """
+
+    logger = logging.getLogger(ORG_BLUEZ + ".AcquiredNotify")
+
+    def __init__(self, sock, mtu, handler):
+        self.sock = sock
+        self.handler = handler
+        # large enough for the maximum ATT MTU, the reported mtu may change
+        self._buf = bytearray(max(mtu, 517))
+        self._view = memoryview(self._buf)
+        sock.setblocking(False)
+        self._source = GLib.io_add_watch(
+            sock.fileno(),
+            GLib.PRIORITY_DEFAULT,
+            GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+            self._readable,
+        )
+
+    def _readable(self, fd, condition):
+        if condition & GLib.IO_IN:
+            try:
+                n = self.sock.recv_into(self._buf)
+            except BlockingIOError:
+                return True
+            except OSError:
+                n = 0
+            if n:
+                try:
+                    self.handler(self._view[:n])
+                except Exception:
+                    # keep the watch, an exception would remove it
+                    self.logger.exception("Notification handler failed")
+                return True
+
+        # hang up, error or closed by remote (disconnected, notifications stopped)
+        self._source = None
+        self.disconnect()
+        return False
+
+    def disconnect(self):
+        if self._source is not None:
+            GLib.source_remove(self._source)
+            self._source = None
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+
+class AcquiredWrite(object):
+    """
+    Socket from 'AcquireWrite' for write without response, bypassing dbus
+
+    Each send is one ATT write command with at most chunk_size (mtu - 3) bytes.
+    The socket blocks while the send buffer is full, or raises socket.timeout
+    after timeout seconds, if set.
+
+    Returned by GattCharacteristic.acquire_write(), closing releases it.
+    """
+
+    def __init__(self, sock, mtu, encode=None, timeout=None):
+        self.sock = sock
+        self.mtu = mtu
+        self.chunk_size = mtu - 3
+        self.encode = encode
+        sock.settimeout(timeout)
+
+    def _view(self, value):
+        try:
+            view = memoryview(value)
+        except TypeError:
+            # no buffer protocol object
+            if not self.encode:
+                raise
+            return memoryview(self.encode(value)[1])
+        if not view.c_contiguous:
+            # e.g. sliced with a step, cast() needs C-contiguous memory
+            return memoryview(view.tobytes())
+        return view.cast("B")
+
+    def write(self, value):
+        """
+        write value with one packet, value is a buffer protocol object (not
+        copied, if C-contiguous) or is encoded with the characteristic format
+        """
+        view = self._view(value)
+        if len(view) > self.chunk_size:
+            raise ValueError(
+                "Value length {} exceeds mtu - 3: {}".format(len(view), self.chunk_size)
+            )
+        self.sock.send(view)
+
+    def write_chunked(self, value, chunk_size=None):
+        """
+        write value split into packets of chunk_size (default, max: mtu - 3),
+        returns number of packets
+        """
+        view = self._view(value)
+        if chunk_size is None or chunk_size > self.chunk_size:
+            chunk_size = self.chunk_size
+        send = self.sock.send
+        packets = 0
+        for offset in range(0, len(view), chunk_size):
+            send(view[offset : offset + chunk_size])
+            packets += 1
+        return packets
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class WritePipeline(object):
+    """
+    Pipelined asynchronous writes, keeping up to window 'WriteValue' calls in
+    flight (GattCharacteristic.write_async).
+
+    Writes are issued in submission order, dbus delivers the calls in order
+    and bluez queues the ATT requests in order, so the order per characteristic
+    is preserved. Completions are reported in batches of batch_size tuples
+    (char, value, error), error is None, a BluezError or the exception raised
+    issuing the call, to on_batch(completions), or returned by drain(), if
+    on_batch is None. Exceptions raised by on_batch are logged.
+
+    The replies are dispatched by the GLib main loop, drain() dispatches them
+    itself, if no main loop runs.
+    """
+
+    logger = logging.getLogger(ORG_BLUEZ + ".WritePipeline")
+
+    def __init__(self, window=8, batch_size=16, on_batch=None, timeout=30):
+        if window < 1:
+            raise ValueError("window must be > 0")
+        self.window = window
+        self.batch_size = batch_size
+        self.on_batch = on_batch
+        self.timeout = timeout
+        self.in_flight = 0
+        self.errors = 0
+        self._queue = deque()
+        self._completed = []
+        self._issuing = False
+        self._idle = Event()
+        self._idle.set()
+
+    def write(self, char, value, options=None):
+        """
+        queue write of value to char (GattCharacteristic or GattDescriptor),
+        the value is encoded immediately, so encoding errors are raised here
+        """
+        _, v_enc = char._encode(value)
+        self._idle.clear()
+        self._queue.append((char, value, v_enc, options or {}))
+        self._issue()
+
+    def _issue(self):
+        # completions during write_async (e.g. a call failing synchronously)
+        # re-enter here, the loop below issues the next writes instead
+        if self._issuing:
+            return
+        self._issuing = True
+        try:
+            while self.in_flight < self.window and self._queue:
+                char, value, v_enc, options = self._queue.popleft()
+                self.in_flight += 1
+                try:
+                    char.write_async(
+                        v_enc,
+                        self._write_done,
+                        self._write_failed,
+                        value,
+                        options=options,
+                        timeout=self.timeout,
+                    )
+                except Exception as e:
+                    # not sent, e.g. not resolved or invalid arguments
+                    if not isinstance(e, bzerror.BluezError):
+                        try:
+                            bzerror.getDBusError(e)
+                        except Exception as converted:
+                            e = converted
+                    self._write_failed(char, e, value)
+        finally:
+            self._issuing = False
+
+    def _write_done(self, char, v_obj, value):
+        self._complete(char, value, None)
+
+    def _write_failed(self, char, error, value):
+        self.errors += 1
+        self._complete(char, value, error)
+
+    def _complete(self, char, value, error):
+        self.in_flight -= 1
+        self._completed.append((char, value, error))
+        self._issue()
+        idle = not self.in_flight and not self._queue
+        if len(self._completed) >= self.batch_size or idle:
+            # called from the reply callback, an exception would be reported
+            # as failure of the same call
+            try:
+                self.flush()
+            except Exception:
+                self.logger.exception("on_batch failed")
+        if idle:
+            self._idle.set()
+
+    def flush(self):
+        """
+        report completions collected so far to on_batch
+        """
+        if self.on_batch and self._completed:
+            completed = self._completed
+            self._completed = []
+            self.on_batch(completed)
+
+    @property
+    def pending(self):
+        return self.in_flight + len(self._queue)
+
+    def drain(self, timeout=None):
+        """
+        wait until all writes completed, returns the unreported completions
+        (all, if on_batch is None)
+
+        raises BluezFailedError on timeout
+        """
+        if not wait_for_event(self._idle, timeout):
+            raise bzerror.BluezFailedError(
+                "Timeout, {} writes pending".format(self.pending)
+            )
+        completed = self._completed
+        self._completed = []
+        return completed
+
+
+def read_many(chars, raw=False, timeout=30):
+    """
+    read the values of chars (GattCharacteristics and/or GattDescriptors)
+    concurrently, all 'ReadValue' calls are issued at once, so reading takes
+    about one round trip
+
+    returns dict {char: value or BluezError}, in the order of chars, values are
+    decoded with fmt, unless raw, a read not completed within timeout gets a
+    DBusTimeoutError
+    """
+    # each characteristic is read once, duplicates would never complete
+    chars = list(dict.fromkeys(chars))
+    results = {}
+    done = Event()
+
+    def completed(char, value, data):
+        results[char] = value
+        if len(results) == len(chars):
+            done.set()
+
+    for char in chars:
+        try:
+            char.read_async(completed, completed, None, raw=raw, timeout=timeout)
+        except bzerror.BluezError as e:
+            completed(char, e, None)
+
+    if chars and not done.is_set():
+        wait_for_event(done, timeout)
+
+    return {
+        char: results.get(char, bzerror.DBusTimeoutError("Timeout reading values"))
+        for char in chars
+    }
+
+
+def _readable(chars):
+    return [c for c in chars if c.obj and "read" in c.flags]
+
+
 class Gatt(object):
 
-    bus = SystemBus()
+    bus = LazyBus()
     logger = logging.getLogger(ORG_BLUEZ + ".Gatt")
     logger.setLevel(logging.INFO)
 
@@ -74,9 +384,14 @@ class Gatt(object):
         return new_service
 
     # gatt object can ONLY be created After device is connected
-    def __init__(self, dev, gatt_desc, warn_unmatched=True):
+    def __init__(self, dev, gatt_desc, warn_unmatched=True, cache=None):
+        """
+        cache: GattCache, reuse the resolved database of the last connection,
+               while the remote 'Database Hash' is unchanged
+        """
         self.dev = dev
         self.services = []
+        self.cache = cache
 
         for serv_desc in gatt_desc:
             new_service = self.add_service(serv_desc["name"], serv_desc["uuid"])
@@ -125,42 +440,143 @@ class Gatt(object):
             else:
                 raise bzerror.BluezFailedError("Services are not resolved")
 
-        # get all objects starting with '/org/bluez/adapter/device/'
-        device_sub_objs = BluezObjectManager.get_childs(self.dev)
+        db_hash = None
+        if self.cache:
+            resolved, db_hash = self._resolve_cached(warn_unmatched, resolve_unknown)
+            if resolved:
+                return
+
+        # get all gatt objects below '/org/bluez/adapter/device/' with their
+        # properties (UUID, Flags, ...), from one snapshot
+        gatt_ifaces = (
+            GattService.iface,
+            GattCharacteristic.iface,
+            GattDescriptor.iface,
+        )
+        device_sub_objs = {
+            obj: ifaces
+            for obj, ifaces in BluezObjectManager.get_child_objects(self.dev).items()
+            if any(iface in ifaces for iface in gatt_ifaces)
+        }
+        if self.cache and db_hash is None:
+            # read before resolving, the stored layout must not be newer than the hash
+            db_hash = self._read_database_hash(device_sub_objs)
+
+        crfs = {}
+        _ = self._resolve_services(
+            device_sub_objs,
+            warn_unmatched=warn_unmatched,
+            resolve_unknown=resolve_unknown,
+            crfs=crfs,
+        )
+
+        if self.cache:
+            self._store_cache(device_sub_objs, crfs, db_hash)
+
+    def _read_database_hash(self, objects):
+        """
+        read the remote 'Database Hash' characteristic found in objects,
+        returns bytes or None, if not available
+        """
+        for obj, ifaces in objects.items():
+            props = ifaces.get(GattCharacteristic.iface)
+            if props and props.get("UUID") == database_hash["uuid"]:
+                char = GattCharacteristic(database_hash["name"], props["UUID"], None)
+                char._set_resolved(obj, props)
+                try:
+                    value = char.read(raw=True)
+                except bzerror.BluezError as e:
+                    self.logger.debug("Failed to read database hash: %s", str(e))
+                    return None
+                return bytes(value) if value is not None else None
+        return None
+
+    def _resolve_cached(self, warn_unmatched, resolve_unknown):
+        """
+        resolve from cache, if the cached and remote 'Database Hash' are equal,
+        the object paths are derived from the attribute handles, so they do not
+        change either
+
+        returns tuple (resolved, database_hash), the hash read from the device
+        (None if there is no cache entry or it could not be read)
+        """
+        address = self.dev.address
+        entry = self.cache.load(address) if address else None
+        if not entry:
+            return False, None
+
+        cached_hash, objects, crfs = entry
+        dev_obj = self.dev.obj
+        objects = {dev_obj + obj: ifaces for obj, ifaces in objects.items()}
+
+        db_hash = self._read_database_hash(objects)
+        if db_hash != cached_hash:
+            self.logger.debug("Database hash changed: %s", address)
+            self.cache.invalidate(address)
+            return False, db_hash
+
+        self.logger.debug("Resolved from cache: %s", address)
         _ = self._resolve_services(
-            set(device_sub_objs),
+            objects,
             warn_unmatched=warn_unmatched,
             resolve_unknown=resolve_unknown,
+            crfs={dev_obj + obj: crf for obj, crf in crfs.items()},
         )
+        return True, db_hash
 
-    def _resolve_services(self, objects, warn_unmatched=False, resolve_unknown=True):
+    def _store_cache(self, objects, crfs, db_hash):
+        """
+        store the resolved objects, db_hash: 'Database Hash' read before resolving
+        """
+        address = self.dev.address
+        if not address or db_hash is None:
+            # without hash, the cached database can not be validated
+            return
+
+        dev_obj = self.dev.obj
+        try:
+            self.cache.store(
+                address,
+                db_hash,
+                {obj[len(dev_obj) :]: ifaces for obj, ifaces in objects.items()},
+                {obj[len(dev_obj) :]: crf for obj, crf in crfs.items()},
+            )
+        except (OSError, TypeError, ValueError) as e:
+            self.logger.warning("Failed to store cache for %s: %s", address, str(e))
+
+    def _resolve_services(
+        self, objects, warn_unmatched=False, resolve_unknown=True, crfs=None
+    ):
         """
         match dbus object paths to GattService
+
+        objects: dict {obj: {interface: properties}} (from GetManagedObjects)
+        crfs: dict {char_obj: bytes} with raw CRF descriptor values, used instead
+              of reading them, CRF values read are added
         """
-        # resolve services
         objs_matched = []
-        objs_unmatched = set(objects)
+        childs = _child_index(objects)
+        services = _uuid_index(self.services)
 
-        for obj in [obj for obj in objects if _is_obj_service(obj)]:
+        # resolve services
+        for obj, ifaces in objects.items():
             # only get services
-            objs_unmatched.remove(obj)
+            if GattService.iface not in ifaces:
+                continue
             objs_matched.append(obj)
-            proxy = self.bus.construct(GattService.introspection, ORG_BLUEZ, obj)
+            props = ifaces[GattService.iface]
 
-            uuid = bzerror.getBluezPropOrNone(proxy, "UUID")
+            uuid = props.get("UUID")
             if not uuid:
                 continue
 
             # match service uuids
-            match_found = False
-            for service in self.services:
-                if uuid == service.uuid:
-                    service._proxy = proxy
-                    service._obj = obj
-                    match_found = True
+            if uuid in services:
+                for service in services[uuid]:
+                    service._set_resolved(obj, props)
                     self.logger.debug("Found: %s", str(service))
 
-            if not match_found:
+            else:
                 if warn_unmatched:
                     self.logger.warning(
                         "%s: Not found local: %s (%s)",
@@ -175,8 +591,8 @@ class Gatt(object):
                         new_service = self.add_service(s["name"], uuid)
                     else:
                         new_service = self.add_service(obj.split("/")[-1], uuid)
-                    new_service._proxy = proxy
-                    new_service._obj = obj
+                    new_service._set_resolved(obj, props)
+                    services[uuid] = [new_service]
 
         # warn for services that were not found on remote
         if warn_unmatched:
@@ -189,16 +605,25 @@ class Gatt(object):
                     )
 
         # resolve characteristics
+        resolved = set()
         for service in self.services:
-            if service.obj:
-                sub_objs = _sub_objects(service.obj, objs_unmatched)
-                for obj in service._resolve_characteristics(sub_objs):
-                    objs_unmatched.remove(obj)
-                    objs_matched.append(obj)
+            if service.obj and service.obj not in resolved:
+                resolved.add(service.obj)
+                objs_matched.extend(
+                    service._resolve_characteristics(childs, crfs=crfs)
+                )
 
-        assert 0 == len(objs_unmatched)
         return objs_matched
 
+    def read_many(self, chars=None, raw=False, timeout=30):
+        """
+        read chars concurrently, default: all readable characteristics,
+        see read_many()
+        """
+        if chars is None:
+            chars = _readable(c for s in self.services for c in s.chars)
+        return read_many(chars, raw=raw, timeout=timeout)
+
     def clear(self):
         for s in self.services:
             for c in s.chars:
@@ -261,6 +686,7 @@ class GattService(BluezInterfaceObject):
             <property access="read" name="Device" type="o"/>
             <property access="read" name="Primary" type="b"/>
             <property access="read" name="Includes" type="ao"/>
+            <property access="read" name="Handle" type="q"/>
         </interface>
         <interface name="org.freedesktop.DBus.Properties">
             <method name="Get">
@@ -284,7 +710,8 @@ class GattService(BluezInterfaceObject):
             </signal>
         </interface>
         </node>"""
-    introspection = ET.fromstring(intro_xml)
+
+    static_properties = ("UUID", "Device", "Primary", "Includes", "Handle")
 
     def __init__(self, name, uuid):
         # self.name = name
@@ -299,7 +726,7 @@ class GattService(BluezInterfaceObject):
 
     @property
     def device(self):
-        dev_path = bzerror.getBluezPropOrNone(self._proxy, "Device")
+        dev_path = self._getBluezPropOrNone("Device")
         if dev_path:
             try:
                 return Device(obj=dev_path)
@@ -308,6 +735,19 @@ class GattService(BluezInterfaceObject):
 
         return None
 
+    @property
+    def handle(self):
+        return self._getBluezPropOrNone("Handle")
+
+    def read_many(self, chars=None, raw=False, timeout=30):
+        """
+        read chars concurrently, default: all readable characteristics of the
+        service, see read_many()
+        """
+        if chars is None:
+            chars = _readable(self.chars)
+        return read_many(chars, raw=raw, timeout=timeout)
+
     def add_characteristic(self, name, uuid, fmt=FormatRaw):
         key_char = _make_id(name)
         new_characteristic = GattCharacteristic(name, _convert_to_long_uuid(uuid), self)
@@ -319,35 +759,35 @@ class GattService(BluezInterfaceObject):
         return new_characteristic
 
     def _resolve_characteristics(
-        self, objects, warn_unmatched=False, resolve_unknown=True
+        self, childs, warn_unmatched=False, resolve_unknown=True, crfs=None
     ):
         """
         match dbus object paths to GattCharacterisics
+
+        childs: dict {parent_obj: [(obj, {interface: properties}), ...]}
+        crfs: see Gatt._resolve_services
         """
-        objs_unmatched = objects
         objs_matched = []
+        chars = _uuid_index(self.chars)
 
-        for obj in [obj for obj in objects if _is_obj_characteristic(obj)]:
+        for obj, ifaces in childs.get(self.obj, ()):
+            if GattCharacteristic.iface not in ifaces:
+                continue
 
-            objs_unmatched.remove(obj)
             objs_matched.append(obj)
+            props = ifaces[GattCharacteristic.iface]
 
-            proxy = self.bus.construct(GattCharacteristic.introspection, ORG_BLUEZ, obj)
-
-            uuid = bzerror.getBluezPropOrNone(proxy, "UUID")
+            uuid = props.get("UUID")
             if not uuid:
                 continue
 
             # match characteristic uuids
-            match_found = False
-            for char in self.chars:
-                if uuid == char.uuid:
-                    char._proxy = proxy
-                    char._obj = obj
-                    match_found = True
+            if uuid in chars:
+                for char in chars[uuid]:
+                    char._set_resolved(obj, props)
                     self.logger.debug("Found: %s", str(char))
 
-            if not match_found:
+            else:
                 if warn_unmatched:
                     self.logger.warning(
                         "%s: Not found local: %s (%s)",
@@ -362,8 +802,8 @@ class GattService(BluezInterfaceObject):
                         new_char = self.add_characteristic(c["name"], uuid, c["fmt"])
                     else:
                         new_char = self.add_characteristic(obj.split("/")[-1], uuid)
-                    new_char._proxy = proxy
-                    new_char._obj = obj
+                    new_char._set_resolved(obj, props)
+                    chars[uuid] = [new_char]
 
         # warn for characteristics that were not found on remote
         if warn_unmatched:
@@ -376,14 +816,12 @@ class GattService(BluezInterfaceObject):
                         char.name,
                     )
 
+        resolved = set()
         for char in self.chars:
-            if char.obj:
-                char_sub_objs = _sub_objects(char.obj, objs_unmatched)
-                for obj in char._resolve_descriptors(char_sub_objs):
-                    objs_unmatched.remove(obj)
-                    objs_matched.append(obj)
+            if char.obj and char.obj not in resolved:
+                resolved.add(char.obj)
+                objs_matched.extend(char._resolve_descriptors(childs, crfs=crfs))
 
-        assert 0 == len(objs_unmatched)
         return objs_matched
 
     def __getattr__(self, name):
@@ -434,6 +872,7 @@ class GattCharacteristic(BluezInterfaceObject):
             <property access="read" name="Flags" type="as"/>
             <property access="read" name="WriteAcquired" type="b"/>
             <property access="read" name="NotifyAcquired" type="b"/>
+            <property access="read" name="Handle" type="q"/>
         </interface>
         <interface name="org.freedesktop.DBus.Properties">
             <method name="Get">
@@ -458,7 +897,8 @@ class GattCharacteristic(BluezInterfaceObject):
         </interface>
         </node>
     """
-    introspection = ET.fromstring(intro_xml)
+
+    static_properties = ("UUID", "Service", "Flags", "Handle")
 
     def __init__(self, name, uuid, service):
         self.uuid = uuid.lower()
@@ -468,6 +908,9 @@ class GattCharacteristic(BluezInterfaceObject):
         self.service = service
         self.name = name
         self.descriptors = []
+        self._notify_subscription = None
+        # (device obj, proxy) for reading the MTU, see _device_mtu
+        self._mtu_proxy = None
         super().__init__(None, name)
 
     @bzerror.convertBluezError
@@ -513,58 +956,56 @@ class GattCharacteristic(BluezInterfaceObject):
 
     @bzerror.convertBluezError
     def read_async(
-        self, success_cb, error_cb, user_data, options={}, raw=False, native=True
+        self,
+        success_cb,
+        error_cb,
+        user_data,
+        options=None,
+        raw=False,
+        native=True,
+        timeout=30,
     ):
+        """
+        read value, without waiting for the reply, the callbacks are called
+        from the GLib main loop:
 
-        if self._proxy:
-            if error_cb:
-
-                def _error_cb(proxy, err, data):
-                    try:
-                        bzerror.getDBusError(err)
-                    except Exception as e:
-                        error_cb(self, e, data)
-
-            else:
-                _error_cb = None
+        success_cb(self, value, user_data), value decoded with fmt, unless raw
+        error_cb(self, error: BluezError, user_data)
+        """
+        self._check_resolved("read")
 
-            if success_cb:
+        def _error_cb(proxy, err, data):
+            try:
+                bzerror.getDBusError(err)
+            except Exception as e:
+                err = e
+            if error_cb:
+                error_cb(self, err, data)
+
+        def _success_cb(proxy, result, data):
+            # result contains tuple with one element of bytes list
+            if not len(result):
+                if error_cb:
+                    err = bzerror.BluezFailedError("No value was returned")
+                    error_cb(self, err, data)
+                return
 
-                def _success_cb(proxy, result, data):
-                    # result conaines tuple with one element of bytes list
-                    if len(result):
-                        value = result[0]
-                        try:
-                            if not raw:
-                                v_dec = self.fmt.decode(value)
-                        except bzerror.BluezError as e:
-                            err = bzerror.BluezFormatDecodeError(
-                                "{}: {}, got: {}".format(self, str(e), str(value))
-                            )
-                            error_cb(self, err, data)
-                            return
-                        success_cb(self, v_dec, data)
-                    else:
-                        error_cb(
-                            self,
-                            bzerror.BluezFailedError("No value was returned"),
-                            data,
+            value = result[0]
+            if not raw:
+                try:
+                    value = self.fmt.decode(value)
+                except Exception as e:
+                    if error_cb:
+                        err = bzerror.BluezFormatDecodeError(
+                            "{}: {}, got: {}".format(self, str(e), str(result[0]))
                         )
+                        error_cb(self, err, data)
+                    return
+            if success_cb:
+                success_cb(self, value, data)
 
-            else:
-                _success_cb = None
-
-            # try:
-            self._proxy.ReadValueAsync(_success_cb, _error_cb, user_data, options)
-            # except bzerror.BluezError as e:
-            #     # error_cb(self, e, user_data)
-            #     raise
-
-        elif self.service.device and self.service.device.services_resolved:
-            raise bzerror.BluezDoesNotExistError(f"{self.name} not found")
-
-        raise bzerror.BluezFailedError(
-            f"Failed to read {self.name}, database not resolved"
+        self._proxy.ReadValueAsync(
+            _success_cb, _error_cb, user_data, options or {}, timeout=timeout
         )
 
     @property
@@ -587,23 +1028,27 @@ class GattCharacteristic(BluezInterfaceObject):
     def flags(self):
         return self._getBluezPropOrNone("Flags", fail_ret=[])
 
+    @property
+    def handle(self):
+        return self._getBluezPropOrNone("Handle")
+
+    def _encode(self, value):
+        """
+        returns tuple (value object, encoded bytes) for value (bytes are not encoded)
+        """
+        if isinstance(value, bytes):
+            return value, value
+        if isinstance(value, self.fmt):
+            return value, value.encode()
+        return self.fmt._encode_value(value)
+
     @bzerror.convertBluezError
     def write(self, value, options=None, offset=0, length=0):
         if options is None:
             options = {}
 
         if self._proxy:
-            if isinstance(value, bytes):
-                v_obj = value
-                v_enc = value
-            else:
-                if isinstance(value, self.fmt):
-                    v_obj = value
-                    v_enc = value.encode()
-                else:
-                    v_obj = self.fmt(value)
-                    v_enc = v_obj.encode()
-
+            v_obj, v_enc = self._encode(value)
 
             if "length" in options:
                 length = options["length"]
@@ -611,10 +1056,7 @@ class GattCharacteristic(BluezInterfaceObject):
             if length:
                 if not isinstance(length, int):
                     raise TypeError("Length key in 'options' must be 'int'")
-                if len(v_enc) > length:
-                    v_enc = v_enc[:length]
-                else:
-                    raise ValueError("Length must be < encoded length")
+                v_enc = v_enc[:length]
             if offset > 0:
                 if len(v_enc) <= offset:
                     raise ValueError("Offset is bigger than encoded length")
@@ -636,6 +1078,170 @@ class GattCharacteristic(BluezInterfaceObject):
                 f"Failed to write {self.name}, database not resolved"
             )
 
+    # maximum length of an attribute value
+    max_value_length = 512
+
+    def _device_mtu(self):
+        """
+        ATT MTU of the device (23, if unknown), from the object manager's mirror
+        if enabled, else one 'Get' of the MTU property with a device proxy,
+        constructed once (without constructing a Device)
+        """
+        service = getattr(self, "service", None) or self.char.service
+        dev_obj = service._static_props.get("Device") if service else None
+        if not dev_obj and self.obj:
+            # /org/bluez/hciX/dev_XX_XX_XX_XX_XX_XX/serviceXXXX/charXXXX
+            dev_obj = "/".join(self.obj.split("/")[:5])
+        if not dev_obj:
+            return 23
+
+        if BluezObjectManager.mirrored():
+            props = BluezObjectManager.objects().get(dev_obj, {}).get(Device.iface)
+            if props is not None:
+                return props.get("MTU") or 23
+
+        if not self._mtu_proxy or self._mtu_proxy[0] != dev_obj:
+            proxy = self.bus.construct(Device.introspection, ORG_BLUEZ, dev_obj)
+            self._mtu_proxy = (dev_obj, proxy)
+        return bzerror.getBluezPropOrNone(self._mtu_proxy[1], "MTU", 0) or 23
+
+    def _check_resolved(self, action):
+        if not self._proxy:
+            service = getattr(self, "service", None) or self.char.service
+            if service and service.device and service.device.services_resolved:
+                raise bzerror.BluezDoesNotExistError(f"{self.name} not found")
+            raise bzerror.BluezFailedError(
+                f"Failed to {action} {self.name}, database not resolved"
+            )
+
+    def read_chunks(self, offset=0, chunk_size=None, timeout=30):
+        """
+        generator reading the raw value from offset with 'ReadValue' requests,
+        yields each chunk (bytes) as it arrives
+
+        BlueZ already does the long read (read blob requests) from offset, by
+        default the value ends with the first reply.
+
+        chunk_size: read in chunks with increasing offset, for servers
+                    returning at most chunk_size bytes per 'ReadValue', a
+                    shorter chunk or an invalid offset error ends the value
+        """
+        self._check_resolved("read")
+        read_value = self._proxy.ReadValue
+        start = offset
+        while offset < self.max_value_length:
+            options = {"offset": Variant("q", offset)} if offset else {}
+            try:
+                chunk = bytes(
+                    bzerror.callBluezFunction(read_value, options, timeout=timeout)
+                )
+            except bzerror.BluezInvalidOffsetError:
+                if chunk_size is None or offset == start:
+                    raise
+                # previous chunk ended exactly at the end of the value
+                return
+            if not chunk:
+                return
+            yield chunk
+            if chunk_size is None or len(chunk) < chunk_size:
+                return
+            offset += len(chunk)
+
+    @bzerror.convertBluezError
+    def read_long(self, into=None, offset=0, chunk_size=None, raw=True, timeout=30):
+        """
+        read the (long) value from offset (see read_chunks), with chunk_size
+        the chunks are reassembled in one preallocated buffer
+
+        into: writable buffer (bytearray, memoryview) to read into, returns the
+              number of bytes read, default: returns bytearray with the value
+        raw: if False, return the value decoded with fmt
+        """
+        buf = bytearray(self.max_value_length) if into is None else into
+        view = memoryview(buf)
+        pos = 0
+        for chunk in self.read_chunks(offset, chunk_size, timeout=timeout):
+            end = pos + len(chunk)
+            if end > len(view):
+                raise ValueError(
+                    "Value does not fit into buffer ({})".format(len(view))
+                )
+            view[pos:end] = chunk
+            pos = end
+
+        if into is not None:
+            return pos
+        del view
+        del buf[pos:]
+        if raw:
+            return buf
+        return self.fmt.decode(buf)
+
+    def write_chunks(self, value, offset=0, chunk_size=None, timeout=30):
+        """
+        generator writing value with 'WriteValue' requests with increasing
+        offset, yields the offset after each written chunk
+
+        value: buffer protocol object, or value encoded with fmt
+        chunk_size: default: Device.MTU - 5 (prepare write request)
+        """
+        self._check_resolved("write")
+        try:
+            view = memoryview(value).cast("B")
+        except TypeError:
+            view = memoryview(self._encode(value)[1])
+        if chunk_size is None:
+            chunk_size = self._device_mtu() - 5
+
+        write_value = self._proxy.WriteValue
+        for pos in range(0, len(view), chunk_size):
+            chunk = view[pos : pos + chunk_size]
+            options = {"offset": Variant("q", offset)} if offset else {}
+            bzerror.callBluezFunction(
+                write_value, bytes(chunk), options, timeout=timeout
+            )
+            offset += len(chunk)
+            yield offset
+
+    @bzerror.convertBluezError
+    def write_long(self, value, offset=0, chunk_size=None, timeout=30):
+        """
+        write (long) value in chunks (see write_chunks), returns the end offset
+        """
+        for offset in self.write_chunks(value, offset, chunk_size, timeout=timeout):
+            pass
+        return offset
+
+    @bzerror.convertBluezError
+    def write_async(
+        self, value, success_cb, error_cb, user_data, options=None, timeout=30
+    ):
+        """
+        write value, without waiting for the reply, the callbacks are called
+        from the GLib main loop:
+
+        success_cb(self, value_obj, user_data)
+        error_cb(self, error: BluezError, user_data)
+        """
+        self._check_resolved("write")
+        v_obj, v_enc = self._encode(value)
+
+        def _success_cb(proxy, result, data):
+            if success_cb:
+                success_cb(self, v_obj, data)
+
+        def _error_cb(proxy, err, data):
+            try:
+                bzerror.getDBusError(err)
+            except Exception as e:
+                err = e
+            if error_cb:
+                error_cb(self, err, data)
+
+        self._proxy.WriteValueAsync(
+            _success_cb, _error_cb, user_data, v_enc, options or {}, timeout=timeout
+        )
+
     @bzerror.convertBluezError
     def onValueChanged(self, func, *args, **kwargs):
         # to remove
@@ -675,6 +1281,115 @@ class GattCharacteristic(BluezInterfaceObject):
             except bzerror.BluezError:
                 pass
 
+    def notification_stream(
+        self, maxlen=64, policy=NotificationStream.DROP_OLDEST, raw=False, acquire=True
+    ):
+        """
+        returns NotificationStream buffering the notified values, notifications
+        are enabled. The values are decoded with fmt on dequeue, unless raw.
+
+        acquire: receive through the 'AcquireNotify' socket, if available,
+                 see _subscribe_notifications
+
+        stream.close() stops buffering (and acquired notifications),
+        notifyOff() disables notifications
+        """
+        if not self.obj:
+            raise bzerror.BluezDoesNotExistError("Object not initialized: " + str(self))
+        decode = None if raw else self.fmt.decode
+        stream = NotificationStream(maxlen, policy, decode=decode)
+
+        def notified(value):
+            # values from the acquired socket are only valid during the call
+            stream.push(bytes(value))
+
+        stream.subscription = self._subscribe_notifications(notified, acquire)
+        return stream
+
+    @bzerror.convertBluezError
+    def _acquire(self, method):
+        """
+        call 'AcquireNotify' or 'AcquireWrite', returns tuple (socket, mtu)
+        """
+        if not self._proxy:
+            raise bzerror.BluezDoesNotExistError("Object not initialized: " + str(self))
+        (fd_index, mtu), fds = call_with_unix_fd_list(self._proxy, method, {})
+        fd = fds.pop(fd_index)
+        for unused_fd in fds:
+            os.close(unused_fd)
+        return socket.socket(fileno=fd), mtu
+
+    def acquire_write(self, timeout=None):
+        """
+        returns AcquiredWrite for write without response through the
+        'AcquireWrite' socket, respecting the negotiated MTU
+
+        timeout: seconds a write blocks on a full send buffer, None: forever
+        """
+        sock, mtu = self._acquire("AcquireWrite")
+        return AcquiredWrite(sock, mtu, encode=self._encode, timeout=timeout)
+
+    def _subscribe_notifications(self, handler, acquire=True):
+        """
+        subscribe handler(value) to notifications and enable them
+
+        If acquire, the notifications are received through the 'AcquireNotify'
+        socket, bypassing dbus, value is then a memoryview valid only during the
+        call. If not available, falls back to PropertiesChanged signals.
+
+        returns subscription with disconnect() method, disconnecting the socket
+        disables the notifications, the signal subscription does not
+        """
+        if acquire:
+            try:
+                sock, mtu = self._acquire("AcquireNotify")
+                self.logger.debug("Acquired notify: %s mtu: %d", str(self), mtu)
+                return _AcquiredNotify(sock, mtu, handler)
+            except bzerror.BluezError as e:
+                self.logger.debug("AcquireNotify failed: %s: %s", str(self), str(e))
+
+        def value_changed(properties_values, invalidated_properties):
+            if "Value" in properties_values:
+                handler(properties_values["Value"])
+
+        subscription = self._subscribe_properties_changed(value_changed)
+        try:
+            self.notifyOn()
+        except Exception:
+            subscription.disconnect()
+            raise
+        return subscription
+
+    @bzerror.convertBluezError
+    def onValueNotified(self, func, *args, acquire=True, **kwargs):
+        """
+        Enable notifications and call func(self, value, *args, **kwargs) with the
+        decoded value per notification. The 'AcquireNotify' socket is used, if
+        acquire and available, else PropertiesChanged signals.
+
+        func: None disables the notifications
+        """
+        subscription = self._notify_subscription
+        if subscription:
+            self._notify_subscription = None
+            subscription.disconnect()
+            # closing an acquired socket already stopped the notifications,
+            # bluez rejects StopNotify then
+            if not isinstance(subscription, _AcquiredNotify):
+                self.notifyOff()
+        if not func:
+            return
+
+        if not self.obj:
+            raise bzerror.BluezDoesNotExistError("Object not initialized: " + str(self))
+
+        decode = self.fmt.decode
+
+        def notified(value):
+            func(self, decode(value), *args, **kwargs)
+
+        self._notify_subscription = self._subscribe_notifications(notified, acquire)
+
     @property
     def notifying(self):
         if self.obj:
@@ -703,33 +1418,36 @@ class GattCharacteristic(BluezInterfaceObject):
         self.descriptors.append(new_descriptor)
         return new_descriptor
 
-    def _resolve_descriptors(self, objects, warn_unmatched=False, resolve_unknown=True):
+    def _resolve_descriptors(
+        self, childs, warn_unmatched=False, resolve_unknown=True, crfs=None
+    ):
         """
         match dbus object paths to GattDescriptors
+
+        childs: dict {parent_obj: [(obj, {interface: properties}), ...]}
+        crfs: see Gatt._resolve_services
         """
-        objs_unmatched = objects.copy()
         objs_matched = []
+        descriptors = _uuid_index(self.descriptors)
 
-        for obj in objects:
-
-            assert _is_obj_descriptor(obj)
+        for obj, ifaces in childs.get(self.obj, ()):
+            if GattDescriptor.iface not in ifaces:
+                continue
 
-            proxy = self.bus.construct(GattDescriptor.introspection, ORG_BLUEZ, obj)
+            objs_matched.append(obj)
+            props = ifaces[GattDescriptor.iface]
 
-            uuid = bzerror.getBluezPropOrNone(proxy, "UUID")
+            uuid = props.get("UUID")
             if not uuid:
                 continue
 
             # match descriptor uuids
-            match_found = False
-            for desc in self.descriptors:
-                if uuid == desc.uuid:
-                    desc._proxy = proxy
-                    desc._obj = obj
-                    match_found = True
+            if uuid in descriptors:
+                for desc in descriptors[uuid]:
+                    desc._set_resolved(obj, props)
                     self.logger.debug("Found: %s", str(desc))
 
-            if not match_found:
+            else:
                 if warn_unmatched:
                     self.logger.warning(
                         "%s: Not found local: %s (%s)",
@@ -744,23 +1462,26 @@ class GattCharacteristic(BluezInterfaceObject):
                         new_desc = self.add_descriptor(d["name"], uuid, d["fmt"])
                     else:
                         new_desc = self.add_descriptor(obj.split("/")[-1], uuid)
-                    new_desc._proxy = proxy
-                    new_desc._obj = obj
+                    new_desc._set_resolved(obj, props)
+                    descriptors[uuid] = [new_desc]
 
-            objs_unmatched.remove(obj)
-            objs_matched.append(obj)
-
-            # check if format must be adjusted
-            if issubclass(self.fmt, FormatAutoCRF):
-                crfs = [x for x in self.descriptors if x.name == "CRF"]
-                if any(crfs):
-                    try:
-                        crf = crfs[0].read()
-                        fmt = FormatAutoCRF.fromCRF(_make_id(self.name), crf)
-                        self.fmt = fmt
-                    except Exception as e:
-                        self.logger.warning("%s: %s", self.__class__.__name__, str(e))
-                        raise
+        # check if format must be adjusted
+        if issubclass(self.fmt, FormatAutoCRF):
+            crf_descs = [x for x in self.descriptors if x.name == "CRF" and x.obj]
+            if any(crf_descs):
+                try:
+                    if crfs is not None and self.obj in crfs:
+                        crf_raw = crfs[self.obj]
+                    else:
+                        crf_raw = crf_descs[0].read(raw=True)
+                        if crfs is not None:
+                            crfs[self.obj] = bytes(crf_raw)
+                    crf = crf_descs[0].fmt.decode(crf_raw)
+                    fmt = FormatAutoCRF.fromCRF(_make_id(self.name), crf)
+                    self.fmt = fmt
+                except Exception as e:
+                    self.logger.warning("%s: %s", self.__class__.__name__, str(e))
+                    raise
 
         # warn for descriptors that were not found on remote
         if warn_unmatched:
@@ -774,7 +1495,6 @@ class GattCharacteristic(BluezInterfaceObject):
                         desc.name,
                     )
 
-        assert 0 == len(objs_unmatched)
         return objs_matched
 
     def __getattr__(self, name):
@@ -786,7 +1506,7 @@ class GattCharacteristic(BluezInterfaceObject):
 
 class GattDescriptor(BluezInterfaceObject):
 
-    iface = "org.bluez.{}1".format(__name__)
+    iface = "org.bluez.{}1".format(__qualname__)
     intro_xml = """<?xml version="1.0" ?>
         <!DOCTYPE node
         PUBLIC '-//freedesktop//DTD D-BUS Object Introspection 1.0//EN'
@@ -809,6 +1529,8 @@ class GattDescriptor(BluezInterfaceObject):
             <property access="read" name="UUID" type="s"/>
             <property access="read" name="Characteristic" type="o"/>
             <property access="read" name="Value" type="ay"/>
+            <property access="read" name="Flags" type="as"/>
+            <property access="read" name="Handle" type="q"/>
         </interface>
         <interface name="org.freedesktop.DBus.Properties">
             <method name="Get">
@@ -833,7 +1555,7 @@ class GattDescriptor(BluezInterfaceObject):
         </interface>
         </node>"""
 
-    introspection = ET.fromstring(intro_xml)
+    static_properties = ("UUID", "Characteristic", "Flags", "Handle")
 
     def __init__(self, name, uuid, char):
         # self.name = name
@@ -842,6 +1564,7 @@ class GattDescriptor(BluezInterfaceObject):
         self._obj = None
         self._proxy = None
         self.char = char
+        self._mtu_proxy = None
 
         super().__init__(None, name)
 
@@ -866,4 +1589,15 @@ class GattDescriptor(BluezInterfaceObject):
     read = GattCharacteristic.read
     read_async = GattCharacteristic.read_async
     write = GattCharacteristic.write
+    write_async = GattCharacteristic.write_async
+    max_value_length = GattCharacteristic.max_value_length
+    _device_mtu = GattCharacteristic._device_mtu
+    _check_resolved = GattCharacteristic._check_resolved
+    read_chunks = GattCharacteristic.read_chunks
+    read_long = GattCharacteristic.read_long
+    write_chunks = GattCharacteristic.write_chunks
+    write_long = GattCharacteristic.write_long
+    _encode = GattCharacteristic._encode
     value = GattCharacteristic.value
+    flags = GattCharacteristic.flags
+    handle = GattCharacteristic.handle
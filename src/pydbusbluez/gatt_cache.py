@@ -0,0 +1,97 @@
+import json
+import os
+import logging
+
+from .bzutils import ORG_BLUEZ
+
+
+class GattCache(object):
+    """Persistent cache of resolved GATT databases, one file per device address
+
+    An entry holds the GATT objects (relative to the device path) with their
+    static properties and the raw CRF descriptor values, which select the
+    format of FormatAutoCRF characteristics. Entries are only valid, as long
+    as the 'Database Hash' characteristic of the device has the stored value.
+
+    path: cache directory, default: $XDG_CACHE_HOME/pydbusbluez/gatt
+    """
+
+    version = 1
+    logger = logging.getLogger(ORG_BLUEZ + ".GattCache")
+
+    # properties stored per object, the others are either object paths or
+    # change at runtime
+    properties = ("UUID", "Flags", "Handle", "Primary")
+
+    def __init__(self, path=None):
+        if path is None:
+            cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+                os.path.expanduser("~"), ".cache"
+            )
+            path = os.path.join(cache_home, "pydbusbluez", "gatt")
+        self.path = path
+
+    def _file(self, address):
+        return os.path.join(self.path, address.upper().replace(":", "_") + ".json")
+
+    def load(self, address):
+        """
+        returns tuple (database_hash, objects, crfs) for address or None
+
+        database_hash: bytes
+        objects: dict {relative_obj: {interface: properties}}, relative to the device
+        crfs: dict {relative_char_obj: bytes} with the raw CRF descriptor values
+        """
+        try:
+            with open(self._file(address), encoding="utf-8") as f:
+                entry = json.load(f)
+            if entry.get("version") != self.version:
+                return None
+            return (
+                bytes.fromhex(entry["database_hash"]),
+                entry["objects"],
+                {obj: bytes.fromhex(crf) for obj, crf in entry["crfs"].items()},
+            )
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            self.logger.warning("Invalid cache entry for %s: %s", address, str(e))
+        return None
+
+    def store(self, address, database_hash, objects, crfs):
+        """
+        store entry for address, arguments see load()
+        """
+        entry = {
+            "version": self.version,
+            "address": address,
+            "database_hash": bytes(database_hash).hex(),
+            "objects": {
+                obj: {
+                    iface: {
+                        prop: value
+                        for prop, value in props.items()
+                        if prop in self.properties
+                    }
+                    for iface, props in ifaces.items()
+                }
+                for obj, ifaces in objects.items()
+            },
+            "crfs": {obj: bytes(crf).hex() for obj, crf in crfs.items()},
+        }
+
+        os.makedirs(self.path, exist_ok=True)
+        file = self._file(address)
+        tmp_file = file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_file, file)
+
+    def invalidate(self, address):
+        try:
+            os.remove(self._file(address))
+        except FileNotFoundError:
+            pass
+
+
+__all__ = ("GattCache",)
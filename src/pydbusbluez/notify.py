@@ -0,0 +1,152 @@
+from collections import deque
+from threading import Condition
+
+
+class NotificationStream(object):
+    """Bounded buffer of notified values of a characteristic
+
+    Values are appended by the PropertiesChanged handler, without decoding,
+    and decoded when dequeued. If the buffer is full, the overflow policy
+    decides what is dropped:
+
+    DROP_OLDEST:     remove the oldest buffered value
+    DROP_NEWEST:     discard the new value
+    COALESCE_LATEST: replace the newest buffered value with the new one
+
+    maxlen: buffer size (> 0)
+    policy: one of the above
+    decode: function applied to values on dequeue (e.g. fmt.decode), None for raw values
+    """
+
+    DROP_OLDEST = "drop-oldest"
+    DROP_NEWEST = "drop-newest"
+    COALESCE_LATEST = "coalesce-latest"
+
+    policies = (DROP_OLDEST, DROP_NEWEST, COALESCE_LATEST)
+
+    def __init__(self, maxlen=64, policy=DROP_OLDEST, decode=None):
+        if maxlen < 1:
+            raise ValueError("maxlen must be > 0")
+        if policy not in self.policies:
+            raise ValueError(
+                "Invalid policy: {}, must be one of {}".format(policy, self.policies)
+            )
+        self.maxlen = maxlen
+        self.policy = policy
+        self.decode = decode
+        self.received = 0
+        self.dropped = 0
+        self.subscription = None
+        self._buffer = deque()
+        self._cond = Condition()
+
+    def push(self, value):
+        """
+        append value, applying the overflow policy, returns False if a value was dropped
+        """
+        with self._cond:
+            self.received += 1
+            buffer = self._buffer
+            if len(buffer) < self.maxlen:
+                buffer.append(value)
+                self._cond.notify()
+                return True
+
+            self.dropped += 1
+            if self.policy == self.DROP_OLDEST:
+                buffer.popleft()
+                buffer.append(value)
+            elif self.policy == self.COALESCE_LATEST:
+                buffer[-1] = value
+            return False
+
+    def get(self, default=None):
+        """
+        returns oldest value or default, if empty
+        """
+        with self._cond:
+            if not self._buffer:
+                return default
+            value = self._buffer.popleft()
+        return self.decode(value) if self.decode else value
+
+    def get_batch(self, max_items=None):
+        """
+        returns list with up to max_items (default: all) oldest values
+
+        If decoding a value fails, the values decoded before are returned and
+        the rest is put back in front of the buffer. If the oldest value fails,
+        it is dropped and the error raised, like get().
+        """
+        with self._cond:
+            buffer = self._buffer
+            if max_items is None or max_items >= len(buffer):
+                values = list(buffer)
+                buffer.clear()
+            else:
+                values = [buffer.popleft() for _ in range(max_items)]
+
+        if not self.decode:
+            return values
+        decode = self.decode
+        decoded = []
+        for i, value in enumerate(values):
+            try:
+                decoded.append(decode(value))
+            except Exception:
+                if i:
+                    self._requeue(values[i:])
+                    return decoded
+                self._requeue(values[1:])
+                raise
+        return decoded
+
+    def _requeue(self, values):
+        """
+        put values back in front of the buffer, as far as they fit, the oldest
+        are dropped
+        """
+        with self._cond:
+            buffer = self._buffer
+            room = self.maxlen - len(buffer)
+            if len(values) > room:
+                self.dropped += len(values) - room
+                values = values[len(values) - room :]
+            buffer.extendleft(reversed(values))
+
+    def wait(self, timeout=None):
+        """
+        wait until a value is buffered, returns True, or False on timeout
+
+        Values are only pushed by a GLib main loop (running in another thread)
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: bool(self._buffer), timeout)
+
+    def clear(self):
+        with self._cond:
+            self._buffer.clear()
+
+    def close(self):
+        """
+        stop receiving values, buffered values can still be dequeued
+        """
+        if self.subscription:
+            self.subscription.disconnect()
+            self.subscription = None
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def __str__(self):
+        return "{}(policy='{}',len={}/{},received={},dropped={})".format(
+            self.__class__.__name__,
+            self.policy,
+            len(self),
+            self.maxlen,
+            self.received,
+            self.dropped,
+        )
+
+
+__all__ = ("NotificationStream",)
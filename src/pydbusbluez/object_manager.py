@@ -1,15 +1,143 @@
-from pydbus import SystemBus
-from xml.etree import ElementTree as ET
-
 from . import error as bzerror
-from .bzutils import ORG_BLUEZ, BluezInterfaceObject
+from .bzutils import ORG_BLUEZ, BluezInterfaceObject, LazyBus, LazyIntrospection
 import logging
 
 
+class PathTree(object):
+    """Index of dbus object paths, keyed by path segments
+
+    Every node may hold a value, nodes without value only exist as
+    parents of other nodes. Lookups of (direct) childs cost O(result size)
+    instead of a scan over all paths.
+    """
+
+    class _Node(object):
+        __slots__ = ("path", "children", "value")
+
+        def __init__(self, path):
+            self.path = path
+            self.children = {}
+            self.value = PathTree._empty
+
+    _empty = object()
+
+    def __init__(self, paths=()):
+        self._root = self._Node("/")
+        self._len = 0
+        for path in paths:
+            self.set(path)
+
+    @staticmethod
+    def _split(path):
+        return [seg for seg in path.split("/") if seg]
+
+    def _find(self, path):
+        node = self._root
+        for seg in self._split(path):
+            node = node.children.get(seg)
+            if node is None:
+                return None
+        return node
+
+    def set(self, path, value=True):
+        node = self._root
+        for seg in self._split(path):
+            child = node.children.get(seg)
+            if child is None:
+                child = self._Node(
+                    node.path + seg if node is self._root else node.path + "/" + seg
+                )
+                node.children[seg] = child
+            node = child
+        if node.value is self._empty:
+            self._len += 1
+        node.value = value
+
+    def get(self, path, default=None):
+        node = self._find(path)
+        if node is None or node.value is self._empty:
+            return default
+        return node.value
+
+    def remove(self, path):
+        """remove value of path, returns True if path was set"""
+        nodes = [self._root]
+        for seg in self._split(path):
+            node = nodes[-1].children.get(seg)
+            if node is None:
+                return False
+            nodes.append(node)
+
+        node = nodes[-1]
+        if node.value is self._empty:
+            return False
+        node.value = self._empty
+        self._len -= 1
+
+        # prune nodes, that neither hold a value nor have children
+        segs = self._split(path)
+        while len(nodes) > 1:
+            node = nodes.pop()
+            if node.children or node.value is not self._empty:
+                break
+            del nodes[-1].children[segs[len(nodes) - 1]]
+        return True
+
+    def clear(self):
+        self._root = self._Node("/")
+        self._len = 0
+
+    def ancestors(self, path):
+        """
+        yields (path, value) for all set paths above path, starting at the root
+        """
+        node = self._root
+        if node.value is not self._empty:
+            yield node.path, node.value
+        for seg in self._split(path)[:-1]:
+            node = node.children.get(seg)
+            if node is None:
+                return
+            if node.value is not self._empty:
+                yield node.path, node.value
+
+    def childs(self, path, only_direct=False):
+        """
+        returns list of all set paths below path (path itself excluded)
+
+        only_direct: only return paths exactly one level below path
+        """
+        node = self._find(path)
+        if node is None:
+            return []
+
+        if only_direct:
+            return [
+                child.path
+                for child in node.children.values()
+                if child.value is not self._empty
+            ]
+
+        l = []
+        stack = list(reversed(node.children.values()))
+        while stack:
+            node = stack.pop()
+            if node.value is not self._empty:
+                l.append(node.path)
+            stack.extend(reversed(node.children.values()))
+        return l
+
+    def __contains__(self, path):
+        node = self._find(path)
+        return node is not None and node.value is not self._empty
+
+    def __len__(self):
+        return self._len
+
+
 class BluezObjectManager(object):
-    bus = SystemBus()
+    bus = LazyBus()
     logger = logging.getLogger(__name__)
-    logging.basicConfig()
     logger.setLevel(logging.ERROR)
     manager = None
 
@@ -38,7 +166,7 @@ class BluezObjectManager(object):
         </interface>
         </node>
     """
-    introspection = ET.fromstring(intro_xml)
+    introspection = LazyIntrospection()
 
     def __init__(self):
         self._proxy = BluezObjectManager.bus.construct(
@@ -47,6 +175,12 @@ class BluezObjectManager(object):
         self.obj = "/"
         self.interfaces_added_cbs = {}
         self.interfaces_removed_cbs = {}
+        # InterfacesAdded callbacks indexed by parent path
+        self._added_cbs_index = PathTree()
+        # local copy of GetManagedObjects, only maintained if mirror is enabled
+        self._mirror = None
+        self._mirror_index = PathTree()
+        self._mirror_props_sub = None
 
     @classmethod
     def get(cls):
@@ -57,22 +191,97 @@ class BluezObjectManager(object):
 
     @classmethod
     def objects(cls):
+        """
+        returns dict with all managed objects: {obj: {interface: {property: value}}}
+
+        If the mirror is enabled (see enable_mirror), the local mirror is returned
+        without any bus traffic. It must not be modified by the caller.
+        """
+        om = cls.get()
+        if om._mirror is not None:
+            return om._mirror
         try:
-            objs = cls.get()._proxy.GetManagedObjects()
+            objs = om._proxy.GetManagedObjects()
         except Exception:
             objs = []
         return objs
 
     @classmethod
-    def get_childs(cls, parent="/org/bluez", only_direct=False):
+    def enable_mirror(cls, enable=True):
+        """
+        Keep a local mirror of all managed objects
+
+        The managed objects are fetched once, afterwards the mirror is kept
+        current from the InterfacesAdded, InterfacesRemoved and PropertiesChanged
+        signals. All queries (objects, get_childs, childs, ...) are then served
+        from the mirror. Needs a running GLib main loop to receive the updates.
+
+        enable: enable/disable the mirror
+        """
+        om = cls.get()
+        if enable:
+            if om._mirror is None:
+                om._start_mirror()
+        elif om._mirror is not None:
+            om._stop_mirror()
 
-        if isinstance(parent, BluezInterfaceObject):
-            if not parent.obj:
-                raise ValueError("parent's 'obj' property is not set")
-            filter = parent.obj + "/"
-        else:
-            filter = parent + "/"
+    @classmethod
+    def mirrored(cls):
+        return cls.get()._mirror is not None
+
+    @bzerror.convertBluezError
+    def _start_mirror(self):
+        # subscribe first, to not miss changes between the fetch and the subscriptions
+        self._proxy.onInterfacesAdded = self._interfaces_added
+        self._proxy.onInterfacesRemoved = self._interfaces_removed
+        self._mirror_props_sub = self.bus.subscribe(
+            sender=ORG_BLUEZ,
+            iface="org.freedesktop.DBus.Properties",
+            signal="PropertiesChanged",
+            signal_fired=self._mirror_properties_changed,
+        )
+        try:
+            self._mirror = self._proxy.GetManagedObjects()
+        except Exception:
+            self._stop_mirror()
+            raise
+        self._mirror_index = PathTree(self._mirror)
+
+    def _stop_mirror(self):
+        if self._mirror_props_sub:
+            self._mirror_props_sub.unsubscribe()
+            self._mirror_props_sub = None
+        self._mirror = None
+        self._mirror_index.clear()
+        if not self.interfaces_added_cbs:
+            try:
+                self._proxy.onInterfacesAdded = None
+            except AttributeError:
+                pass
+        if not self.interfaces_removed_cbs:
+            try:
+                self._proxy.onInterfacesRemoved = None
+            except AttributeError:
+                pass
+
+    def _mirror_properties_changed(self, sender, obj, iface, signal, params):
+        props_iface, changed, invalidated = params
+        try:
+            props = self._mirror[obj][props_iface]
+        except (KeyError, TypeError):
+            return
+
+        props.update(changed)
+        for prop in invalidated:
+            props.pop(prop, None)
+
+    @classmethod
+    def _child_paths(cls, parent, only_direct):
+        om = cls.get()
+        if om._mirror is not None:
+            return om._mirror_index.childs(parent, only_direct=only_direct)
 
+        filter = parent + "/"
         objs = cls.objects()
 
         if only_direct:
@@ -85,25 +294,67 @@ class BluezObjectManager(object):
 
         return [obj for obj in objs if obj.startswith(filter)]
 
-    def childs(self, parent, only_direct=False):
+    @classmethod
+    def get_child_objects(cls, parent="/org/bluez", only_direct=False):
+        """
+        returns dict {obj: {interface: properties}} of all objects below parent,
+        from a single managed objects snapshot
+
+        parent: object path or BluezInterfaceObject
+        only_direct: only return direct childs of parent
+        """
         if isinstance(parent, BluezInterfaceObject):
             if not parent.obj:
-                raise TypeError("parent's 'obj' property is not set")
-            filter = parent.obj + "/"
+                raise ValueError("parent's 'obj' property is not set")
+            parent = parent.obj
+
+        om = cls.get()
+        if om._mirror is not None:
+            objs = om._mirror
+            paths = om._mirror_index.childs(parent, only_direct=only_direct)
         else:
+            objs = cls.objects()
             filter = parent + "/"
-
-        objs = self.__class__.objects()
-
-        if only_direct:
             pathlen = len(filter.split("/"))
-            return [
+            paths = [
                 obj
                 for obj in objs
-                if obj.startswith(filter) and pathlen == len(obj.split("/"))
+                if obj.startswith(filter)
+                and (not only_direct or pathlen == len(obj.split("/")))
             ]
 
-        return [obj for obj in objs if obj.startswith(filter)]
+        return {obj: objs[obj] for obj in paths}
+
+    @classmethod
+    def get_interface_objects(cls, iface, parent="/org/bluez", only_direct=False):
+        """
+        returns dict {obj: properties} of all objects below parent, which have
+        the interface iface, from a single managed objects snapshot
+
+        iface: interface name, e.g. 'org.bluez.Device1'
+        parent: object path or BluezInterfaceObject
+        only_direct: only return direct childs of parent
+        """
+        objs = cls.get_child_objects(parent, only_direct=only_direct)
+        return {obj: ifaces[iface] for obj, ifaces in objs.items() if iface in ifaces}
+
+    @classmethod
+    def get_childs(cls, parent="/org/bluez", only_direct=False):
+
+        if isinstance(parent, BluezInterfaceObject):
+            if not parent.obj:
+                raise ValueError("parent's 'obj' property is not set")
+            parent = parent.obj
+
+        return cls._child_paths(parent, only_direct)
+
+    def childs(self, parent, only_direct=False):
+        if isinstance(parent, BluezInterfaceObject):
+            if not parent.obj:
+                raise TypeError("parent's 'obj' property is not set")
+            parent = parent.obj
+
+        return self.__class__._child_paths(parent, only_direct)
 
     def onAdapterAdded(self, func, name, *args, **kwargs):
         obj = "/org/bluez/" + name
@@ -111,15 +362,30 @@ class BluezObjectManager(object):
             self, func, obj, *args, filter_interface="org.bluez.Adapter1", **kwargs
         )
 
-    def onObjectAdded(self, parent_obj, func, *args, filter_interface=None, **kwargs):
+    def onObjectAdded(
+        self,
+        parent_obj,
+        func,
+        *args,
+        filter_interface=None,
+        only_direct=False,
+        **kwargs
+    ):
+        """
+        Registers callback for objects added below parent_obj (one per parent_obj),
+        and for interfaces added to parent_obj itself, unless only_direct
+
+        func: callback function(parent_obj, added_obj, added_interfaces, *args, **kwargs)
+        filter_interface: only call func, if the added object has this interface
+        only_direct: only call func for direct childs of parent_obj
+        """
 
         key = parent_obj.obj
-        id(parent_obj)
 
         # callback gets added
         if func:
             add_cb = False
-            if not self.interfaces_added_cbs:
+            if not self.interfaces_added_cbs and self._mirror is None:
                 add_cb = True
             self.logger.debug(
                 "add onObjectAddedCallback: func: %s(%s,%s,%s)",
@@ -130,7 +396,9 @@ class BluezObjectManager(object):
             )
 
             # self.interfaces_added_cbs[key] = onObjectAddedCallback
-            self.interfaces_added_cbs[key] = Callback(func, parent_obj, *args, **kwargs)
+            callback = Callback(func, parent_obj, *args, **kwargs)
+            self.interfaces_added_cbs[key] = callback
+            self._added_cbs_index.set(key, (callback, filter_interface, only_direct))
             self.logger.debug(
                 "added interface (%s) specific callback: %s", str(key), str(func)
             )
@@ -142,8 +410,9 @@ class BluezObjectManager(object):
         else:
             # self.interfaces_added_cbs[key] = None
             del self.interfaces_added_cbs[key]
+            self._added_cbs_index.remove(key)
             self.logger.debug("Deleted interface specific %s cb", key)
-            if not self.interfaces_added_cbs:
+            if not self.interfaces_added_cbs and self._mirror is None:
                 try:
                     self._proxy.onInterfacesAdded = None
                 except AttributeError:  # Never was registered
@@ -203,11 +472,28 @@ class BluezObjectManager(object):
         self.logger.debug(
             "added obj %s added interfaces %s", str(added_obj), str(added_interfaces)
         )
-        for key, callback in self.interfaces_added_cbs.items():
-            if added_obj.startswith(key):
-                # TODO do not call for every child
-                if callback:
-                    callback(added_obj, added_interfaces)
+        if self._mirror is not None:
+            self._mirror.setdefault(added_obj, {}).update(added_interfaces)
+            self._mirror_index.set(added_obj)
+
+        if not self.interfaces_added_cbs:
+            return
+
+        parent = added_obj.rsplit("/", 1)[0] or "/"
+        registered = list(self._added_cbs_index.ancestors(added_obj))
+        # interfaces added to the object of a callback itself
+        own = self._added_cbs_index.get(added_obj)
+        if own is not None and not own[2]:
+            registered.append((added_obj, own))
+        # collect first, callbacks may (un)register callbacks
+        callbacks = [
+            callback
+            for key, (callback, filter_interface, only_direct) in registered
+            if (not only_direct or key == parent)
+            and (not filter_interface or filter_interface in added_interfaces)
+        ]
+        for callback in callbacks:
+            callback(added_obj, added_interfaces)
 
     def onObjectRemoved(self, obj, func, *args, **kwargs):
 
@@ -215,7 +501,7 @@ class BluezObjectManager(object):
         # callback gets added
         if func:
             add_cb = False
-            if not self.interfaces_removed_cbs:
+            if not self.interfaces_removed_cbs and self._mirror is None:
                 add_cb = True
             self.logger.debug(
                 "add onObjectRemovedCallback: func: %s(%s,%s,%s)",
@@ -238,12 +524,20 @@ class BluezObjectManager(object):
             cb = self.interfaces_removed_cbs.pop(key, None)
             del cb
             self.logger.debug("Deleted interface specific %s cb", key)
-            if not self.interfaces_removed_cbs:
+            if not self.interfaces_removed_cbs and self._mirror is None:
                 self._proxy.onInterfacesRemoved = None
 
     def _interfaces_removed(self, removed_obj, removed_interfaces):
         self.logger.debug("removed obj %s", str(removed_obj))
         self.logger.debug("removed interfaces %s", str(removed_interfaces))
+        if self._mirror is not None:
+            ifaces = self._mirror.get(removed_obj)
+            if ifaces is not None:
+                for iface in removed_interfaces:
+                    ifaces.pop(iface, None)
+                if not ifaces:
+                    del self._mirror[removed_obj]
+                    self._mirror_index.remove(removed_obj)
 
         callback = self.interfaces_removed_cbs.get(removed_obj, None)
         if callback:
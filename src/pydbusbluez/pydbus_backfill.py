@@ -1,4 +1,5 @@
 from types import MethodType
+from weakref import WeakKeyDictionary
 
 from pydbus.proxy import ProxyObject, ProxyMixin, Interface, CompositeInterface
 from pydbus.proxy_method import ProxyMethod, put_signature_in_doc
@@ -30,9 +31,24 @@ def construct(self, introspection_et, bus_name, object_path=None):
     """
     bus_name = auto_bus_name(bus_name)
     object_path = auto_object_path(bus_name, object_path)
-    ci = CompositeInterface(introspection_et)(self, bus_name, object_path)
-    backfill_async_dbus_methods(ci, introspection_et)
-    return ci
+    return composite_interface(introspection_et)(self, bus_name, object_path)
+
+
+# generated proxy classes (with async methods) per introspection (ElementTree node)
+_composite_interfaces = WeakKeyDictionary()
+
+
+def composite_interface(introspection_et):
+    """Get proxy class for introspection, generated only once per introspection object"""
+    try:
+        return _composite_interfaces[introspection_et]
+    except KeyError:
+        pass
+
+    cls = CompositeInterface(introspection_et)
+    backfill_async_dbus_methods(cls, introspection_et)
+    _composite_interfaces[introspection_et] = cls
+    return cls
 
 
 ProxyMixin.construct = construct
@@ -120,19 +136,43 @@ class ProxyMethodAsync(object):
         return "<function " + self.__qualname__ + " at 0x" + format(id(self), "x") + ">"
 
 
+def call_with_unix_fd_list(instance, method_name, *args, timeout=None):
+    """Call method of proxy instance, which returns file descriptors (type 'h')
+
+    pydbus drops the fd list of replies, returns tuple (out args, [fd, ...]),
+    the handles in the out args are indexes into the fd list. The caller owns
+    the returned fds.
+    """
+    method = getattr(type(instance), method_name)
+    ret, fd_list = instance._bus.con.call_with_unix_fd_list_sync(
+        instance._bus_name,
+        instance._path,
+        method._iface_name,
+        method.__name__,
+        Variant(method._sinargs, args),
+        VariantType.new(method._soutargs),
+        0,
+        timeout_to_glib(timeout),
+        None,
+        None,
+    )
+    fds = fd_list.steal_fds() if fd_list else []
+    return ret.unpack(), fds
+
+
 def InterfaceBackfilled(obj, iface):
+    """Add <method>Async to the interface class of obj (proxy object or class)"""
 
     if_name = iface.attrib["name"]
-    for member in iface:
-        matching_bases = [
-            base for base in type(obj).__bases__ if base.__name__ == if_name
-        ]
+    proxy_cls = obj if isinstance(obj, type) else type(obj)
+    matching_bases = [base for base in proxy_cls.__bases__ if base.__name__ == if_name]
 
-        if len(matching_bases) == 0:
-            raise KeyError(iface)
-        assert len(matching_bases) == 1
-        iface_class = matching_bases[0]
+    if len(matching_bases) == 0:
+        raise KeyError(iface)
+    assert len(matching_bases) == 1
+    iface_class = matching_bases[0]
 
+    for member in iface:
         member_name = member.attrib["name"]
         if member.tag == "method":
             method = getattr(iface_class, member_name, None)
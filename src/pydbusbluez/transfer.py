@@ -0,0 +1,280 @@
+import mmap
+import os
+from collections import deque
+from threading import Event
+from time import monotonic
+from typing import NamedTuple
+
+from pydbus import Variant
+
+from .bzutils import wait_for_event
+from . import error as bzerror
+
+
+class TransferProgress(NamedTuple):
+    """Progress of a Transfer"""
+
+    offset: int
+    total: int
+    elapsed: float
+    # bytes/s since the transfer (re)started
+    throughput: float
+
+    @property
+    def percent(self):
+        return 100.0 * self.offset / self.total if self.total else 100.0
+
+
+class Transfer(object):
+    """Transfer of an image (e.g. firmware) in packets, the generic part of
+    vendor DFU protocols
+
+    Packets of packet_size bytes are sent with send(packet), packet is a
+    memoryview into the image (not copied). With prn (packet receipt
+    notification) > 0, the peripheral confirms the received offset every prn
+    packets and at the end of the image, reported with receipt(offset), at
+    most window packets (default: prn) are sent ahead of the last receipt.
+    A receipt behind the sent offset (lost packets) resends from there.
+
+    image: buffer protocol object or path of a file, which is memory mapped
+    offset: start offset, to resume an interrupted transfer
+    on_progress: func(progress: TransferProgress), called on receipts, at
+                 most every progress_interval seconds and at the end
+
+    The transfer is event driven (start(), receipt()), run() drives it
+    by the GLib main context, see bzutils.wait_for_event.
+    """
+
+    progress_interval = 0.1
+
+    def __init__(
+        self,
+        image,
+        send,
+        packet_size=20,
+        prn=0,
+        window=None,
+        offset=0,
+        on_progress=None,
+    ):
+        if packet_size < 1:
+            raise ValueError("packet_size must be > 0")
+        self._mmap = None
+        if isinstance(image, (str, os.PathLike)):
+            with open(image, "rb") as f:
+                # an empty file can not be mapped
+                if os.fstat(f.fileno()).st_size:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            image = self._mmap if self._mmap is not None else b""
+        self._view = memoryview(image).cast("B")
+        self.total = len(self._view)
+        if not 0 <= offset <= self.total:
+            raise ValueError("Invalid offset: {}".format(offset))
+
+        self.send = send
+        self.packet_size = packet_size
+        self.prn = prn
+        self.window = window or prn
+        self.on_progress = on_progress
+        self.start_offset = offset
+        # sent and confirmed offsets
+        self.offset = offset
+        self.acked = offset
+        self.error = None
+        self.resent = 0
+
+        # offsets expected in the next receipts
+        self._receipts = deque()
+        self._packets = 0
+        self._pumping = False
+        self._finished = Event()
+        self._start_time = None
+        self._last_report = 0
+        self._closers = []
+
+    @classmethod
+    def to_characteristic(
+        cls, image, data_char, receipt_char=None, parse_receipt=None, **kwargs
+    ):
+        """
+        Transfer writing the packets without response to data_char, through
+        the 'AcquireWrite' socket if available, else 'WriteValue' commands.
+        The packet size defaults to MTU - 3.
+
+        receipt_char: characteristic notifying receipts, parse_receipt(value)
+                      returns the confirmed offset from the notified value
+                      (required with receipt_char)
+        """
+        if receipt_char and parse_receipt is None:
+            raise ValueError("parse_receipt is required with receipt_char")
+
+        try:
+            writer = data_char.acquire_write()
+            send = writer.write
+            packet_size = writer.chunk_size
+        except bzerror.BluezError:
+            writer = None
+            options = {"type": Variant("s", "command")}
+
+            def send(packet):
+                data_char.write(bytes(packet), dict(options))
+
+            packet_size = data_char._device_mtu() - 3
+
+        kwargs.setdefault("packet_size", packet_size)
+        try:
+            transfer = cls(image, send, **kwargs)
+        except Exception:
+            if writer:
+                writer.close()
+            raise
+        if writer:
+            transfer._closers.append(writer.close)
+        if receipt_char:
+            try:
+                subscription = receipt_char._subscribe_notifications(
+                    lambda value: transfer.receipt(parse_receipt(value))
+                )
+            except Exception:
+                transfer.close()
+                raise
+            transfer._closers.append(subscription.disconnect)
+        return transfer
+
+    @property
+    def done(self):
+        return self._finished.is_set() and self.error is None
+
+    @property
+    def progress(self):
+        elapsed = monotonic() - self._start_time if self._start_time else 0.0
+        sent = self.acked - self.start_offset
+        return TransferProgress(
+            self.acked, self.total, elapsed, sent / elapsed if elapsed else 0.0
+        )
+
+    def start(self):
+        self._start_time = monotonic()
+        self._pump()
+
+    def run(self, timeout=None):
+        """
+        start and wait until the transfer completed, returns TransferProgress
+
+        raises the error of the transfer, or BluezFailedError on timeout, the
+        transfer can be resumed from acked
+        """
+        self.start()
+        if not wait_for_event(self._finished, timeout):
+            raise bzerror.BluezFailedError(
+                "Transfer timeout at offset {}/{}".format(self.acked, self.total)
+            )
+        if self.error:
+            raise self.error
+        return self.progress
+
+    def _window_open(self):
+        if not self.prn:
+            return True
+        return self.offset - self.acked < self.window * self.packet_size
+
+    def _pump(self):
+        if self._pumping or self._finished.is_set():
+            return
+        self._pumping = True
+        try:
+            while self.offset < self.total and self._window_open():
+                start = self.offset
+                end = min(start + self.packet_size, self.total)
+                # account before sending, a receipt may be reported from send()
+                self.offset = end
+                if self.prn:
+                    self._packets += 1
+                    if self._packets == self.prn or end == self.total:
+                        self._packets = 0
+                        self._receipts.append(end)
+                self.send(self._view[start:end])
+                if not self.prn:
+                    self.acked = end
+                    self._report()
+        except Exception as e:
+            self.fail(e)
+        finally:
+            self._pumping = False
+
+        # without prn, or nothing to send (empty image, resumed at the end)
+        if self.acked == self.total:
+            self._finish()
+
+    def receipt(self, offset):
+        """
+        peripheral confirmed to have received the image up to offset
+        """
+        if self._finished.is_set():
+            return
+        expected = self._receipts.popleft() if self._receipts else self.offset
+        if offset > expected or offset < self.acked:
+            self.fail(
+                bzerror.BluezFailedError(
+                    "Invalid receipt offset {}, expected {}".format(offset, expected)
+                )
+            )
+            return
+
+        self.acked = offset
+        if offset < expected:
+            # packets lost, resend from the confirmed offset
+            self.resent += self.offset - offset
+            self.offset = offset
+            self._packets = 0
+            self._receipts.clear()
+
+        if self.acked == self.total:
+            self._finish()
+            return
+        self._report()
+        self._pump()
+
+    def fail(self, error):
+        if not self._finished.is_set():
+            self.error = error
+            self._finish()
+
+    def _report(self, force=False):
+        if not self.on_progress:
+            return
+        now = monotonic()
+        if force or now - self._last_report >= self.progress_interval:
+            self._last_report = now
+            self.on_progress(self.progress)
+
+    def _finish(self):
+        self._finished.set()
+        self._report(force=True)
+
+    def close(self):
+        """
+        release the image, the acquired socket and the receipt subscription
+
+        Packets kept by send are still valid, a mapped file is then unmapped
+        when the last packet is released.
+        """
+        while self._closers:
+            self._closers.pop()()
+        self._view.release()
+        if self._mmap:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # packets still referenced, closed on garbage collection
+                pass
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+__all__ = ("Transfer", "TransferProgress")
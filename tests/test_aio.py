@@ -0,0 +1,410 @@
+"""
+Test asyncio front-end with fake <method>Async proxy methods, replies are
+dispatched by the GLib default main context
+"""
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from gi.repository import GLib
+
+from pydbusbluez.aio import (
+    AsyncAdapter,
+    AsyncDevice,
+    AsyncGattCharacteristic,
+    _call,
+    get_bridge,
+)
+from pydbusbluez.device import Device, DeviceInfo
+from pydbusbluez.error import (
+    BluezFailedError,
+    BluezInProgressError,
+    BluezNotConnectedError,
+    DBusUnknownObjectError,
+)
+from pydbusbluez.format import FormatUint16
+from pydbusbluez.object_manager import BluezObjectManager
+
+
+ADAPTER = "/org/bluez/hci0"
+DEV = ADAPTER + "/dev_00_11_22_33_44_55"
+
+
+class _Reply(object):
+    def __init__(self, *values):
+        self.values = values
+
+    def unpack(self):
+        return self.values
+
+
+def _async_method(calls, name, reply=(), error=None):
+    """<name>Async, replying from the GLib main context"""
+
+    def method_async(done_cb, error_cb, data, *args, timeout=None):
+        calls.append((name, args))
+        if error:
+            GLib.idle_add(lambda: error_cb(None, GLib.Error(error), data) and False)
+        else:
+            GLib.idle_add(lambda: done_cb(None, _Reply(*reply), data) and False)
+
+    return method_async
+
+
+def test_call():
+    calls = []
+    method = _async_method(calls, "ReadValue", reply=([1, 2],))
+
+    async def main():
+        result = await _call(method, {}, timeout=5)
+        # nothing pending, dispatching stopped
+        await asyncio.sleep(0)
+        return result, get_bridge().running
+
+    assert asyncio.run(main()) == (([1, 2],), False)
+    assert calls == [("ReadValue", ({},))]
+
+
+def _bridge_threads():
+    return [t for t in threading.enumerate() if t.name == "GLibBridge"]
+
+
+def test_bridge_thread():
+    async def main():
+        bridge = get_bridge()
+        bridge.start()
+        bridge.hold()
+        assert bridge.running
+        bridge.stop()
+        assert bridge.running
+        # no timer or poll callback scheduled on the asyncio loop
+        assert not asyncio.get_running_loop()._scheduled
+        bridge.release()
+        return bridge.running
+
+    assert not asyncio.run(main())
+    for t in _bridge_threads():
+        t.join(1)
+    assert not _bridge_threads()
+    # context released by the thread
+    context = GLib.MainContext.default()
+    assert context.acquire()
+    context.release()
+
+
+@pytest.mark.parametrize(
+    "message,error",
+    (
+        ("GDBus.Error:org.bluez.Error.InProgress: busy", BluezInProgressError),
+        ("GDBus.Error:org.bluez.Error.Failed: failed", BluezFailedError),
+        (
+            "GDBus.Error:org.freedesktop.DBus.Error.UnknownObject: gone",
+            DBusUnknownObjectError,
+        ),
+    ),
+)
+def test_call_error(message, error):
+    method = _async_method([], "Connect", error=message)
+
+    async def main():
+        with pytest.raises(error):
+            await _call(method)
+        await asyncio.sleep(0)
+        return get_bridge().running
+
+    assert not asyncio.run(main())
+
+
+def test_call_raises():
+    def method_async(done_cb, error_cb, data, *args, timeout=None):
+        raise GLib.Error("GDBus.Error:org.bluez.Error.Failed: not sent")
+
+    async def main():
+        with pytest.raises(BluezFailedError):
+            _call(method_async)
+        return get_bridge().running
+
+    assert not asyncio.run(main())
+
+
+class _Subscription(object):
+    def __init__(self):
+        self.active = True
+
+    def unsubscribe(self):
+        self.active = False
+
+
+class _Bus(object):
+    def __init__(self):
+        self.subscriptions = []
+
+    def subscribe(self, **kwargs):
+        self.subscriptions.append((kwargs, _Subscription()))
+        return self.subscriptions[-1][1]
+
+    def emit(self, obj, ifaces):
+        for kwargs, subscription in self.subscriptions:
+            if subscription.active:
+                kwargs["signal_fired"](
+                    "sender", "/", kwargs["iface"], kwargs["signal"], (obj, ifaces)
+                )
+
+
+class _AdapterProxy(object):
+    def __init__(self, bus, calls, found):
+        self.SetDiscoveryFilterAsync = _async_method(calls, "SetDiscoveryFilter")
+        self.StopDiscoveryAsync = _async_method(calls, "StopDiscovery")
+        start = _async_method(calls, "StartDiscovery")
+
+        def start_discovery_async(*args, **kwargs):
+            start(*args, **kwargs)
+            for obj, ifaces in found:
+                GLib.idle_add(lambda obj=obj, ifaces=ifaces: bus.emit(obj, ifaces))
+
+        self.StartDiscoveryAsync = start_discovery_async
+
+
+class _Adapter(object):
+    obj = ADAPTER
+
+    def __init__(self, found):
+        self.bus = _Bus()
+        self.calls = []
+        self._proxy = _AdapterProxy(self.bus, self.calls, found)
+
+
+class _ManagerProxy(object):
+    def __init__(self, calls, objects):
+        self.GetManagedObjectsAsync = _async_method(
+            calls, "GetManagedObjects", reply=(objects,)
+        )
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    """object manager without mirror, replies to GetManagedObjectsAsync"""
+
+    def manager(calls, objects):
+        om = BluezObjectManager.__new__(BluezObjectManager)
+        om._mirror = None
+        om._proxy = _ManagerProxy(calls, objects)
+        monkeypatch.setattr(BluezObjectManager, "manager", om)
+        return om
+
+    return manager
+
+
+def test_discover(manager):
+    found = [
+        (DEV, {Device.iface: {"Address": "00:11:22:33:44:55", "RSSI": -50}}),
+        # other adapter
+        ("/org/bluez/hci1/dev_66_77_88_99_AA_BB", {Device.iface: {}}),
+        # not a device
+        (DEV + "/service0001", {"org.bluez.GattService1": {}}),
+        (ADAPTER + "/dev_66_77_88_99_AA_BB", {Device.iface: {"Paired": True}}),
+    ]
+    known = DeviceInfo.from_properties(ADAPTER + "/dev_known", {"Name": "known"})
+    adapter = _Adapter(found)
+    manager(
+        adapter.calls,
+        {
+            known.obj: {Device.iface: {"Name": "known"}},
+            known.obj + "/service0001": {Device.iface: {}},
+            "/org/bluez/hci1/dev_other": {Device.iface: {}},
+            ADAPTER: {"org.bluez.Adapter1": {}},
+        },
+    )
+
+    async def main():
+        infos = []
+        discover = AsyncAdapter(adapter).discover(
+            filters={"Transport": "le"}, existing=True
+        )
+        async for info in discover:
+            infos.append(info)
+            if len(infos) == 3:
+                break
+        await discover.aclose()
+        await asyncio.sleep(0)
+        return infos, get_bridge().running
+
+    infos, running = asyncio.run(main())
+    assert [info.obj for info in infos] == [
+        known.obj,
+        DEV,
+        ADAPTER + "/dev_66_77_88_99_AA_BB",
+    ]
+    assert infos[0] == known
+    assert infos[1].rssi == -50
+    assert infos[2].paired
+    assert not running
+
+    assert [name for name, _ in adapter.calls] == [
+        "GetManagedObjects",
+        "SetDiscoveryFilter",
+        "StartDiscovery",
+        "StopDiscovery",
+    ]
+    assert not adapter.bus.subscriptions[0][1].active
+
+
+class _Signal(object):
+    def __init__(self):
+        self.handlers = []
+
+    def connect(self, handler):
+        self.handlers.append(handler)
+        return SimpleNamespace(disconnect=lambda: self.handlers.remove(handler))
+
+    def emit(self, changed):
+        for handler in list(self.handlers):
+            handler(changed, [])
+
+
+class _Device(object):
+    """Device with GetAllAsync replying props, changes emitted after the first GetAll"""
+
+    obj = DEV
+    _props_cache = None
+
+    def __init__(self, props, changes=()):
+        self.calls = []
+        self.changed = _Signal()
+        get_all = _async_method(self.calls, "GetAll", reply=(props,))
+        changes = list(changes)
+
+        def get_all_async(*args, **kwargs):
+            get_all(*args, **kwargs)
+            while changes:
+                change = changes.pop(0)
+                GLib.idle_add(lambda change=change: self.changed.emit(change) and False)
+
+        self._proxy = SimpleNamespace(GetAllAsync=get_all_async)
+
+    def _subscribe_properties_changed(self, handler):
+        return self.changed.connect(handler)
+
+
+@pytest.fixture
+def no_mirror(manager):
+    manager([], {})
+
+
+def test_wait_services_resolved(no_mirror):
+    device = _Device(
+        {"Connected": True, "ServicesResolved": False},
+        changes=[{"RSSI": -40}, {"ServicesResolved": True}],
+    )
+    # already resolved
+    resolved = _Device({"Connected": True, "ServicesResolved": True})
+
+    async def main():
+        return (
+            await AsyncDevice(device).wait_services_resolved(5),
+            await AsyncDevice(resolved).wait_services_resolved(5),
+        )
+
+    assert asyncio.run(main()) == (True, True)
+    assert device.calls == [("GetAll", (Device.iface,))]
+    assert not device.changed.handlers
+
+
+@pytest.mark.parametrize(
+    "props,changes",
+    (
+        ({"Connected": False}, ()),
+        ({"Connected": True}, [{"Connected": False}]),
+        # device removed
+        (None, ()),
+    ),
+)
+def test_wait_services_resolved_disconnected(no_mirror, props, changes):
+    device = _Device(props or {}, changes)
+    if props is None:
+        device._proxy.GetAllAsync = _async_method(
+            device.calls,
+            "GetAll",
+            error="GDBus.Error:org.freedesktop.DBus.Error.UnknownObject: gone",
+        )
+
+    async def main():
+        with pytest.raises(BluezNotConnectedError):
+            await AsyncDevice(device).wait_services_resolved(5)
+
+    asyncio.run(main())
+    assert not device.changed.handlers
+
+
+def test_wait_services_resolved_timeout(no_mirror):
+    device = _Device({"Connected": True, "ServicesResolved": False})
+
+    async def main():
+        return await AsyncDevice(device).wait_services_resolved(0.05)
+
+    assert asyncio.run(main()) is False
+    # read again after the timeout
+    assert len(device.calls) == 2
+    assert not device.changed.handlers
+
+
+def test_wait_services_resolved_mirror(monkeypatch):
+    om = BluezObjectManager.__new__(BluezObjectManager)
+    om._mirror = {DEV: {Device.iface: {"Connected": True, "ServicesResolved": True}}}
+    monkeypatch.setattr(BluezObjectManager, "manager", om)
+    device = _Device({})
+
+    assert asyncio.run(AsyncDevice(device).wait_services_resolved(5))
+    assert not device.calls
+
+
+class _Char(object):
+    fmt = FormatUint16
+
+    def __init__(self):
+        self.calls = []
+        self.changed = _Signal()
+        start = _async_method(self.calls, "StartNotify")
+
+        def start_notify_async(*args, **kwargs):
+            start(*args, **kwargs)
+            for change in ({"Notifying": True}, {"Value": [1, 0]}, {"Value": [2, 1]}):
+                GLib.idle_add(lambda change=change: self.changed.emit(change) and False)
+
+        self._proxy = SimpleNamespace(
+            StartNotifyAsync=start_notify_async,
+            StopNotifyAsync=_async_method(
+                self.calls,
+                "StopNotify",
+                error="GDBus.Error:org.bluez.Error.Failed: No notify session started",
+            ),
+        )
+
+    def _subscribe_properties_changed(self, handler):
+        return self.changed.connect(handler)
+
+
+@pytest.mark.parametrize("raw", (False, True))
+def test_notifications(raw):
+    char = _Char()
+
+    async def main():
+        values = []
+        notifications = AsyncGattCharacteristic(char).notifications(raw=raw)
+        async for value in notifications:
+            values.append(value)
+            if len(values) == 2:
+                break
+        await notifications.aclose()
+        await asyncio.sleep(0)
+        return values, get_bridge().running
+
+    values, running = asyncio.run(main())
+    if raw:
+        assert values == [[1, 0], [2, 1]]
+    else:
+        assert [value.value for value in values] == [1, 0x0102]
+    assert not running
+    assert [name for name, _ in char.calls] == ["StartNotify", "StopNotify"]
+    assert not char.changed.handlers
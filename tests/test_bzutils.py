@@ -0,0 +1,278 @@
+"""
+Test lazy proxies, property cache and waiting for events, without bus connection
+"""
+from threading import Event, Timer
+
+import pytest
+from gi.repository import GLib
+
+from pydbusbluez import bzutils
+from pydbusbluez.bzutils import (
+    ORG_BLUEZ,
+    BluezInterfaceObject,
+    PropertyCache,
+    wait_for_event,
+)
+from pydbusbluez.error import BluezDoesNotExistError, DBusTimeoutError
+from pydbusbluez.object_manager import BluezObjectManager
+
+
+OBJ = "/org/bluez/hci0/dev_00_11_22_33_44_55"
+
+
+class _Subscription(object):
+    def __init__(self, handlers, handler):
+        self.handlers = handlers
+        self.handler = handler
+
+    def disconnect(self):
+        self.handlers.remove(self.handler)
+
+
+class _Signal(object):
+    def __init__(self):
+        self.handlers = []
+
+    def connect(self, handler):
+        self.handlers.append(handler)
+        return _Subscription(self.handlers, handler)
+
+    def fire(self, *args):
+        for handler in list(self.handlers):
+            handler(*args)
+
+
+class _PropertiesProxy(object):
+    """proxy with properties, counts GetAll and Get calls"""
+
+    def __init__(self, props):
+        object.__setattr__(self, "props", dict(props))
+        object.__setattr__(self, "gets", [])
+        object.__setattr__(self, "get_alls", 0)
+        object.__setattr__(self, "error", None)
+        object.__setattr__(self, "PropertiesChanged", _Signal())
+
+    def fail(self, error):
+        object.__setattr__(self, "error", error)
+
+    def GetAll(self, iface):
+        object.__setattr__(self, "get_alls", self.get_alls + 1)
+        if self.error:
+            raise self.error
+        return dict(self.props)
+
+    def __getattr__(self, name):
+        if name not in self.props:
+            raise AttributeError(name)
+        self.gets.append(name)
+        return self.props[name]
+
+    def __setattr__(self, name, value):
+        self.props[name] = value
+
+
+class Thing(BluezInterfaceObject):
+    pass
+
+
+IFACE = "org.bluez.Thing1"
+
+
+@pytest.fixture(autouse=True)
+def object_manager(monkeypatch):
+    # no mirror, refresh_properties uses GetAll
+    om = BluezObjectManager.__new__(BluezObjectManager)
+    om._mirror = None
+    monkeypatch.setattr(BluezObjectManager, "manager", om)
+    return om
+
+
+@pytest.fixture
+def thing():
+    thing = Thing(OBJ)
+    thing._proxy = _PropertiesProxy({"Connected": True, "RSSI": -50})
+    thing.cache_properties()
+    return thing
+
+
+class _Bus(object):
+    def __init__(self):
+        self.constructed = []
+
+    def construct(self, introspection, name, obj):
+        self.constructed.append((introspection, name, obj))
+        return object()
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    """system bus, connected on first use"""
+    bus = _Bus()
+    connects = []
+
+    def system_bus():
+        connects.append(True)
+        return bus
+
+    monkeypatch.setattr(bzutils, "_system_bus", None)
+    monkeypatch.setattr(bzutils, "SystemBus", system_bus)
+    bus.connects = connects
+    return bus
+
+
+def test_lazy_proxy(bus):
+    thing = Thing(OBJ)
+    assert not bus.connects
+    assert bus.constructed == []
+
+    proxy = thing._proxy
+    assert thing._proxy is proxy
+    assert bus.connects == [True]
+    assert bus.constructed == [(Thing.introspection, ORG_BLUEZ, OBJ)]
+
+    # constructed again for a new object path
+    thing.obj = OBJ + "/service0001"
+    assert thing._proxy is not proxy
+    assert [obj for _, _, obj in bus.constructed] == [OBJ, OBJ + "/service0001"]
+    assert bus.connects == [True]
+
+
+def test_lazy_proxy_assigned(bus):
+    thing = Thing(OBJ)
+    proxy = _PropertiesProxy({})
+    thing._proxy = proxy
+    assert thing._proxy is proxy
+    assert Thing(None)._proxy is None
+    assert not bus.connects
+    assert bus.constructed == []
+
+
+def test_lazy_introspection():
+    class Other(BluezInterfaceObject):
+        intro_xml = "<node><interface name='org.bluez.Other1'/></node>"
+
+    assert "_introspection" not in Other.__dict__
+    introspection = Other.introspection
+    # parsed once per class
+    assert Other.introspection is introspection
+    assert Other(None).introspection is introspection
+    assert introspection.find("interface").attrib["name"] == "org.bluez.Other1"
+    assert Thing.introspection is not introspection
+
+
+def test_property_cache():
+    cache = PropertyCache()
+    assert cache.stale
+    cache.update({"RSSI": -40}, [])
+    assert cache.values is None
+
+    cache.seed({"Connected": True, "RSSI": -50})
+    assert not cache.stale
+    cache.update({"RSSI": -40}, ["Connected"])
+    assert cache.values == {"RSSI": -40}
+    assert cache.invalidated == {"Connected"}
+    cache.update({"Connected": False}, [])
+    assert cache.invalidated == set()
+
+    cache.invalidate("RSSI")
+    assert cache.values == {"Connected": False}
+    assert cache.invalidated == {"RSSI"}
+    cache.invalidate()
+    assert cache.stale
+
+
+def test_property_cache_max_age():
+    cache = PropertyCache(max_age=10)
+    cache.seed({})
+    assert not cache.stale
+    cache.time -= 11
+    assert cache.stale
+
+
+def test_seed(thing):
+    proxy = thing._proxy
+    assert thing._getBluezPropOrNone("Connected") is True
+    assert thing._getBluezPropOrNone("RSSI") == -50
+    assert thing._getBluezPropOrNone("Name", "none") == "none"
+    assert proxy.get_alls == 1
+    assert proxy.gets == []
+
+
+def test_properties_changed(thing):
+    proxy = thing._proxy
+    thing._getBluezPropOrNone("RSSI")
+    proxy.PropertiesChanged.fire(IFACE, {"RSSI": -70}, [])
+    # other interface
+    proxy.PropertiesChanged.fire("org.bluez.Other1", {"RSSI": -90}, [])
+    assert thing._getBluezPropOrNone("RSSI") == -70
+    assert proxy.get_alls == 1
+    assert proxy.gets == []
+
+
+def test_invalidated_live_get(thing):
+    proxy = thing._proxy
+    thing._getBluezPropOrNone("RSSI")
+    proxy.props["RSSI"] = -60
+    proxy.PropertiesChanged.fire(IFACE, {}, ["RSSI"])
+    # read once with Get, then cached
+    assert thing._getBluezPropOrNone("RSSI") == -60
+    assert thing._getBluezPropOrNone("RSSI") == -60
+    assert proxy.gets == ["RSSI"]
+
+
+def test_set_invalidates(thing):
+    proxy = thing._proxy
+    thing._getBluezPropOrNone("Connected")
+    thing._setBluezProp("Connected", False)
+    assert proxy.props["Connected"] is False
+    assert thing._getBluezPropOrNone("Connected") is False
+    assert proxy.gets == ["Connected"]
+
+
+def test_refresh_error_live_get(thing):
+    proxy = thing._proxy
+    proxy.fail(DBusTimeoutError("timeout"))
+    # as without cache
+    assert thing._getBluezPropOrNone("RSSI") == -50
+    assert thing._getBluezPropOrNone("Name", "none") == "none"
+    assert proxy.gets == ["RSSI"]
+
+    proxy.fail(BluezDoesNotExistError("gone"))
+    assert thing._getBluezPropOrNone("RSSI", "none") == "none"
+
+
+def test_disable(thing):
+    proxy = thing._proxy
+    thing._getBluezPropOrNone("RSSI")
+    thing.cache_properties(False)
+    assert proxy.PropertiesChanged.handlers == []
+    assert thing._getBluezPropOrNone("RSSI") == -50
+    assert proxy.gets == ["RSSI"]
+
+
+def test_wait_for_event():
+    event = Event()
+    GLib.idle_add(lambda: False)
+    GLib.idle_add(lambda: event.set() and False)
+    assert wait_for_event(event, 5)
+    # timeout source removed
+    assert not GLib.MainContext.default().iteration(False)
+
+    assert wait_for_event(event)
+
+
+def test_wait_for_event_timeout():
+    assert not wait_for_event(Event(), 0.01)
+    assert not GLib.MainContext.default().iteration(False)
+
+
+def test_wait_for_event_other_thread(monkeypatch):
+    # main context owned by a main loop of another thread
+    monkeypatch.setattr(GLib.MainContext, "acquire", lambda self: False)
+    event = Event()
+    assert not wait_for_event(event, 0.01)
+
+    timer = Timer(0.01, event.set)
+    timer.start()
+    assert wait_for_event(event, 5)
+    timer.join()
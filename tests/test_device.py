@@ -0,0 +1,188 @@
+"""
+Test device snapshots, served from the managed objects mirror, and waiting
+for device state changes
+"""
+from types import MappingProxyType, SimpleNamespace
+
+import pytest
+from gi.repository import GLib
+
+from pydbusbluez import bzutils
+from pydbusbluez.device import Adapter, Device, DeviceInfo
+from pydbusbluez.error import BluezNotConnectedError
+from pydbusbluez.object_manager import BluezObjectManager, PathTree
+
+
+ADAPTER = "/org/bluez/hci0"
+DEV = ADAPTER + "/dev_00_11_22_33_44_55"
+PAIRED = ADAPTER + "/dev_66_77_88_99_AA_BB"
+
+PROPS = {
+    "Address": "00:11:22:33:44:55",
+    "Name": "sensor",
+    "Alias": "my sensor",
+    "RSSI": -60,
+    "Paired": False,
+    "Connected": True,
+    "Trusted": True,
+    "ServicesResolved": True,
+    "UUIDs": ["0000180f-0000-1000-8000-00805f9b34fb"],
+    "ManufacturerData": {0x004C: [0x02, 0x15]},
+    "ServiceData": {"0000feaa-0000-1000-8000-00805f9b34fb": [0x10, 0x00]},
+}
+
+OBJECTS = {
+    ADAPTER: {"org.bluez.Adapter1": {"Powered": True}},
+    DEV: {"org.bluez.Device1": PROPS},
+    DEV + "/service0001": {"org.bluez.GattService1": {}},
+    PAIRED: {"org.bluez.Device1": {"Address": "66:77:88:99:AA:BB", "Paired": True}},
+    "/org/bluez/hci1/dev_00_00_00_00_00_01": {
+        "org.bluez.Device1": {"Address": "00:00:00:00:00:01", "Paired": True}
+    },
+}
+
+
+class _AdapterProxy(object):
+    Powered = True
+
+
+class _Bus(object):
+    def construct(self, introspection, name, obj):
+        assert obj == ADAPTER
+        return _AdapterProxy()
+
+
+@pytest.fixture
+def adapter(monkeypatch):
+    monkeypatch.setattr(bzutils, "_system_bus", _Bus())
+    om = BluezObjectManager.__new__(BluezObjectManager)
+    om._mirror = OBJECTS
+    om._mirror_index = PathTree(OBJECTS)
+    monkeypatch.setattr(BluezObjectManager, "manager", om)
+    return Adapter("hci0")
+
+
+def test_from_properties():
+    info = DeviceInfo.from_properties(DEV, PROPS)
+    assert info.obj == DEV
+    assert info.address == "00:11:22:33:44:55"
+    assert (info.name, info.alias, info.rssi) == ("sensor", "my sensor", -60)
+    assert not info.paired
+    assert info.connected and info.trusted and info.services_resolved
+    assert info.uuids == ("0000180f-0000-1000-8000-00805f9b34fb",)
+    assert info.manufacturer_data == {0x004C: b"\x02\x15"}
+    assert info.service_data == {"0000feaa-0000-1000-8000-00805f9b34fb": b"\x10\x00"}
+
+
+def test_from_properties_missing():
+    info = DeviceInfo.from_properties(DEV, {})
+    assert info.address is None and info.name is None
+    assert info.alias is None and info.rssi is None
+    assert not (info.paired or info.connected or info.trusted)
+    assert not info.services_resolved
+    assert info.uuids == ()
+    assert info.manufacturer_data == {}
+    assert info.service_data == {}
+
+
+def test_from_properties_read_only():
+    props = dict(PROPS)
+    info = DeviceInfo.from_properties(DEV, props)
+    assert isinstance(info.manufacturer_data, MappingProxyType)
+    assert isinstance(info.service_data, MappingProxyType)
+    with pytest.raises(TypeError):
+        info.manufacturer_data[0x004C] = b""
+    with pytest.raises(TypeError):
+        info.service_data["0000feaa-0000-1000-8000-00805f9b34fb"] = b""
+    with pytest.raises(AttributeError):
+        info.rssi = 0
+
+    # snapshot, independent of the properties dict
+    props["ManufacturerData"][0x004C].append(0xFF)
+    assert info.manufacturer_data[0x004C] == b"\x02\x15"
+
+
+def test_device_infos(adapter):
+    infos = adapter.device_infos()
+    # direct childs of the adapter only
+    assert [info.obj for info in infos] == [DEV, PAIRED]
+
+    assert adapter.device_infos(lambda info: info.connected) == [infos[0]]
+    assert adapter.device_infos(lambda info: info.paired) == [infos[1]]
+    assert (
+        adapter.device_infos(lambda info: info.connected, lambda info: info.paired)
+        == []
+    )
+
+
+def test_paired_devices(adapter):
+    devices = adapter.paired_devices()
+    assert len(devices) == 1
+    assert isinstance(devices[0], Device)
+    assert devices[0].obj == PAIRED
+    assert devices[0].adapter is adapter
+
+
+class _DeviceProxy(object):
+    ServicesResolved = False
+    Connected = True
+
+
+class _Subscription(object):
+    def __init__(self):
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+
+
+@pytest.fixture
+def device(monkeypatch):
+    device = Device(adapter=SimpleNamespace(obj=ADAPTER), addr=PROPS["Address"])
+    device._proxy = _DeviceProxy()
+    device.subscriptions = []
+
+    def subscribe_properties_changed(handler):
+        device.subscriptions.append((handler, _Subscription()))
+        return device.subscriptions[-1][1]
+
+    monkeypatch.setattr(
+        device, "_subscribe_properties_changed", subscribe_properties_changed
+    )
+    return device
+
+
+def _fire_later(device, *changes):
+    """PropertiesChanged signals, dispatched while waiting"""
+    for changed in changes:
+        GLib.idle_add(lambda changed=changed: device.subscriptions[0][0](changed, []))
+
+
+def test_wait_services_resolved(device):
+    _fire_later(device, {"RSSI": -40}, {"ServicesResolved": True})
+    assert device.wait_services_resolved(5)
+    assert not device.subscriptions[0][1].connected
+
+
+def test_wait_services_resolved_disconnected(device):
+    _fire_later(device, {"Connected": False})
+    with pytest.raises(BluezNotConnectedError):
+        device.wait_services_resolved(5)
+    assert not device.subscriptions[0][1].connected
+
+
+def test_wait_services_resolved_timeout(device):
+    _fire_later(device, {"RSSI": -40})
+    assert not device.wait_services_resolved(0.01)
+    assert not device.subscriptions[0][1].connected
+
+
+def test_wait_services_resolved_state(device):
+    device._proxy.ServicesResolved = True
+    assert device.wait_services_resolved(5)
+
+    device._proxy.ServicesResolved = False
+    device._proxy.Connected = False
+    with pytest.raises(BluezNotConnectedError):
+        device.wait_services_resolved(5)
+    assert not any(sub.connected for _, sub in device.subscriptions)
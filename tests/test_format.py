@@ -1,6 +1,8 @@
 """
 Test integer format conversions
 """
+import pickle
+
 import pytest
 
 from pydbusbluez.format import *
@@ -16,21 +18,27 @@ PARAMETER_VALUES = (
     (FormatUint24, 0, b"\x00\x00\x00"),
     (FormatUint24, 255, b"\xff\x00\x00"),
     (FormatUint24, 16777215, b"\xff\xff\xff"),
+    (FormatUint24, 0x123456, b"\x56\x34\x12"),
     (FormatUint32, 0, b"\x00\x00\x00\x00"),
     (FormatUint32, 255, b"\xff\x00\x00\x00"),
     (FormatUint32, 4294967295, b"\xff\xff\xff\xff"),
-    (FormatUint64, 0, b"\x00\x00\x00\x00\x00\x00\x00\x00", "0"),
-    (FormatUint64, 255, b"\xff\x00\x00\x00\x00\x00\x00\x00", "255"),
+    (FormatUint40, 0, b"\x00\x00\x00\x00\x00"),
+    (FormatUint40, 1099511627775, b"\xff\xff\xff\xff\xff"),
+    (FormatUint48, 0, b"\x00\x00\x00\x00\x00\x00"),
+    (FormatUint48, 0x0123456789AB, b"\xab\x89\x67\x45\x23\x01"),
+    (FormatUint48, 281474976710655, b"\xff\xff\xff\xff\xff\xff"),
+    (FormatUint64, 0, b"\x00\x00\x00\x00\x00\x00\x00\x00"),
+    (FormatUint64, 255, b"\xff\x00\x00\x00\x00\x00\x00\x00"),
     (FormatUint64, 18446744073709551615, b"\xff\xff\xff\xff\xff\xff\xff\xff"),
     (FormatSint8, 0, b"\x00"),
     (FormatSint8, 127, b"\x7f"),
     (FormatSint8, -128, b"\x80"),
     (FormatSint8, -1, b"\xff"),
-    (FormatUint16, 0, b"\x00\x00"),
-    (FormatUint16, 255, b"\xff\x00"),
-    (FormatUint16, 32767, b"\xff\x7f"),
-    (FormatUint16, -32768, b"\x00\x80"),
-    (FormatUint16, -1, b"\xff\xff"),
+    (FormatSint16, 0, b"\x00\x00"),
+    (FormatSint16, 255, b"\xff\x00"),
+    (FormatSint16, 32767, b"\xff\x7f"),
+    (FormatSint16, -32768, b"\x00\x80"),
+    (FormatSint16, -1, b"\xff\xff"),
     (FormatSint32, 0, b"\x00\x00\x00\x00"),
     (FormatSint32, 255, b"\xff\x00\x00\x00"),
     (FormatSint32, 32767, b"\xff\x7f\x00\x00"),
@@ -54,7 +62,7 @@ PARAMETER_VALUES = (
 )
 
 
-@pytest.mark.parameterize("format_cls,int_val,bytes_val", PARAMETER_VALUES)
+@pytest.mark.parametrize("format_cls,int_val,bytes_val", PARAMETER_VALUES)
 def test_encode_ints(format_cls, int_val, bytes_val):
     fmt = format_cls(int_val)
     assert fmt.encode() == bytes_val
@@ -62,9 +70,222 @@ def test_encode_ints(format_cls, int_val, bytes_val):
     assert fmt.value == int_val
 
 
-@pytest.mark.parameterize("format_cls,int_val,bytes_val", PARAMETER_VALUES)
+@pytest.mark.parametrize("format_cls,int_val,bytes_val", PARAMETER_VALUES)
 def test_decode_ints(format_cls, int_val, bytes_val):
     # fmt = format_cls.decode(array("B", bytes_val))
     fmt = format_cls.decode(bytes_val)
     assert fmt.value == int_val
     assert str(fmt) == str(int_val)
+
+
+class FormatUint24Milli(FormatUint24):
+    exponent = -3
+
+
+class FormatUint48Centi(FormatUint48):
+    exponent = -2
+
+
+class FormatUint24Hecto(FormatUint24):
+    exponent = 2
+
+
+ODD_WIDTH_FORMATS = (FormatUint24, FormatUint40, FormatUint48)
+
+SCALED_VALUES = (
+    (FormatUint24Milli, 0.29, b"\x22\x01\x00"),
+    (FormatUint24Milli, 16777.215, b"\xff\xff\xff"),
+    (FormatUint48Centi, 0.29, b"\x1d\x00\x00\x00\x00\x00"),
+    (FormatUint48Centi, 2814749767106.55, b"\xff\xff\xff\xff\xff\xff"),
+    (FormatUint24Hecto, 1200, b"\x0c\x00\x00"),
+    (FormatUint24Hecto, 1677721500, b"\xff\xff\xff"),
+)
+
+
+@pytest.mark.parametrize("format_cls,value,bytes_val", SCALED_VALUES)
+def test_encode_scaled(format_cls, value, bytes_val):
+    assert format_cls(value).encode() == bytes_val
+
+
+@pytest.mark.parametrize("format_cls,value,bytes_val", SCALED_VALUES)
+def test_decode_scaled(format_cls, value, bytes_val):
+    fmt = format_cls.decode(bytes_val)
+    assert fmt.value == value
+    assert fmt.encode() == bytes_val
+
+
+@pytest.mark.parametrize("format_cls", ODD_WIDTH_FORMATS)
+def test_odd_width_exact(format_cls):
+    # values above 2**53 must not lose precision
+    for shift in range(8 * format_cls.len):
+        value = (1 << shift) | 1
+        encoded = value.to_bytes(format_cls.len, "little")
+        assert format_cls(value).encode() == encoded
+        assert format_cls.decode(encoded).value == value
+
+
+@pytest.mark.parametrize("format_cls", ODD_WIDTH_FORMATS)
+@pytest.mark.parametrize("value", (-1, "max"))
+def test_odd_width_range(format_cls, value):
+    if value == "max":
+        value = 1 << (8 * format_cls.len)
+    with pytest.raises(ValueError):
+        format_cls(value)
+    with pytest.raises(ValueError):
+        format_cls.encode_many([0, value])
+
+
+@pytest.mark.parametrize("format_cls", ODD_WIDTH_FORMATS)
+def test_odd_width_short(format_cls):
+    # missing high bytes are zero
+    assert format_cls.decode(b"\x01\x02").value == 0x0201
+    assert format_cls.decode_many([b"\x01\x02"]) == [0x0201]
+
+
+@pytest.mark.parametrize("format_cls", ODD_WIDTH_FORMATS + (FormatUint24Milli,))
+@pytest.mark.parametrize("count", (0, 1, 1000))
+def test_odd_width_many(format_cls, count):
+    size = format_cls.len
+    encoded = [
+        (idx * 0x0101010101).to_bytes(8, "little")[:size] for idx in range(count)
+    ]
+    values = [format_cls.decode(v).value for v in encoded]
+    assert format_cls.decode_many(encoded) == values
+    assert format_cls.decode_many(b"".join(encoded)) == values
+    assert format_cls.encode_many(values) == b"".join(encoded)
+
+
+@pytest.mark.parametrize("format_cls", ODD_WIDTH_FORMATS)
+def test_odd_width_many_roundtrip(format_cls):
+    # all byte values at every position
+    encoded = bytes(range(256)) * format_cls.len * 8
+    size = format_cls.len
+    values = [
+        format_cls.decode(encoded[idx : idx + size]).value
+        for idx in range(0, len(encoded), size)
+    ]
+    assert format_cls.decode_many(encoded) == values
+    assert format_cls.encode_many(values) == encoded
+
+
+class FormatCountingUint16(FormatUint16):
+    encoded = 0
+
+    def encode(self):
+        FormatCountingUint16.encoded += 1
+        return super().encode()
+
+
+class FormatInitUint8(FormatUint8):
+    def __init__(self, value):
+        super().__init__(value)
+        self.initialized = True
+
+
+def test_decode_trusted():
+    FormatCountingUint16.encoded = 0
+    fmt = FormatCountingUint16.decode(b"\x01\x02")
+    assert fmt.value == 0x0201
+    assert FormatCountingUint16.encoded == 0
+
+
+def test_decode_custom_init():
+    assert FormatInitUint8.decode(b"\x01").initialized
+
+
+def test_encode_value_once():
+    FormatCountingUint16.encoded = 0
+    fmt, encoded = FormatCountingUint16._encode_value(0x0201)
+    assert fmt.value == 0x0201
+    assert encoded == b"\x01\x02"
+    assert FormatCountingUint16.encoded == 1
+
+
+@pytest.mark.parametrize(
+    "format_cls,value,error",
+    (
+        (FormatUint16, 65536, ValueError),
+        (FormatUint16, "1", TypeError),
+        (FormatUint24, -1, ValueError),
+        (FormatUtf8s, b"abc", TypeError),
+    ),
+)
+def test_encode_value_invalid(format_cls, value, error):
+    with pytest.raises(error):
+        format_cls._encode_value(value)
+    with pytest.raises(error):
+        format_cls(value)
+
+
+@pytest.mark.parametrize(
+    "format_cls,bytes_val",
+    (
+        (FormatUint8, b"\x01"),
+        (FormatSint16, b"\x01\x80"),
+        (FormatUint24, b"\x01\x02\x03"),
+        (FormatUtf8s, b"abc"),
+        (FormatRaw, b"\x01\x02"),
+        (FormatBitfield, b"\xaa"),
+    ),
+)
+def test_slots(format_cls, bytes_val):
+    fmt = format_cls.decode(bytes_val)
+    assert not hasattr(fmt, "__dict__")
+    with pytest.raises(AttributeError):
+        fmt.other = 1
+    # behaviour kept
+    assert fmt == format_cls.decode(bytes_val)
+    assert str(fmt) == str(format_cls.decode(bytes_val))
+    assert pickle.loads(pickle.dumps(fmt)) == fmt
+
+
+def test_slots_numeric():
+    fmt = FormatCountingUint16(0x0201)
+    assert not hasattr(fmt, "__dict__")
+    assert int(fmt) == 0x0201
+    assert float(fmt) == float(0x0201)
+    assert fmt == 0x0201
+
+
+def test_slots_tuple():
+    from pydbusbluez.org_bluetooth import FormatCCC
+
+    fmt = FormatCCC.decode(b"\x01\x00")
+    assert not hasattr(fmt, "__dict__")
+    fmt[1] = 2
+    assert fmt == [1, 2]
+    assert str(fmt) == "(1,2)"
+
+
+def test_slots_custom_init():
+    # subclasses with own init keep a __dict__
+    assert FormatInitUint8(1).initialized
+
+
+def test_slots_crf():
+    from pydbusbluez.format_extended import FormatAutoCRF
+    from pydbusbluez.org_bluetooth import FormatCRF
+
+    crf = FormatCRF.decode(b"\x0e\xfe\x2f\x27\x01")
+    fmt_cls = FormatAutoCRF.fromCRF("temp", crf)
+    fmt = fmt_cls.decode(b"\x39\x30")
+    assert not hasattr(fmt, "__dict__")
+    assert fmt.value == 123.45
+
+
+def test_slots_generated():
+    from pydbusbluez.format_extended import FormatAutoCRF
+    from pydbusbluez.org_bluetooth import FormatCRF, FormatCCC
+
+    crf = FormatCRF.decode(b"\x0e\xfe\x2f\x27\x01")
+    for format_cls in (
+        FormatUint8,
+        FormatUint24,
+        FormatSint16,
+        FormatCountingUint16,
+        FormatCCC,
+        FormatAutoCRF.fromCRF("temp", crf),
+    ):
+        assert "__slots__" in format_cls.__dict__
+        fmt = format_cls.decode(bytes(format_cls.len))
+        assert not hasattr(fmt, "__dict__")
@@ -0,0 +1,93 @@
+"""
+Test batch decoding to numpy arrays
+"""
+import pytest
+
+from pydbusbluez.format import *
+from pydbusbluez.format import FormatFloat32
+from pydbusbluez.org_bluetooth import FormatBatteryLevelState, FormatCRF
+
+np = pytest.importorskip("numpy")
+
+
+class FormatTemp(FormatSint16):
+    exponent = -2
+
+
+class FormatHumidity(FormatUint24):
+    exponent = -1
+
+
+class FormatSample(FormatTuple):
+    sub_cls = (FormatUint8, FormatTemp, FormatHumidity)
+    sub_cls_names = ("seq", "temp", "humidity")
+
+
+SAMPLES = [
+    b"\x00\x39\x30\x01\x00\x00",
+    b"\x01\xc7\xcf\xff\xff\xff",
+    b"\xff\x00\x80\x10\x27\x00",
+]
+
+
+@pytest.mark.parametrize(
+    "format_cls,values",
+    (
+        (FormatUint8, [b"\x00", b"\xff"]),
+        (FormatSint16, [b"\x00\x80", b"\xff\x7f", b"\xff\xff"]),
+        (FormatUint64, [b"\xff" * 8, b"\x01" + bytes(7)]),
+        (FormatFloat32, [b"\x00\x00\x80\x3f"]),
+        (FormatTemp, [b"\x39\x30", b"\xc7\xcf", b"\x01\x00"]),
+        (FormatUint24, [b"\x01\x02\x03", b"\xff\xff\xff"]),
+        (FormatHumidity, [b"\x10\x27\x00", b"\x01\x00\x00"]),
+    ),
+)
+def test_decode_batch(format_cls, values):
+    expected = [format_cls.decode(v).value for v in values]
+    decoded = format_cls.decode_batch(values)
+    assert decoded.tolist() == pytest.approx(expected)
+    # one buffer
+    assert format_cls.decode_batch(b"".join(values)).tolist() == pytest.approx(
+        expected
+    )
+
+
+def test_decode_batch_short():
+    assert FormatUint16.decode_batch([b"\x01", b"\x01\x02"]).tolist() == [1, 0x0201]
+
+
+def test_decode_batch_buffer_length():
+    with pytest.raises(ValueError):
+        FormatUint16.decode_batch(b"\x00\x00\x00")
+
+
+def test_decode_batch_unsupported():
+    with pytest.raises(TypeError):
+        FormatUtf8s.decode_batch([b"abc"])
+    with pytest.raises(TypeError):
+        FormatCRF.decode_batch([bytes(7)])
+
+
+def test_tuple_decode_batch():
+    decoded = FormatSample.decode_batch(SAMPLES)
+    assert decoded.dtype.names == ("seq", "temp", "humidity")
+    for row, value in zip(decoded, SAMPLES):
+        expected = FormatSample.decode(value)
+        assert row["seq"] == expected["seq"].value
+        assert row["temp"] == pytest.approx(expected["temp"].value)
+        assert row["humidity"] == pytest.approx(expected["humidity"].value)
+
+
+def test_tuple_decode_batch_columns():
+    columns = FormatSample.decode_batch(b"".join(SAMPLES), columns=True)
+    assert list(columns) == ["seq", "temp", "humidity"]
+    assert columns["seq"].tolist() == [0, 1, 255]
+    assert columns["temp"].tolist() == pytest.approx([123.45, -123.45, -327.68])
+
+
+def test_tuple_decode_batch_no_copy():
+    values = bytes([50, 0b10101010, 100, 0])
+    decoded = FormatBatteryLevelState.decode_batch(values)
+    assert decoded.dtype == FormatBatteryLevelState.dtype()
+    assert decoded["f0"].tolist() == [50, 100]
+    assert decoded["f1"].tolist() == [0b10101010, 0]
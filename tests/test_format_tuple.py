@@ -0,0 +1,70 @@
+"""
+Test FormatTuple encoding and decoding with compiled struct
+"""
+import pytest
+
+from pydbusbluez.format import *
+from pydbusbluez.org_bluetooth import FormatCRF
+
+
+class FormatTemp(FormatSint16):
+    exponent = -2
+
+
+class FormatPackedTuple(FormatTuple):
+    sub_cls = (FormatUint8, FormatTemp, FormatUint16)
+    sub_cls_names = ("flags", "temp", "counter")
+
+
+class FormatMixedTuple(FormatTuple):
+    sub_cls = (FormatUint8, FormatUint24, FormatUint8)
+
+
+def test_tuple_compiled():
+    assert FormatPackedTuple._pck_n == 3
+    assert FormatPackedTuple.len == 5
+    assert FormatMixedTuple._pck_n == 1
+    assert FormatMixedTuple.len == 0
+    # tail not packed
+    assert FormatCRF._pck_n == 4
+
+
+def test_tuple_decode():
+    fmt = FormatPackedTuple.decode(b"\x01\x39\x30\x02\x01")
+    assert fmt["flags"].value == 1
+    assert fmt["temp"].value == 123.45
+    assert fmt["counter"].value == 0x0102
+    assert fmt.encode() == b"\x01\x39\x30\x02\x01"
+
+
+def test_tuple_mixed():
+    fmt = FormatMixedTuple.decode(b"\x01\x03\x02\x01\x04")
+    assert [v.value for v in fmt.value] == [1, 0x010203, 4]
+    assert fmt.encode() == b"\x01\x03\x02\x01\x04"
+
+
+def test_tuple_decode_short():
+    # missing bytes are zero
+    fmt = FormatPackedTuple.decode(b"\x01")
+    assert [v.value for v in fmt.value] == [1, 0, 0]
+
+
+def test_tuple_encode():
+    fmt = FormatPackedTuple([1, -1.5, FormatUint16(7)])
+    assert fmt.encode() == b"\x01\x6a\xff\x07\x00"
+
+
+def test_tuple_encode_errors():
+    with pytest.raises(ValueError):
+        FormatPackedTuple([1, 0, 0x10000]).encode()
+    with pytest.raises(TypeError):
+        FormatPackedTuple([1, "x", 0]).encode()
+
+
+def test_tuple_tail():
+    value = b"\x04\xfe\x2f\x27\x01abc"
+    fmt = FormatCRF.decode(value)
+    assert fmt["exponent"].value == -2
+    assert fmt["unit"].value == 0x272F
+    assert fmt["description"].value == "abc"
+    assert fmt.encode() == value
@@ -0,0 +1,799 @@
+"""
+Test gatt helpers, that do not need a bus connection
+"""
+import socket
+import sys
+from array import array
+from time import monotonic
+from types import SimpleNamespace
+
+import pytest
+
+from gi.repository import GLib
+
+from pydbusbluez import bzutils
+from pydbusbluez.device import Device
+from pydbusbluez.object_manager import BluezObjectManager
+from pydbusbluez.gatt import (
+    _AcquiredNotify,
+    AcquiredWrite,
+    Gatt,
+    GattCharacteristic,
+    GattDescriptor,
+    GattService,
+    WritePipeline,
+    read_many,
+)
+from pydbusbluez.format import FormatSint16, FormatUint8, FormatUint16, FormatUtf8s
+from pydbusbluez.format_extended import FormatAutoCRF
+from pydbusbluez.org_bluetooth import FormatCRF
+from pydbusbluez.error import (
+    BluezFailedError,
+    BluezFormatDecodeError,
+    BluezInvalidOffsetError,
+    BluezNotSupportedError,
+    DBusError,
+)
+
+
+DEV = "/org/bluez/hci0/dev_00_11_22_33_44_55"
+
+
+@pytest.fixture
+def sockets():
+    local, remote = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    yield local, remote
+    local.close()
+    remote.close()
+
+
+def _packets(sock, n):
+    return [sock.recv(1024) for _ in range(n)]
+
+
+def test_acquired_notify(sockets):
+    local, remote = sockets
+    values = []
+
+    def handler(value):
+        values.append(bytes(value))
+        if value[0] == 0xFF:
+            raise ValueError("handler failed")
+
+    notify = _AcquiredNotify(local, 23, handler)
+    for value in (b"\x01\x02", b"\xff", b"\x03"):
+        remote.send(value)
+        # watch is kept, also if the handler raises
+        assert notify._readable(local.fileno(), GLib.IO_IN)
+    assert values == [b"\x01\x02", b"\xff", b"\x03"]
+
+    notify.disconnect()
+    assert notify._source is None
+    assert local.fileno() == -1
+
+
+def test_acquired_notify_hangup(sockets):
+    local, remote = sockets
+    notify = _AcquiredNotify(local, 23, lambda value: None)
+    remote.close()
+    assert not notify._readable(local.fileno(), GLib.IO_IN | GLib.IO_HUP)
+    assert local.fileno() == -1
+    notify.disconnect()
+
+
+def test_acquired_write(sockets):
+    local, remote = sockets
+    w = AcquiredWrite(local, 23)
+    assert w.chunk_size == 20
+
+    w.write(b"\x01\x02")
+    w.write(bytearray(20))
+    with pytest.raises(ValueError):
+        w.write(bytes(21))
+    assert _packets(remote, 2) == [b"\x01\x02", bytes(20)]
+
+
+def test_acquired_write_chunked(sockets):
+    local, remote = sockets
+    w = AcquiredWrite(local, 23)
+    data = bytes(range(45))
+
+    assert w.write_chunked(memoryview(data)) == 3
+    assert _packets(remote, 3) == [data[:20], data[20:40], data[40:]]
+
+    assert w.write_chunked(data[:10], chunk_size=4) == 3
+    assert _packets(remote, 3) == [data[:4], data[4:8], data[8:10]]
+
+
+def test_acquired_write_encode(sockets):
+    local, remote = sockets
+    w = AcquiredWrite(local, 23, encode=lambda v: (v, FormatUint16(v).encode()))
+    w.write(0x0102)
+    assert _packets(remote, 1) == [b"\x02\x01"]
+
+    with AcquiredWrite(local, 23) as w:
+        with pytest.raises(TypeError):
+            w.write(1)
+    assert w.sock is None
+
+
+def test_acquired_write_buffer_errors(sockets):
+    local, remote = sockets
+    encoded = []
+
+    def encode(value):
+        encoded.append(value)
+        return value, b"\x00"
+
+    w = AcquiredWrite(local, 23, encode=encode)
+    w.write(array("H", [0x0102]))
+    assert _packets(remote, 1) == [array("H", [0x0102]).tobytes()]
+
+    # buffer, but not C-contiguous: copied, not encoded
+    w.write(memoryview(bytes(range(8)))[::2])
+    w.write_chunked(memoryview(array("H", range(8)))[::-2], chunk_size=4)
+    assert _packets(remote, 3) == [
+        b"\x00\x02\x04\x06",
+        array("H", [7, 5]).tobytes(),
+        array("H", [3, 1]).tobytes(),
+    ]
+    assert encoded == []
+
+    def fail(value):
+        raise ValueError("encode failed")
+
+    w.encode = fail
+    with pytest.raises(ValueError):
+        w.write(1)
+    assert encoded == []
+
+
+class _PendingWrites(object):
+    """characteristic, which completes writes on request"""
+
+    def __init__(self):
+        self.issued = []
+
+    def _encode(self, value):
+        return value, bytes([value])
+
+    def write_async(self, value, success_cb, error_cb, user_data, **kwargs):
+        self.issued.append((value, success_cb, error_cb, user_data))
+
+    def complete(self, error=None):
+        value, success_cb, error_cb, user_data = self.issued.pop(0)
+        if error:
+            error_cb(self, error, user_data)
+            return
+        # like ProxyMethodAsync, an exception of the callback is reported as error
+        try:
+            success_cb(self, value, user_data)
+        except Exception as e:
+            error_cb(self, e, user_data)
+
+
+def test_write_pipeline():
+    char = _PendingWrites()
+    batches = []
+    pipeline = WritePipeline(window=2, batch_size=2, on_batch=batches.append)
+
+    for value in range(5):
+        pipeline.write(char, value)
+    assert [v for v, *_ in char.issued] == [b"\x00", b"\x01"]
+    assert pipeline.in_flight == 2
+    assert pipeline.pending == 5
+
+    error = BluezFailedError("failed")
+    char.complete()
+    char.complete(error)
+    assert batches == [[(char, 0, None), (char, 1, error)]]
+    # window refilled in order
+    assert [v for v, *_ in char.issued] == [b"\x02", b"\x03"]
+
+    while char.issued:
+        char.complete()
+    assert pipeline.pending == 0
+    assert pipeline.errors == 1
+    assert [[value for _, value, _ in batch] for batch in batches] == [
+        [0, 1],
+        [2, 3],
+        [4],
+    ]
+
+
+class _FailingWrites(_PendingWrites):
+    """characteristic, which fails writes synchronously"""
+
+    def write_async(self, value, success_cb, error_cb, user_data, **kwargs):
+        raise BluezFailedError("not sent")
+
+
+def test_write_pipeline_sync_failures():
+    pending = _PendingWrites()
+    failing = _FailingWrites()
+    batches = []
+    pipeline = WritePipeline(window=1, batch_size=1000, on_batch=batches.append)
+
+    pipeline.write(pending, 0)
+    count = sys.getrecursionlimit() * 2
+    for _ in range(count):
+        pipeline.write(failing, 1)
+    assert pipeline.pending == count + 1
+
+    # the queued writes fail one after the other, without recursion
+    pending.complete()
+    assert pipeline.pending == 0
+    assert pipeline.errors == count
+    assert sum(len(batch) for batch in batches) == count + 1
+
+
+class _InvalidWrites(_PendingWrites):
+    """characteristic, which raises other errors synchronously"""
+
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+    def write_async(self, value, success_cb, error_cb, user_data, **kwargs):
+        raise self.error
+
+
+@pytest.mark.parametrize(
+    "error,expected",
+    (
+        (TypeError("missing argument"), TypeError),
+        (GLib.Error("GDBus.Error:org.bluez.Error.Failed: not sent"), BluezFailedError),
+    ),
+)
+def test_write_pipeline_sync_errors(error, expected):
+    char = _InvalidWrites(error)
+    pipeline = WritePipeline(window=2)
+
+    for value in range(3):
+        pipeline.write(char, value)
+    assert pipeline.in_flight == 0
+    assert pipeline.pending == 0
+    assert pipeline.errors == 3
+    completed = pipeline.drain(timeout=0)
+    assert [value for _, value, _ in completed] == [0, 1, 2]
+    assert all(isinstance(error, expected) for _, _, error in completed)
+
+
+def test_write_pipeline_on_batch_raises():
+    char = _PendingWrites()
+    batches = []
+
+    def on_batch(completed):
+        batches.append(completed)
+        raise ValueError("on_batch failed")
+
+    pipeline = WritePipeline(window=2, batch_size=1, on_batch=on_batch)
+    pipeline.write(char, 0)
+    pipeline.write(char, 1)
+    char.complete()
+    # not counted as failed write, completed once
+    assert pipeline.in_flight == 1
+    assert pipeline.errors == 0
+    assert batches == [[(char, 0, None)]]
+
+    char.complete()
+    assert pipeline.pending == 0
+    assert pipeline.errors == 0
+    assert batches == [[(char, 0, None)], [(char, 1, None)]]
+    assert pipeline.drain(timeout=0) == []
+
+
+class _LongValueProxy(object):
+    """
+    characteristic proxy with a long value, reads return at most chunk_size
+    bytes, reads at the end of the value fail with invalid offset
+    """
+
+    def __init__(self, value, chunk_size=None):
+        self.value = bytearray(value)
+        self.chunk_size = chunk_size
+        self.requests = []
+
+    @staticmethod
+    def _offset(options):
+        return options["offset"].unpack() if "offset" in options else 0
+
+    def ReadValue(self, options, timeout=None):
+        offset = self._offset(options)
+        self.requests.append(offset)
+        if offset and offset >= len(self.value):
+            raise GLib.Error(
+                "GDBus.Error:org.bluez.Error.InvalidOffset: Invalid offset"
+            )
+        if self.chunk_size is None:
+            return list(self.value[offset:])
+        return list(self.value[offset : offset + self.chunk_size])
+
+    def WriteValue(self, value, options, timeout=None):
+        offset = self._offset(options)
+        self.requests.append(offset)
+        self.value[offset : offset + len(value)] = value
+
+
+@pytest.fixture
+def long_char():
+    char = GattCharacteristic("Long", "0000aaaa-0000-1000-8000-00805f9b34fb", None)
+    char._proxy = _LongValueProxy(range(50), 22)
+    return char
+
+
+def test_read_chunks(long_char):
+    chunks = list(long_char.read_chunks(chunk_size=22))
+    assert chunks == [bytes(range(0, 22)), bytes(range(22, 44)), bytes(range(44, 50))]
+    assert long_char._proxy.requests == [0, 22, 44]
+
+    # value ends exactly at a chunk, invalid offset ends the value
+    long_char._proxy.chunk_size = 25
+    long_char._proxy.requests = []
+    chunks = list(long_char.read_chunks(chunk_size=25))
+    assert chunks == [bytes(range(0, 25)), bytes(range(25, 50))]
+    assert long_char._proxy.requests == [0, 25, 50]
+
+    # invalid offset for the first request
+    with pytest.raises(BluezInvalidOffsetError):
+        list(long_char.read_chunks(offset=50, chunk_size=25))
+
+
+def test_read_chunks_bluez_long_read(long_char):
+    # BlueZ reads the whole value from the offset, one request
+    long_char._proxy.chunk_size = None
+    assert list(long_char.read_chunks()) == [bytes(range(50))]
+    assert list(long_char.read_chunks(offset=10)) == [bytes(range(10, 50))]
+    assert long_char._proxy.requests == [0, 10]
+
+    # a short reply is not followed up without chunk_size
+    long_char._proxy.chunk_size = 22
+    assert list(long_char.read_chunks()) == [bytes(range(22))]
+    assert long_char._proxy.requests == [0, 10, 0]
+
+
+class _MtuBus(object):
+    """constructs itself as device proxy, with the MTU property"""
+
+    def __init__(self, mtu):
+        self.MTU = mtu
+        self.constructed = []
+
+    def construct(self, introspection, name, obj):
+        self.constructed.append(obj)
+        return self
+
+
+@pytest.fixture
+def no_mirror(monkeypatch):
+    om = BluezObjectManager.__new__(BluezObjectManager)
+    om._mirror = None
+    monkeypatch.setattr(BluezObjectManager, "manager", om)
+    return om
+
+
+def test_device_mtu(long_char, monkeypatch, no_mirror):
+    def no_device(*args, **kwargs):
+        raise AssertionError("Device constructed")
+
+    monkeypatch.setattr(Device, "__init__", no_device)
+    bus = _MtuBus(27)
+    monkeypatch.setattr(bzutils, "_system_bus", bus)
+
+    service = GattService("Service", "0000bbbb-0000-1000-8000-00805f9b34fb")
+    service._set_resolved(DEV + "/service0001", {"Device": DEV})
+    long_char.service = service
+    long_char._obj = DEV + "/service0001/char0002"
+    assert long_char._device_mtu() == 27
+    # proxy constructed once
+    bus.MTU = 0
+    assert long_char._device_mtu() == 23
+    assert bus.constructed == [DEV]
+
+    # without static property, from the object path
+    service._static_props = {}
+    bus.MTU = 30
+    assert long_char._device_mtu() == 30
+    assert bus.constructed == [DEV]
+
+    # other device
+    long_char._obj = "/org/bluez/hci1/dev_00_11_22_33_44_55/service0001/char0002"
+    long_char._device_mtu()
+    assert bus.constructed == [DEV, "/org/bluez/hci1/dev_00_11_22_33_44_55"]
+
+
+def test_device_mtu_mirror(long_char, monkeypatch, no_mirror):
+    bus = _MtuBus(27)
+    monkeypatch.setattr(bzutils, "_system_bus", bus)
+    no_mirror._mirror = {DEV: {Device.iface: {"MTU": 65}}}
+    long_char.service = GattService("Service", "0000bbbb-0000-1000-8000-00805f9b34fb")
+    long_char._obj = DEV + "/service0001/char0002"
+    assert long_char._device_mtu() == 65
+    no_mirror._mirror[DEV][Device.iface] = {}
+    assert long_char._device_mtu() == 23
+    assert bus.constructed == []
+
+
+def test_read_long(long_char):
+    assert long_char.read_long(chunk_size=22) == bytearray(range(50))
+    assert long_char.read_long(offset=40, chunk_size=22) == bytearray(range(40, 50))
+
+    buf = bytearray(64)
+    assert long_char.read_long(into=buf, chunk_size=22) == 50
+    assert buf[:50] == bytes(range(50))
+
+    with pytest.raises(ValueError):
+        long_char.read_long(into=bytearray(30), chunk_size=22)
+
+    long_char._proxy.chunk_size = None
+    long_char._proxy.requests = []
+    assert long_char.read_long(offset=5) == bytearray(range(5, 50))
+    assert long_char._proxy.requests == [5]
+
+
+def test_write_long(long_char):
+    data = bytes(range(100, 140))
+    assert long_char.write_long(memoryview(data), offset=5, chunk_size=18) == 45
+    assert long_char._proxy.requests == [5, 23, 41]
+    assert long_char._proxy.value[5:45] == data
+
+    offsets = list(long_char.write_chunks(b"\x01\x02\x03", chunk_size=2))
+    assert offsets == [2, 3]
+    assert long_char._proxy.value[:3] == b"\x01\x02\x03"
+
+
+class _ValueProxy(object):
+    """characteristic proxy, which replies to ReadValueAsync immediately"""
+
+    def __init__(self, value):
+        self.value = value
+        self.requests = 0
+
+    def ReadValueAsync(self, success_cb, error_cb, user_data, options, timeout=None):
+        self.requests += 1
+        success_cb(self, (self.value,), user_data)
+
+
+def _char(name, value, fmt=FormatUint16):
+    char = GattCharacteristic(name, "0000aaaa-0000-1000-8000-00805f9b34fb", None)
+    char.fmt = fmt
+    char._proxy = _ValueProxy(value)
+    return char
+
+
+def test_read_many():
+    chars = [_char("a", [1, 0]), _char("b", [0xFF]), _char("c", [0xFF, 0xFF])]
+    # invalid utf-8
+    chars[1].fmt = FormatUtf8s
+
+    results = read_many(chars)
+    assert list(results) == chars
+    assert results[chars[0]].value == 1
+    assert isinstance(results[chars[1]], BluezFormatDecodeError)
+    assert results[chars[2]].value == 0xFFFF
+    assert all(c._proxy.requests == 1 for c in chars)
+
+    assert read_many(chars[:1], raw=True) == {chars[0]: [1, 0]}
+    assert read_many([]) == {}
+
+
+def test_read_many_duplicates():
+    char = _char("a", [1, 0])
+    start = monotonic()
+    results = read_many([char, char], timeout=5)
+    assert monotonic() - start < 1
+    assert results == {char: FormatUint16(1)}
+
+
+def _uuid(short):
+    return "0000{}-0000-1000-8000-00805f9b34fb".format(short)
+
+
+S_BAT = DEV + "/service0001"
+C_LEVEL = S_BAT + "/char0002"
+D_CCC = C_LEVEL + "/desc0004"
+C_MODEL = S_BAT + "/char0005"
+S_INFO = DEV + "/service0010"
+S_CUSTOM = DEV + "/service0020"
+S_CUSTOM_DUP = DEV + "/service0030"
+C_CUSTOM = S_CUSTOM_DUP + "/char0031"
+S_NO_UUID = DEV + "/service0040"
+CUSTOM = "12345678-1234-5678-1234-56789abcdef0"
+
+SNAPSHOT = {
+    S_BAT: {GattService.iface: {"UUID": _uuid("180f"), "Handle": 1}},
+    C_LEVEL: {
+        GattCharacteristic.iface: {
+            "UUID": _uuid("2a19"),
+            "Flags": ["read", "notify"],
+            "Handle": 2,
+        }
+    },
+    D_CCC: {GattDescriptor.iface: {"UUID": _uuid("2902"), "Handle": 4}},
+    # known by org_bluetooth
+    C_MODEL: {GattCharacteristic.iface: {"UUID": _uuid("2a24"), "Handle": 5}},
+    S_INFO: {GattService.iface: {"UUID": _uuid("180a"), "Handle": 0x10}},
+    # unknown, twice on the device
+    S_CUSTOM: {GattService.iface: {"UUID": CUSTOM, "Handle": 0x20}},
+    S_CUSTOM_DUP: {GattService.iface: {"UUID": CUSTOM, "Handle": 0x30}},
+    C_CUSTOM: {GattCharacteristic.iface: {"UUID": CUSTOM, "Handle": 0x31}},
+    S_NO_UUID: {GattService.iface: {}},
+}
+
+
+class _ResolveBus(object):
+    """constructs proxies replying ReadValue with values[obj]"""
+
+    def __init__(self, values=None):
+        self.values = values or {}
+        self.constructed = []
+        self.reads = []
+
+    def construct(self, introspection, name, obj):
+        self.constructed.append((introspection, obj))
+
+        def read_value(options, timeout=None):
+            self.reads.append(obj)
+            return list(self.values[obj])
+
+        return SimpleNamespace(ReadValue=read_value)
+
+
+@pytest.fixture
+def resolve_bus(monkeypatch):
+    bus = _ResolveBus()
+    monkeypatch.setattr(bzutils, "_system_bus", bus)
+    return bus
+
+
+def _gatt():
+    # without Gatt.__init__, it needs a connected device
+    gatt = Gatt.__new__(Gatt)
+    gatt.services = []
+    battery = gatt.add_service("battery", "180f")
+    level = battery.add_characteristic("level", "2a19", FormatUint8)
+    level.add_descriptor("ccc", "2902")
+    battery.add_characteristic("missing", "2a00")
+    # same uuid locally
+    gatt.add_service("battery2", "180f")
+    gatt.add_service("absent", "1234")
+    return gatt
+
+
+def test_resolve_services(resolve_bus):
+    gatt = _gatt()
+    matched = gatt._resolve_services(SNAPSHOT)
+    assert sorted(matched) == sorted(SNAPSHOT)
+
+    battery = gatt.battery
+    assert battery.obj == S_BAT
+    assert gatt.battery2.obj == S_BAT
+    assert gatt.absent.obj is None
+    assert battery.level.obj == C_LEVEL
+    assert battery.level.ccc.obj == D_CCC
+    assert battery.missing.obj is None
+    # unknown, named and formatted by org_bluetooth or the object path
+    assert battery.model_number_string.obj == C_MODEL
+    assert battery.model_number_string.fmt is FormatUtf8s
+    assert gatt.device_information.obj == S_INFO
+    # duplicate uuids resolve to the last object, as one service
+    assert gatt.service0020.obj == S_CUSTOM_DUP
+    assert gatt.service0020.char0031.obj == C_CUSTOM
+    assert [s.name for s in gatt.services] == [
+        "battery",
+        "battery2",
+        "absent",
+        "device_information",
+        "service0020",
+    ]
+    # chars of services with the same object resolved once
+    assert gatt.battery2.chars == []
+
+    # properties from the snapshot, proxies constructed on first use
+    assert battery.handle == 1
+    assert battery.level.flags == ["read", "notify"]
+    assert resolve_bus.constructed == []
+    assert battery.level._proxy is battery.level._proxy
+    assert resolve_bus.constructed == [(GattCharacteristic.introspection, C_LEVEL)]
+
+
+def test_resolve_services_known_only(resolve_bus):
+    gatt = _gatt()
+    matched = gatt._resolve_services(SNAPSHOT, resolve_unknown=False)
+    # characteristics of unresolved services are not matched
+    assert sorted(matched) == sorted(set(SNAPSHOT) - {C_CUSTOM})
+
+    assert [s.name for s in gatt.services] == ["battery", "battery2", "absent"]
+    # as before, only applies to services, not passed to characteristics
+    assert [c.name for c in gatt.battery.chars] == [
+        "level",
+        "missing",
+        "Model Number String",
+    ]
+    assert [d.name for d in gatt.battery.level.descriptors] == ["ccc"]
+    assert gatt.battery.level.obj == C_LEVEL
+    assert gatt.battery.level.ccc.obj == D_CCC
+
+
+def test_resolve_services_missing(resolve_bus):
+    gatt = _gatt()
+    assert gatt._resolve_services({}) == []
+    assert all(s.obj is None for s in gatt.services)
+    assert all(c.obj is None for c in gatt.battery.chars)
+
+    # characteristic without its service
+    assert gatt._resolve_services({C_LEVEL: SNAPSHOT[C_LEVEL]}) == []
+    assert gatt.battery.level.obj is None
+
+
+# format: sint16, exponent: -2, unit: celsius, namespace: 1, no description
+CRF = b"\x0e\xfe\x2f\x27\x01"
+
+S_ENV = DEV + "/service0050"
+C_TEMP = S_ENV + "/char0051"
+D_TEMP_CRF = C_TEMP + "/desc0053"
+C_TEMP2 = S_ENV + "/char0054"
+D_TEMP2_CRF = C_TEMP2 + "/desc0056"
+
+CRF_SNAPSHOT = {
+    S_ENV: {GattService.iface: {"UUID": _uuid("181a")}},
+    C_TEMP: {GattCharacteristic.iface: {"UUID": _uuid("aa01")}},
+    D_TEMP_CRF: {GattDescriptor.iface: {"UUID": _uuid("2904")}},
+    C_TEMP2: {GattCharacteristic.iface: {"UUID": _uuid("aa02")}},
+    D_TEMP2_CRF: {GattDescriptor.iface: {"UUID": _uuid("2904")}},
+}
+
+
+def _crf_gatt():
+    gatt = Gatt.__new__(Gatt)
+    gatt.services = []
+    env = gatt.add_service("env", "181a")
+    env.add_characteristic("temp", "aa01", FormatAutoCRF)
+    # CRF descriptor resolved as unknown descriptor
+    env.add_characteristic("temp2", "aa02", FormatAutoCRF)
+    return gatt
+
+
+def test_resolve_crf(resolve_bus):
+    resolve_bus.values = {D_TEMP_CRF: CRF, D_TEMP2_CRF: b"\x0e\xff\x2f\x27\x01"}
+    gatt = _crf_gatt()
+    gatt.env.temp.add_descriptor("CRF", "2904", FormatCRF)
+    crfs = {}
+    gatt._resolve_services(CRF_SNAPSHOT, crfs=crfs)
+
+    # each CRF read once, the raw values are collected
+    assert sorted(resolve_bus.reads) == [D_TEMP_CRF, D_TEMP2_CRF]
+    assert crfs == {C_TEMP: CRF, C_TEMP2: b"\x0e\xff\x2f\x27\x01"}
+
+    temp, temp2 = gatt.env.chars
+    assert issubclass(temp.fmt, FormatSint16)
+    assert temp.fmt.__name__ == "FormatCRFtemp"
+    assert temp.fmt.decode(b"\x39\x30").value == 123.45
+    assert temp2.fmt.__name__ == "FormatCRFtemp2"
+    assert temp2.fmt.decode(b"\x39\x30").value == 1234.5
+
+
+def test_resolve_crf_cached(resolve_bus):
+    gatt = _crf_gatt()
+    # from the cache, nothing read
+    gatt._resolve_services(CRF_SNAPSHOT, crfs={C_TEMP: CRF, C_TEMP2: CRF})
+    assert resolve_bus.reads == []
+    assert resolve_bus.constructed == []
+    assert all(c.fmt.decode(b"\x39\x30").value == 123.45 for c in gatt.env.chars)
+
+
+def test_resolve_crf_invalid(resolve_bus):
+    resolve_bus.values = {D_TEMP_CRF: b"\x00\x00\x00\x00\x00"}
+    gatt = _crf_gatt()
+    with pytest.raises(ValueError):
+        gatt._resolve_services(CRF_SNAPSHOT)
+
+
+class _NotifyProxy(object):
+    """characteristic proxy, StopNotify is rejected while notify is acquired"""
+
+    def __init__(self):
+        self.Notifying = False
+        self.acquired = False
+        self.calls = []
+        self.handlers = []
+        self.PropertiesChanged = SimpleNamespace(connect=self._connect)
+
+    def _connect(self, handler):
+        self.handlers.append(handler)
+        return SimpleNamespace(disconnect=lambda: self.handlers.remove(handler))
+
+    def StartNotify(self):
+        self.calls.append("StartNotify")
+        self.Notifying = True
+
+    def StopNotify(self):
+        self.calls.append("StopNotify")
+        if self.acquired:
+            raise GLib.Error(
+                "GDBus.Error:org.bluez.Error.NotPermitted: Notify acquired"
+            )
+        self.Notifying = False
+
+    def notify(self, value):
+        for handler in list(self.handlers):
+            handler(GattCharacteristic.iface, {"Value": value}, [])
+
+
+@pytest.fixture
+def notify_char():
+    char = GattCharacteristic("Notify", "0000aaaa-0000-1000-8000-00805f9b34fb", None)
+    char.fmt = FormatUint16
+    char._obj = DEV + "/service0001/char0002"
+    char._proxy = _NotifyProxy()
+    return char
+
+
+@pytest.mark.parametrize(
+    "error",
+    (
+        BluezNotSupportedError("Operation is not supported"),
+        # bluez without AcquireNotify
+        DBusError("org.freedesktop.DBus.Error.UnknownMethod: AcquireNotify"),
+    ),
+)
+def test_notify_fallback(notify_char, error):
+    def acquire(method):
+        raise error
+
+    notify_char._acquire = acquire
+    values = []
+    notify_char.onValueNotified(lambda char, value: values.append(value.value))
+    proxy = notify_char._proxy
+    assert proxy.calls == ["StartNotify"]
+
+    proxy.notify([1, 2])
+    assert values == [0x0201]
+
+    notify_char.onValueNotified(None)
+    assert proxy.calls == ["StartNotify", "StopNotify"]
+    assert not proxy.handlers
+
+
+def test_notify_switch_handlers(notify_char):
+    proxy = notify_char._proxy
+    values = []
+    for name in ("a", "b"):
+        notify_char.onValueNotified(
+            lambda c, v, name=name: values.append((name, v.value)), acquire=False
+        )
+    assert proxy.calls == ["StartNotify", "StopNotify", "StartNotify"]
+
+    proxy.notify([1, 0])
+    assert values == [("b", 1)]
+    assert len(proxy.handlers) == 1
+
+
+def test_notify_switch_handlers_acquired(notify_char, monkeypatch):
+    proxy = notify_char._proxy
+    acquired = []
+
+    def acquire(method):
+        local, remote = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        acquired.append((local, remote))
+        proxy.acquired = proxy.Notifying = True
+        return local, 23
+
+    notify_char._acquire = acquire
+    values = []
+    notify_char.onValueNotified(lambda c, v: values.append(("a", v.value)))
+    notify_char.onValueNotified(lambda c, v: values.append(("b", v.value)))
+    (old, old_remote), (local, remote) = acquired
+    # the socket is closed, StopNotify is not sent
+    assert old.fileno() == -1
+    assert proxy.calls == []
+
+    remote.send(b"\x01\x00")
+    assert notify_char._notify_subscription._readable(local.fileno(), GLib.IO_IN)
+    assert values == [("b", 1)]
+
+    notify_char.onValueNotified(None)
+    assert local.fileno() == -1
+    assert proxy.calls == []
+    for sock in (old_remote, remote):
+        sock.close()
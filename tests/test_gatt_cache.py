@@ -0,0 +1,117 @@
+"""
+Test persistent GATT database cache
+"""
+import pytest
+
+from pydbusbluez.gatt import Gatt
+from pydbusbluez.gatt_cache import GattCache
+from pydbusbluez.object_manager import BluezObjectManager
+
+
+ADDRESS = "00:11:22:33:44:55"
+DEV = "/org/bluez/hci0/dev_00_11_22_33_44_55"
+
+OBJECTS = {
+    "/service0001": {
+        "org.bluez.GattService1": {
+            "UUID": "00001801-0000-1000-8000-00805f9b34fb",
+            "Device": "/org/bluez/hci0/dev_00_11_22_33_44_55",
+            "Primary": True,
+            "Handle": 1,
+        }
+    },
+    "/service0001/char0002": {
+        "org.bluez.GattCharacteristic1": {
+            "UUID": "00002b2a-0000-1000-8000-00805f9b34fb",
+            "Service": "/org/bluez/hci0/dev_00_11_22_33_44_55/service0001",
+            "Value": [1, 2],
+            "Flags": ["read"],
+            "Handle": 2,
+        }
+    },
+}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GattCache(str(tmp_path))
+
+
+def test_store_load(cache):
+    assert cache.load(ADDRESS) is None
+
+    cache.store(ADDRESS, b"\x01\x02", OBJECTS, {"/service0001/char0002": b"\x04\x00"})
+    db_hash, objects, crfs = cache.load(ADDRESS.lower())
+
+    assert db_hash == b"\x01\x02"
+    assert crfs == {"/service0001/char0002": b"\x04\x00"}
+    # object paths and runtime values are not stored
+    assert objects["/service0001"]["org.bluez.GattService1"] == {
+        "UUID": "00001801-0000-1000-8000-00805f9b34fb",
+        "Primary": True,
+        "Handle": 1,
+    }
+    assert objects["/service0001/char0002"]["org.bluez.GattCharacteristic1"] == {
+        "UUID": "00002b2a-0000-1000-8000-00805f9b34fb",
+        "Flags": ["read"],
+        "Handle": 2,
+    }
+
+
+def test_invalidate(cache):
+    cache.store(ADDRESS, b"\x01", OBJECTS, {})
+    cache.invalidate(ADDRESS)
+    assert cache.load(ADDRESS) is None
+    cache.invalidate(ADDRESS)
+
+
+def test_invalid_entry(cache, tmp_path):
+    cache.store(ADDRESS, b"\x01", OBJECTS, {})
+    (tmp_path / "00_11_22_33_44_55.json").write_text("{")
+    assert cache.load(ADDRESS) is None
+
+
+class _Device(object):
+    obj = DEV
+    address = ADDRESS
+    connected = True
+    services_resolved = True
+
+
+def test_resolve_hash_read_once(cache, monkeypatch):
+    snapshots = []
+
+    def get_child_objects(cls, parent, only_direct=False):
+        snapshots.append(parent)
+        return {DEV + obj: ifaces for obj, ifaces in OBJECTS.items()}
+
+    hash_reads = []
+
+    def read_database_hash(self, objects):
+        hash_reads.append(objects)
+        return b"\x01\x02"
+
+    monkeypatch.setattr(
+        BluezObjectManager, "get_child_objects", classmethod(get_child_objects)
+    )
+    monkeypatch.setattr(Gatt, "_read_database_hash", read_database_hash)
+    desc = [
+        {
+            "name": "generic_attribute",
+            "uuid": "1801",
+            "chars": [{"name": "database_hash", "uuid": "2b2a"}],
+        }
+    ]
+
+    gatt = Gatt(_Device(), desc, cache=cache)
+    assert len(snapshots) == 1
+    # read before resolving, stored with the layout
+    assert len(hash_reads) == 1
+    assert cache.load(ADDRESS)[0] == b"\x01\x02"
+    assert gatt.generic_attribute.database_hash.obj == DEV + "/service0001/char0002"
+
+    # from cache, no snapshot
+    gatt = Gatt(_Device(), desc, cache=cache)
+    assert len(snapshots) == 1
+    assert len(hash_reads) == 2
+    assert gatt.generic_attribute.database_hash.obj == DEV + "/service0001/char0002"
@@ -0,0 +1,94 @@
+"""
+Test notification stream buffering
+"""
+import pytest
+
+from pydbusbluez.notify import NotificationStream
+from pydbusbluez.format import FormatUint8
+from pydbusbluez.error import BluezFormatDecodeError
+
+
+def _stream(policy, maxlen=3, decode=None):
+    stream = NotificationStream(maxlen, policy, decode=decode)
+    for i in range(5):
+        stream.push(bytes([i]))
+    return stream
+
+
+@pytest.mark.parametrize(
+    "policy,expected",
+    [
+        (NotificationStream.DROP_OLDEST, [2, 3, 4]),
+        (NotificationStream.DROP_NEWEST, [0, 1, 2]),
+        (NotificationStream.COALESCE_LATEST, [0, 1, 4]),
+    ],
+)
+def test_overflow_policy(policy, expected):
+    stream = _stream(policy)
+    assert len(stream) == 3
+    assert stream.received == 5
+    assert stream.dropped == 2
+    assert stream.get_batch() == [bytes([v]) for v in expected]
+    assert len(stream) == 0
+
+
+def test_get_batch():
+    stream = _stream(NotificationStream.DROP_OLDEST, maxlen=5)
+    assert stream.get_batch(2) == [b"\x00", b"\x01"]
+    assert stream.get() == b"\x02"
+    assert stream.get_batch(10) == [b"\x03", b"\x04"]
+    assert stream.get() is None
+    assert stream.get_batch() == []
+    assert stream.dropped == 0
+
+
+def test_decode_on_dequeue():
+    stream = _stream(NotificationStream.DROP_OLDEST, decode=FormatUint8.decode)
+    assert stream.get().value == 2
+    assert [v.value for v in stream.get_batch()] == [3, 4]
+
+
+def _decode_not_3(value):
+    if value == b"\x03":
+        raise BluezFormatDecodeError("invalid value")
+    return value[0]
+
+
+def test_get_batch_decode_error():
+    stream = NotificationStream(maxlen=10, decode=_decode_not_3)
+    for i in range(6):
+        stream.push(bytes([i]))
+    # values before the failing one, the rest stays buffered
+    assert stream.get_batch() == [0, 1, 2]
+    assert len(stream) == 3
+    # failing oldest value is dropped and raised
+    with pytest.raises(BluezFormatDecodeError):
+        stream.get_batch()
+    assert stream.get_batch() == [4, 5]
+    assert stream.dropped == 0
+
+    # values pushed meanwhile, put back as far as they fit
+    stream = NotificationStream(maxlen=3, decode=_decode_not_3)
+    for i in range(2, 5):
+        stream.push(bytes([i]))
+    values = stream._buffer.copy()
+    stream._buffer.clear()
+    stream.push(b"\x09")
+    stream.push(b"\x0a")
+    stream._requeue(list(values)[1:])
+    assert stream.dropped == 1
+    assert stream.get_batch() == [4, 9, 10]
+
+
+def test_wait():
+    stream = NotificationStream()
+    assert stream.wait(0) is False
+    stream.push(b"\x01")
+    assert stream.wait(0) is True
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        NotificationStream(0)
+    with pytest.raises(ValueError):
+        NotificationStream(policy="drop-all")
@@ -0,0 +1,314 @@
+"""
+Test object path index, the managed objects mirror and InterfacesAdded dispatch
+"""
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+from pydbusbluez import bzutils
+from pydbusbluez.device import Adapter, Device
+from pydbusbluez.object_manager import BluezObjectManager, PathTree
+
+
+PATHS = (
+    "/org/bluez/hci0",
+    "/org/bluez/hci0/dev_00_11_22_33_44_55",
+    "/org/bluez/hci0/dev_00_11_22_33_44_55/service0001",
+    "/org/bluez/hci0/dev_00_11_22_33_44_55/service0001/char0002",
+    "/org/bluez/hci0/dev_00_11_22_33_44_55/service0001/char0002/desc0004",
+    "/org/bluez/hci0/dev_66_77_88_99_AA_BB",
+    "/org/bluez/hci1",
+)
+
+
+@pytest.fixture
+def tree():
+    return PathTree(PATHS)
+
+
+def test_childs(tree):
+    assert tree.childs("/org/bluez") == list(PATHS)
+    assert tree.childs("/org/bluez/hci0") == list(PATHS[1:6])
+    assert tree.childs("/org/bluez/hci1") == []
+    assert tree.childs("/org/bluez/hci2") == []
+
+
+def test_direct_childs(tree):
+    assert tree.childs("/org/bluez", only_direct=True) == [
+        "/org/bluez/hci0",
+        "/org/bluez/hci1",
+    ]
+    assert tree.childs("/org/bluez/hci0", only_direct=True) == [PATHS[1], PATHS[5]]
+
+
+def test_set_remove(tree):
+    assert len(tree) == len(PATHS)
+    assert "/org/bluez" not in tree
+    assert PATHS[2] in tree
+
+    assert tree.remove(PATHS[2])
+    assert not tree.remove(PATHS[2])
+    assert PATHS[2] not in tree
+    # childs of removed path are kept
+    assert tree.childs(PATHS[1]) == list(PATHS[3:5])
+
+    for path in PATHS:
+        tree.remove(path)
+    assert len(tree) == 0
+    assert tree.childs("/") == []
+
+    tree.set(PATHS[4], "value")
+    assert tree.get(PATHS[4]) == "value"
+    assert tree.get(PATHS[3]) is None
+    assert tree.childs("/org/bluez") == [PATHS[4]]
+
+
+def test_ancestors():
+    tree = PathTree()
+    tree.set("/", "root")
+    tree.set("/org/bluez/hci0", "adapter")
+    tree.set("/org/bluez/hci0/dev_00_11_22_33_44_55", "device")
+
+    assert list(tree.ancestors(PATHS[3])) == [
+        ("/", "root"),
+        ("/org/bluez/hci0", "adapter"),
+        ("/org/bluez/hci0/dev_00_11_22_33_44_55", "device"),
+    ]
+    # the path itself is not an ancestor
+    assert list(tree.ancestors(PATHS[1])) == [
+        ("/", "root"),
+        ("/org/bluez/hci0", "adapter"),
+    ]
+    assert list(tree.ancestors("/org/bluez/hci1/dev_00_11_22_33_44_55")) == [
+        ("/", "root")
+    ]
+
+
+ADAPTER = "/org/bluez/hci0"
+DEV = ADAPTER + "/dev_00_11_22_33_44_55"
+SERVICE = DEV + "/service0001"
+
+
+class _Subscription(object):
+    def __init__(self):
+        self.active = True
+
+    def unsubscribe(self):
+        self.active = False
+
+
+class _ManagerProxy(object):
+    """object manager proxy, returns a copy of the snapshot"""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.onInterfacesAdded = None
+        self.onInterfacesRemoved = None
+        self.calls = 0
+
+    def GetManagedObjects(self):
+        self.calls += 1
+        return copy.deepcopy(self.objects)
+
+
+class _Bus(object):
+    def __init__(self, objects):
+        self.proxy = _ManagerProxy(objects)
+        self.subscriptions = []
+
+    def construct(self, introspection, name, obj):
+        if obj == "/":
+            return self.proxy
+        # adapter proxy
+        return SimpleNamespace(Powered=True)
+
+    def subscribe(self, **kwargs):
+        self.subscriptions.append((kwargs, _Subscription()))
+        return self.subscriptions[-1][1]
+
+    def properties_changed(self, obj, iface, changed, invalidated=()):
+        for kwargs, subscription in self.subscriptions:
+            if subscription.active:
+                kwargs["signal_fired"](
+                    "sender",
+                    obj,
+                    kwargs["iface"],
+                    kwargs["signal"],
+                    (iface, changed, list(invalidated)),
+                )
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    bus = _Bus(
+        {
+            ADAPTER: {"org.bluez.Adapter1": {"Powered": True}},
+            DEV: {"org.bluez.Device1": {"Connected": False, "RSSI": -50}},
+        }
+    )
+    monkeypatch.setattr(bzutils, "_system_bus", bus)
+    monkeypatch.setattr(BluezObjectManager, "manager", None)
+    return bus
+
+
+def test_mirror(bus):
+    proxy = bus.proxy
+    BluezObjectManager.enable_mirror()
+    om = BluezObjectManager.get()
+    assert BluezObjectManager.mirrored()
+    assert proxy.onInterfacesAdded == om._interfaces_added
+    assert proxy.onInterfacesRemoved == om._interfaces_removed
+    assert bus.subscriptions[0][0]["signal"] == "PropertiesChanged"
+    assert BluezObjectManager.objects() == bus.proxy.objects
+    assert BluezObjectManager.get_childs(ADAPTER) == [DEV]
+
+    # added
+    gatt = {"org.bluez.GattService1": {"UUID": "180f"}}
+    om._interfaces_added(SERVICE, gatt)
+    om._interfaces_added(DEV, {"org.bluez.Battery1": {"Percentage": 80}})
+    assert BluezObjectManager.get_childs(ADAPTER) == [DEV, SERVICE]
+    assert BluezObjectManager.get_childs(ADAPTER, only_direct=True) == [DEV]
+    assert BluezObjectManager.get_child_objects(DEV) == {SERVICE: gatt}
+    assert set(BluezObjectManager.objects()[DEV]) == {
+        "org.bluez.Device1",
+        "org.bluez.Battery1",
+    }
+
+    # properties changed
+    bus.properties_changed(DEV, "org.bluez.Device1", {"Connected": True}, ["RSSI"])
+    # unknown object and interface
+    bus.properties_changed(DEV + "/unknown", "org.bluez.Device1", {"RSSI": -10})
+    bus.properties_changed(DEV, "org.bluez.Unknown1", {"RSSI": -10})
+    assert BluezObjectManager.get_interface_objects("org.bluez.Device1") == {
+        DEV: {"Connected": True}
+    }
+
+    # removed, one of the interfaces and then all
+    om._interfaces_removed(DEV, ["org.bluez.Battery1"])
+    assert BluezObjectManager.get_childs(ADAPTER) == [DEV, SERVICE]
+    om._interfaces_removed(SERVICE, ["org.bluez.GattService1"])
+    om._interfaces_removed(DEV, ["org.bluez.Device1"])
+    assert BluezObjectManager.objects() == {
+        ADAPTER: {"org.bluez.Adapter1": {"Powered": True}}
+    }
+    assert BluezObjectManager.get_childs("/org/bluez") == [ADAPTER]
+    assert len(om._mirror_index) == 1
+    assert proxy.calls == 1
+
+    BluezObjectManager.enable_mirror(False)
+    assert not BluezObjectManager.mirrored()
+    assert not bus.subscriptions[0][1].active
+    assert proxy.onInterfacesAdded is None
+    assert proxy.onInterfacesRemoved is None
+    assert len(om._mirror_index) == 0
+    # served by GetManagedObjects again
+    assert BluezObjectManager.get_childs(ADAPTER) == [DEV]
+    assert proxy.calls == 2
+
+
+def test_mirror_fetch_error(bus):
+    def fail():
+        raise RuntimeError("no reply")
+
+    bus.proxy.GetManagedObjects = fail
+    with pytest.raises(RuntimeError):
+        BluezObjectManager.get()._start_mirror()
+    assert not BluezObjectManager.mirrored()
+    assert not bus.subscriptions[0][1].active
+    assert bus.proxy.onInterfacesAdded is None
+
+
+def _parent(obj):
+    return SimpleNamespace(obj=obj)
+
+
+def test_object_added(bus):
+    om = BluezObjectManager.get()
+    calls = []
+
+    def added(parent, obj, ifaces, name, key=None):
+        calls.append((name, parent.obj, obj, key))
+
+    om.onObjectAdded(_parent(ADAPTER), added, "adapter", key="value")
+    assert bus.proxy.onInterfacesAdded == om._interfaces_added
+    om.onObjectAdded(_parent(DEV), added, "device", only_direct=True)
+    om.onObjectAdded(
+        _parent("/org/bluez"),
+        added,
+        "services",
+        filter_interface="org.bluez.GattService1",
+    )
+    # path prefix, but no parent
+    om.onObjectAdded(_parent(ADAPTER + "/dev"), added, "prefix")
+
+    om._interfaces_added(DEV, {"org.bluez.Device1": {}})
+    om._interfaces_added(SERVICE, {"org.bluez.GattService1": {}})
+    om._interfaces_added(SERVICE + "/char0002", {"org.bluez.GattCharacteristic1": {}})
+    om._interfaces_added("/org/bluez/hci1", {"org.bluez.Adapter1": {}})
+    # called from the root down
+    assert calls == [
+        ("adapter", ADAPTER, DEV, "value"),
+        ("services", "/org/bluez", SERVICE, None),
+        ("adapter", ADAPTER, SERVICE, "value"),
+        ("device", DEV, SERVICE, None),
+        ("adapter", ADAPTER, SERVICE + "/char0002", "value"),
+    ]
+
+    # interfaces added to the object of a callback itself, as before the index,
+    # not for callbacks of direct childs only
+    calls.clear()
+    om._interfaces_added(ADAPTER, {"org.bluez.Media1": {}})
+    om._interfaces_added(DEV, {"org.bluez.Battery1": {}})
+    assert calls == [
+        ("adapter", ADAPTER, ADAPTER, "value"),
+        ("adapter", ADAPTER, DEV, "value"),
+    ]
+
+    for obj in (ADAPTER, DEV, "/org/bluez", ADAPTER + "/dev"):
+        om.onObjectAdded(_parent(obj), None)
+    assert bus.proxy.onInterfacesAdded is None
+    assert len(om._added_cbs_index) == 0
+
+
+def test_object_added_unregister_in_callback(bus):
+    om = BluezObjectManager.get()
+    calls = []
+
+    def added_once(parent, obj, ifaces):
+        calls.append((parent.obj, obj))
+        om.onObjectAdded(parent, None)
+        # also the other callback, it is still called for this signal
+        om.onObjectAdded(_parent(DEV), None)
+
+    def added(parent, obj, ifaces):
+        calls.append((parent.obj, obj))
+
+    om.onObjectAdded(_parent(ADAPTER), added_once)
+    om.onObjectAdded(_parent(DEV), added)
+
+    om._interfaces_added(SERVICE, {"org.bluez.GattService1": {}})
+    om._interfaces_added(SERVICE, {"org.bluez.GattService1": {}})
+    assert calls == [(ADAPTER, SERVICE), (DEV, SERVICE)]
+    assert bus.proxy.onInterfacesAdded is None
+
+
+def test_device_added(bus):
+    adapter = Adapter("hci0")
+    devices = []
+
+    def device_added(device, props, arg, key=None):
+        devices.append((device.obj, device.address, props, arg, key))
+
+    adapter.onDeviceAdded(device_added, "arg", key="value")
+    om = BluezObjectManager.get()
+    props = {"Address": "00:11:22:33:44:55"}
+    om._interfaces_added(DEV, {Device.iface: props})
+    # no device
+    om._interfaces_added(DEV, {"org.bluez.Battery1": {}})
+    om._interfaces_added(SERVICE, {Device.iface: {}, "org.bluez.GattService1": {}})
+    om._interfaces_added("/org/bluez/hci1/dev_00_11_22_33_44_55", {Device.iface: {}})
+    assert devices == [(DEV, "00:11:22:33:44:55", props, "arg", "value")]
+
+    adapter.onDeviceAdded(None)
+    assert bus.proxy.onInterfacesAdded is None
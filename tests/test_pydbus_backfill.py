@@ -0,0 +1,90 @@
+"""
+Test generated proxy classes, shared per introspection and backfilled with
+<method>Async once, without bus connection
+"""
+import gc
+from xml.etree import ElementTree as ET
+
+from pydbus.proxy import ProxyMixin
+
+from pydbusbluez import pydbus_backfill
+from pydbusbluez.pydbus_backfill import ProxyMethodAsync, composite_interface
+
+
+XML = """
+<node>
+<interface name="org.bluez.Thing1">
+    <method name="Connect"/>
+    <method name="Pair"/>
+    <property access="read" name="Connected" type="b"/>
+</interface>
+<interface name="org.freedesktop.DBus.Properties">
+    <method name="GetAll">
+    <arg direction="in" name="interface" type="s"/>
+    <arg direction="out" name="properties" type="a{sv}"/>
+    </method>
+</interface>
+</node>
+"""
+
+
+class _Bus(ProxyMixin):
+    """bus, construct does not need a connection"""
+
+
+def _async_methods(cls):
+    """returns list of (class, name) of all <method>Async in the mro of cls"""
+    return [
+        (base, name)
+        for base in cls.__mro__
+        for name, attr in vars(base).items()
+        if isinstance(attr, ProxyMethodAsync)
+    ]
+
+
+def test_construct_shared_class():
+    bus = _Bus()
+    introspection = ET.fromstring(XML)
+    hci0 = bus.construct(introspection, "org.bluez", "/org/bluez/hci0")
+    hci1 = bus.construct(introspection, "org.bluez", "/org/bluez/hci1")
+
+    assert type(hci0) is type(hci1)
+    assert type(hci0) is composite_interface(introspection)
+    assert (hci0._path, hci1._path) == ("/org/bluez/hci0", "/org/bluez/hci1")
+    assert hci0._bus is bus
+
+    # other introspection object, other class
+    other = bus.construct(ET.fromstring(XML), "org.bluez", "/org/bluez/hci0")
+    assert type(other) is not type(hci0)
+
+
+def test_async_backfilled_once():
+    bus = _Bus()
+    introspection = ET.fromstring(XML)
+    proxy = bus.construct(introspection, "org.bluez", "/org/bluez/hci0")
+    methods = _async_methods(type(proxy))
+
+    bus.construct(introspection, "org.bluez", "/org/bluez/hci1")
+    assert _async_methods(composite_interface(introspection)) == methods
+
+    # each exactly once, on its interface class
+    assert sorted(name for _, name in methods) == [
+        "ConnectAsync",
+        "GetAllAsync",
+        "PairAsync",
+    ]
+    assert {base.__name__ for base, _ in methods} == {
+        "org.bluez.Thing1",
+        "org.freedesktop.DBus.Properties",
+    }
+    assert proxy.ConnectAsync.__func__.__qualname__ == "org.bluez.Thing1.ConnectAsync"
+
+
+def test_class_released_with_introspection():
+    introspection = ET.fromstring(XML)
+    composite_interface(introspection)
+    count = len(pydbus_backfill._composite_interfaces)
+
+    del introspection
+    gc.collect()
+    assert len(pydbus_backfill._composite_interfaces) == count - 1
@@ -0,0 +1,276 @@
+"""
+Test image transfer against an in-process fake peripheral
+"""
+import pytest
+
+from pydbusbluez.transfer import Transfer
+from pydbusbluez.error import BluezFailedError, BluezNotSupportedError
+
+
+IMAGE = bytes(i % 251 for i in range(1000))
+
+
+class FakePeripheral(object):
+    """
+    Receives packets and confirms the received offset every prn packets and
+    at the end of the image. Lost packets are discarded, and so are the
+    following ones until the next receipt.
+
+    deferred: receipts are queued until deliver(), else reported from send()
+    """
+
+    def __init__(self, total, prn, lose=(), deferred=False, start=0):
+        self.total = total
+        self.start = start
+        self.prn = prn
+        self.lose = set(lose)
+        self.deferred = deferred
+        self.image = bytearray()
+        self.transfer = None
+        self.queued = []
+        self.packets = 0
+        self._since_receipt = 0
+        self._seen = start
+        self._lost = False
+
+    def send(self, packet):
+        index = self.packets
+        self.packets += 1
+        self._since_receipt += 1
+        self._seen += len(packet)
+        if index in self.lose:
+            self._lost = True
+        if not self._lost:
+            self.image += packet
+
+        if self._since_receipt == self.prn or self._seen >= self.total:
+            self._since_receipt = 0
+            self._lost = False
+            self._seen = self.start + len(self.image)
+            self._receipt(self._seen)
+
+    def _receipt(self, offset):
+        if self.deferred:
+            self.queued.append(offset)
+        else:
+            self.transfer.receipt(offset)
+
+    def deliver(self):
+        while self.queued:
+            self.transfer.receipt(self.queued.pop(0))
+
+
+def _transfer(image, peripheral, **kwargs):
+    transfer = Transfer(image, peripheral.send, **kwargs)
+    peripheral.transfer = transfer
+    return transfer
+
+
+@pytest.mark.parametrize("deferred", [False, True])
+def test_transfer_prn(deferred):
+    peripheral = FakePeripheral(len(IMAGE), 4, deferred=deferred)
+    progress = []
+    transfer = _transfer(
+        IMAGE, peripheral, packet_size=20, prn=4, on_progress=progress.append
+    )
+    transfer.progress_interval = 0
+    transfer.start()
+    if deferred:
+        # window of prn packets
+        assert transfer.offset == 80
+        while peripheral.queued:
+            peripheral.deliver()
+
+    assert transfer.done
+    assert peripheral.image == IMAGE
+    assert peripheral.packets == 50
+    assert progress[-1].offset == progress[-1].total == len(IMAGE)
+    assert progress[-1].percent == 100.0
+
+
+def test_transfer_lost_packets():
+    peripheral = FakePeripheral(len(IMAGE), 8, lose=(3, 20), deferred=True)
+    transfer = _transfer(IMAGE, peripheral, packet_size=20, prn=8)
+    transfer.start()
+    while peripheral.queued:
+        peripheral.deliver()
+
+    assert transfer.done
+    assert peripheral.image == IMAGE
+    # packets 3..7 and 20..23 resent
+    assert transfer.resent == 9 * 20
+
+
+def test_transfer_resume():
+    peripheral = FakePeripheral(len(IMAGE), 5, start=500)
+    transfer = _transfer(IMAGE, peripheral, packet_size=33, prn=5, offset=500)
+    transfer.start()
+
+    assert transfer.done
+    assert peripheral.image == IMAGE[500:]
+    assert transfer.progress.offset == len(IMAGE)
+
+
+def test_transfer_no_prn(tmp_path):
+    path = tmp_path / "image.bin"
+    path.write_bytes(IMAGE)
+    packets = []
+
+    with Transfer(str(path), lambda p: packets.append(bytes(p)), 64) as transfer:
+        transfer.start()
+        assert transfer.done
+
+    assert b"".join(packets) == IMAGE
+    assert len(packets) == 16
+
+
+def test_transfer_packets_kept(tmp_path):
+    path = tmp_path / "image.bin"
+    path.write_bytes(IMAGE)
+    # not copied, views into the mapped file
+    packets = []
+
+    with pytest.raises(RuntimeError, match="body failed"):
+        with Transfer(str(path), packets.append, 64) as transfer:
+            transfer.start()
+            raise RuntimeError("body failed")
+
+    assert transfer.done
+    assert b"".join(packets) == IMAGE
+    packets.clear()
+
+
+@pytest.mark.parametrize("prn", [0, 4])
+def test_transfer_empty(tmp_path, prn):
+    path = tmp_path / "image.bin"
+    path.write_bytes(b"")
+    packets = []
+
+    for image in (str(path), b""):
+        with Transfer(image, packets.append, prn=prn) as transfer:
+            assert transfer.total == 0
+            assert transfer.run(timeout=0).percent == 100.0
+            assert transfer.done
+    assert packets == []
+
+
+def test_transfer_resumed_at_end():
+    transfer = Transfer(IMAGE, None, prn=4, offset=len(IMAGE))
+    transfer.start()
+    assert transfer.done
+
+
+def test_transfer_invalid_receipt():
+    peripheral = FakePeripheral(len(IMAGE), 4, deferred=True)
+    transfer = _transfer(IMAGE, peripheral, packet_size=20, prn=4)
+    transfer.start()
+    transfer.receipt(100)
+    assert not transfer.done
+    assert isinstance(transfer.error, BluezFailedError)
+
+
+def test_transfer_send_error():
+    def send(packet):
+        raise BluezFailedError("Not connected")
+
+    transfer = Transfer(IMAGE, send, prn=4)
+    transfer.start()
+    assert isinstance(transfer.error, BluezFailedError)
+    assert transfer.acked == 0
+
+
+class _Writer(object):
+    chunk_size = 20
+
+    def __init__(self):
+        self.packets = []
+        self.closed = False
+
+    def write(self, packet):
+        self.packets.append(bytes(packet))
+
+    def close(self):
+        self.closed = True
+
+
+class _DataChar(object):
+    def __init__(self, acquire=True):
+        self.writer = _Writer() if acquire else None
+        self.writes = []
+
+    def acquire_write(self):
+        if not self.writer:
+            raise BluezNotSupportedError("Operation is not supported")
+        return self.writer
+
+    def _device_mtu(self):
+        return 23
+
+    def write(self, value, options):
+        self.writes.append(value)
+
+
+class _ReceiptChar(object):
+    def __init__(self, error=None):
+        self.error = error
+        self.handler = None
+
+    def _subscribe_notifications(self, handler):
+        if self.error:
+            raise self.error
+        self.handler = handler
+        return self
+
+    def disconnect(self):
+        self.handler = None
+
+
+def test_to_characteristic():
+    data, receipts = _DataChar(), _ReceiptChar()
+    with Transfer.to_characteristic(
+        IMAGE[:100],
+        data,
+        receipts,
+        parse_receipt=lambda value: int.from_bytes(value, "little"),
+        prn=5,
+    ) as transfer:
+        transfer.start()
+        assert len(data.writer.packets) == 5
+        receipts.handler(b"\x64\x00")
+        assert transfer.done
+    assert b"".join(data.writer.packets) == IMAGE[:100]
+    assert data.writer.closed
+    assert receipts.handler is None
+
+
+def test_to_characteristic_write_commands():
+    data = _DataChar(acquire=False)
+    with Transfer.to_characteristic(IMAGE[:50], data) as transfer:
+        transfer.start()
+        assert transfer.done
+    assert data.writes == [IMAGE[:20], IMAGE[20:40], IMAGE[40:50]]
+
+
+def test_to_characteristic_errors():
+    data, receipts = _DataChar(), _ReceiptChar()
+    with pytest.raises(ValueError):
+        Transfer.to_characteristic(IMAGE, data, receipts)
+    assert receipts.handler is None
+
+    # released, if the transfer can not be built
+    with pytest.raises(ValueError):
+        Transfer.to_characteristic(
+            IMAGE, data, receipts, parse_receipt=int, offset=len(IMAGE) + 1
+        )
+    assert data.writer.closed
+    assert receipts.handler is None
+
+    data = _DataChar()
+    with pytest.raises(BluezNotSupportedError):
+        Transfer.to_characteristic(
+            IMAGE,
+            data,
+            _ReceiptChar(BluezNotSupportedError("no notify")),
+            parse_receipt=int,
+        )
+    assert data.writer.closed